@@ -0,0 +1,108 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmark the training dataset of a config without a model, per stage and in its stage modes."""
+import argparse
+import json
+import os
+import tempfile
+import cv2
+import numpy as np
+
+from mindface.utils import benchmark_loader, CorePlan
+from datasets import create_dataset, stage_speed
+from utils import AnchorConfig
+from runner import read_yaml
+
+# name: (fuse_stages, batch_encode)
+MODES = {
+    'split': (False, False),
+    'split+batch_encode': (False, True),
+    'fused': (True, False),
+    'fused+batch_encode': (True, True),
+}
+
+def make_synthetic_widerface(root, num_images, seed=0):
+    """Write num_images random images with random faces and their label.txt, return the label.txt."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(root, 'images', 'synthetic'), exist_ok=True)
+    lines = []
+    for i in range(num_images):
+        height, width = rng.integers(480, 1025, 2)
+        image = cv2.resize(rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8), (width, height))
+        cv2.imwrite(os.path.join(root, 'images', 'synthetic', f'{i}.jpg'), image)
+        lines.append(f'# synthetic/{i}.jpg')
+        for _ in range(rng.integers(1, 21)):
+            size = rng.integers(10, min(height, width) // 3)
+            x, y = rng.integers(0, width - size), rng.integers(0, height - size)
+            landms = ' '.join(f'{x + size * dx:.1f} {y + size * dy:.1f} 0.0' for dx, dy in
+                              ((0.3, 0.4), (0.7, 0.4), (0.5, 0.6), (0.35, 0.8), (0.65, 0.8)))
+            lines.append(f'{x} {y} {size} {size} {landms} 1.0')
+    label_path = os.path.join(root, 'label.txt')
+    with open(label_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    return label_path
+
+def dataset_speed(cfg, modes, num_batches=50, num_samples=32):
+    """
+    Report the stage throughput of one worker, and the throughput, batch time, ready ratio and worker CPU
+    share of the training dataset in every mode, see ``benchmark_loader``.
+    """
+    core_plan = CorePlan.from_config(cfg)
+    report = {'config': cfg.get('name'), 'num_workers': core_plan.num_workers,
+              'stages': stage_speed(cfg, num_samples), 'modes': {}}
+    report['bottleneck'] = min(report['stages'], key=report['stages'].get)
+    for mode in modes:
+        fuse_stages, batch_encode = MODES[mode]
+        ds_train = create_dataset(cfg['training_dataset'], cfg['variance'], cfg['match_thresh'], cfg['image_size'],
+                                  cfg['clip'], cfg['batch_size'], multiprocessing=True,
+                                  num_worker=core_plan.num_workers, anchor_cfg=AnchorConfig.from_config(cfg),
+                                  batch_encode=batch_encode, fuse_stages=fuse_stages,
+                                  uint8_output=cfg['uint8_input'], core_plan=core_plan)
+        report['modes'][mode] = benchmark_loader(ds_train, cfg['batch_size'], num_batches)
+
+    print(f"{'stage':<22}{'samples/s per worker':>22}")
+    for stage, samples_per_second in report['stages'].items():
+        print(f"{stage:<22}{samples_per_second:>22.1f}")
+    print(f"The slowest stage is {report['bottleneck']}.")
+    print(f"{'mode':<22}{'workers':>10}{'samples/s':>12}{'batch(ms)':>12}{'ready':>8}{'worker CPU':>12}"
+          f"{'main CPU':>10}")
+    for mode, row in report['modes'].items():
+        print(f"{mode:<22}{core_plan.num_workers:>10}{row['samples_per_second']:>12.1f}{row['batch_ms']:>12.1f}"
+              f"{row['ready_ratio']:>8.0%}{sum(row['worker_cpu_share'].values()):>12.2f}{row['main_cpu_share']:>10.2f}")
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='dataset_speed')
+    parser.add_argument('--config', default='mindface/detection/configs/RetinaFace_mobilenet025.yaml', type=str,
+                        help='config path')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES), help='modes to compare')
+    parser.add_argument('--num_batches', type=int, default=50, help='timed batches of every mode')
+    parser.add_argument('--num_samples', type=int, default=32, help='timed samples of every stage')
+    parser.add_argument('--num_workers', type=int, default=None, help='workers of every stage, num_workers of '
+                        'the config by default')
+    parser.add_argument('--synthetic', type=int, default=0, help='benchmark this many random images instead of '
+                        'the training_dataset of the config')
+    parser.add_argument('--json', type=str, default=None, help='also write the report to this file')
+    args = parser.parse_args()
+
+    config = read_yaml(args.config)
+    if args.num_workers:
+        config['num_workers'] = args.num_workers
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.synthetic:
+            config['training_dataset'] = make_synthetic_widerface(synthetic_dir, args.synthetic)
+        result = dataset_speed(config, args.modes, num_batches=args.num_batches, num_samples=args.num_samples)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
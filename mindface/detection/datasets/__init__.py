@@ -1,5 +1,10 @@
 """dataset init"""
 from .augmentation import Preproc
 from .dataset import WiderFace, create_dataset
+from .annotation_index import compile_index, load_index
+from .shards import WiderFaceShards, ShardSampler, pack_shards
+from .resize_cache import build_resized_cache
+from .speed import stage_speed
 
-__all__ = ['WiderFace','create_dataset']
+__all__ = ['WiderFace','create_dataset','compile_index','load_index','WiderFaceShards','ShardSampler','pack_shards',
+           'build_resized_cache','stage_speed']
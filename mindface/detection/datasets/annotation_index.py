@@ -0,0 +1,120 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Compiled annotation index of WiderFace."""
+import os
+import zipfile
+import numpy as np
+
+
+def _to_targets(labels):
+    """Convert raw label rows (x, y, w, h, 5 x (x, y, visible), blur) to x1, y1, x2, y2, landmarks, flag."""
+    targets = np.zeros((labels.shape[0], 15), dtype=np.float32)
+    targets[:, 0:2] = labels[:, 0:2]
+    targets[:, 2:4] = labels[:, 0:2] + labels[:, 2:4]
+    targets[:, 4:14] = labels[:, [4, 5, 7, 8, 10, 11, 13, 14, 16, 17]]
+    targets[:, 14] = np.where(targets[:, 4] < 0, -1, 1)
+    return targets
+
+def compile_index(label_path, index_path=None):
+    """
+    Parse a WiderFace label.txt once into a compact annotation index.
+
+    Faces of zero width or height are dropped, and so are the images left without faces.
+
+    Args:
+        label_path (String): The path of label.txt.
+        index_path (String): Where to save the index as an uncompressed .npz. Default: None, not saved.
+
+    Returns:
+        index (Dict), 'targets' float32 [total_faces, 15] in x1, y1, x2, y2, landmarks, flag layout,
+        'offsets' int64 [num_images + 1] with the faces of image i in targets[offsets[i]:offsets[i + 1]]
+        and 'paths' the image paths relative to the images folder.
+
+    Examples:
+        >>> index = compile_index('data/WiderFace/train/label.txt', 'data/WiderFace/train/label.npz')
+    """
+    with open(label_path, mode="r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+
+    images_dir = os.path.join(os.path.dirname(label_path), 'images')
+    paths, blocks = [], []
+    for line in lines:
+        if line.startswith('#'):
+            paths.append(line[2:].strip())
+            blocks.append([])
+        elif line.strip():
+            blocks[-1].append(line.split())
+
+    missing = [path for path in paths if not os.path.exists(os.path.join(images_dir, path))]
+    assert not missing, f'image path is not exists: {missing[0]}'
+
+    kept_paths, targets, counts = [], [], []
+    for path, block in zip(paths, blocks):
+        if not block:
+            continue
+        labels = np.array(block, dtype=np.float32)
+        labels = labels[(labels[:, 2] > 0) & (labels[:, 3] > 0)]
+        if labels.shape[0] == 0:
+            continue
+        kept_paths.append(path)
+        targets.append(_to_targets(labels))
+        counts.append(labels.shape[0])
+
+    index = {'targets': np.concatenate(targets, axis=0) if targets else np.zeros((0, 15), dtype=np.float32),
+             'offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+             'paths': np.array(kept_paths, dtype=np.str_)}
+    if index_path is not None:
+        # the ranks of a distributed training compile at once, a rank never loads the half-written file of another
+        tmp_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **index)
+        os.replace(tmp_path, index_path)
+    return index
+
+def load_index(index_path):
+    """
+    Memory-map the arrays of an index saved by ``compile_index``.
+
+    ``np.load`` reads every member of an .npz into memory, but the members of an uncompressed .npz are plain
+    .npy files stored contiguously, so they are mapped in place. Workers forked from the same index then share
+    the pages instead of holding their own copies.
+
+    Args:
+        index_path (String): The path of the .npz.
+
+    Returns:
+        index (Dict), the read-only arrays of the index.
+
+    Examples:
+        >>> index = load_index('data/WiderFace/train/label.npz')
+    """
+    index = {}
+    with zipfile.ZipFile(index_path) as archive, open(index_path, 'rb') as file:
+        for info in archive.infolist():
+            # skip the local file header of the member to reach the .npy data
+            file.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(file.read(4), dtype='<u2')
+            file.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED or dtype.hasobject or 0 in shape:
+                index[name] = np.load(index_path)[name]
+            else:
+                index[name] = np.memmap(index_path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                        order='F' if fortran_order else 'C')
+    return index
@@ -13,7 +13,6 @@
 
 """Augmentation."""
 import random
-import copy
 import cv2
 import numpy as np
 
@@ -33,42 +32,47 @@ def bbox_iof(bbox_a, bbox_b, offset=0):
     area_a = np.prod(bbox_a[:, 2:4] - bbox_a[:, :2] + offset, axis=1)
     return area_i / np.maximum(area_a[:, None], 1)
 
-def _is_iof_satisfied_constraint(box, crop_box):
-    """_is_iof_satisfied_constraint"""
-    iof = bbox_iof(box, crop_box)
-    satisfied = np.any((iof >= 1.0))
-    return satisfied
-
 def _choose_candidate(max_trial, image_w, image_h, boxes):
-    """_choose_candidate"""
+    """
+    Sample up to two square crops that fully contain at least one box, after the default full image candidate.
+
+    The trials are drawn as [T, 4] arrays of crops and checked against every box in one broadcast, the first
+    two that satisfy the constraint are taken, like the trials drawn one by one until two are found.
+    """
     # add default candidate
     candidates = [(0, 0, image_w, image_h)]
+    # box_data should have at least one box
+    if boxes.shape[0] <= 0:
+        raise Exception("!!! annotation box is less than 1")
+
+    # trials are drawn in growing chunks, most images find two crops in the first one
+    start, chunk = 0, 16
+    while start < max_trial and len(candidates) < 3:
+        num = min(chunk, max_trial - start)
+        scale = np.where(np.random.rand(num) > 0.2, np.random.rand(num) * 0.7 + 0.3, 1.0)
+        size = (scale * min(image_w, image_h)).astype(np.int64)
+        dx = (np.random.rand(num) * (image_w - size)).astype(np.int64)
+        dy = (np.random.rand(num) * (image_h - size)).astype(np.int64)
+        crop_boxes = np.stack((dx, dy, dx + size, dy + size), axis=1)
+
+        satisfied = np.nonzero((bbox_iof(boxes, crop_boxes) >= 1.0).any(axis=0))[0]
+        for i in satisfied[:3 - len(candidates)]:
+            candidates.append((int(dx[i]), int(dy[i]), int(size[i]), int(size[i])))
+        start, chunk = start + num, chunk * 4
 
-    for _ in range(max_trial):
-        # box_data should have at least one box
-        if _rand() > 0.2:
-            scale = _rand(0.3, 1.0)
-        else:
-            scale = 1.0
-
-        nh = int(scale * min(image_w, image_h))
-        nw = nh
-
-        dx = int(_rand(0, image_w - nw))
-        dy = int(_rand(0, image_h - nh))
-
-        if boxes.shape[0] > 0:
-            crop_box = np.array((dx, dy, dx + nw, dy + nh))
-            if not _is_iof_satisfied_constraint(boxes, crop_box[np.newaxis]):
-                continue
-            candidates.append((dx, dy, nw, nh))
-        else:
-            raise Exception("!!! annotation box is less than 1")
+    return candidates
 
-        if len(candidates) >= 3:
-            break
+def _crop_matrix(candidate, input_w, flip):
+    """
+    The affine matrix that maps a crop candidate onto the input image, scaled to input_w and flipped if flip.
 
-    return candidates
+    It maps continuous coordinates, where a pixel spans one unit from its corner, like the boxes and landmarks.
+    """
+    dx, dy, nw, nh = candidate
+    scale = float(input_w) / float(max(nh, nw))
+    if flip:
+        return np.array([[-scale, 0., input_w + dx * scale], [0., scale, -dy * scale]])
+    return np.array([[scale, 0., -dx * scale], [0., scale, -dy * scale]])
 
 def _correct_bbox_by_candidates(candidates, input_w, input_h, flip,\
      boxes, labels, landms, allow_outside_center):
@@ -79,75 +83,35 @@ def _correct_bbox_by_candidates(candidates, input_w, input_h, flip,\
             candidate = candidates.pop(np.random.randint(1, len(candidates)))
         else:
             candidate = candidates.pop(np.random.randint(0, len(candidates)))
-        dx, dy, nw, nh = candidate
-
-        boxes_t = copy.deepcopy(boxes)
-        landms_t = copy.deepcopy(landms)
-        labels_t = copy.deepcopy(labels)
-        landms_t = landms_t.reshape([-1, 5, 2])
-
-        if nw == nh:
-            scale = float(input_w) / float(nw)
-        else:
-            scale = float(input_w) / float(max(nh, nw))
-        boxes_t[:, [0, 2]] = (boxes_t[:, [0, 2]] - dx) * scale
-        boxes_t[:, [1, 3]] = (boxes_t[:, [1, 3]] - dy) * scale
-        landms_t[:, :, 0] = (landms_t[:, :, 0] - dx) * scale
-        landms_t[:, :, 1] = (landms_t[:, :, 1] - dy) * scale
+        matrix = _crop_matrix(candidate, input_w, flip).astype(boxes.dtype)
+        # new arrays, the inputs are never written
+        scale, shift = matrix.diagonal(), matrix[:, 2]
+        boxes_t = (boxes.reshape([-1, 2, 2]) * scale + shift).reshape([-1, 4])
+        landms_t = landms.reshape([-1, 5, 2]) * scale + shift
 
         if flip:
-            boxes_t[:, [0, 2]] = input_w - boxes_t[:, [2, 0]]
-            landms_t[:, :, 0] = input_w - landms_t[:, :, 0]
+            boxes_t = boxes_t[:, [2, 1, 0, 3]]
             # flip landms
-            landms_t_1 = landms_t[:, 1, :].copy()
-            landms_t[:, 1, :] = landms_t[:, 0, :]
-            landms_t[:, 0, :] = landms_t_1
-            landms_t_4 = landms_t[:, 4, :].copy()
-            landms_t[:, 4, :] = landms_t[:, 3, :]
-            landms_t[:, 3, :] = landms_t_4
-
-        if allow_outside_center:
-            pass
-        else:
-            mask1 = np.logical_and((boxes_t[:, 0] + boxes_t[:, 2])/2. >= 0., \
-                (boxes_t[:, 1] + boxes_t[:, 3])/2. >= 0.)
-            boxes_t = boxes_t[mask1]
-            landms_t = landms_t[mask1]
-            labels_t = labels_t[mask1]
-
-            mask2 = np.logical_and((boxes_t[:, 0] + boxes_t[:, 2]) / 2. <= input_w,
-                                   (boxes_t[:, 1] + boxes_t[:, 3]) / 2. <= input_h)
-            boxes_t = boxes_t[mask2]
-            landms_t = landms_t[mask2]
-            labels_t = labels_t[mask2]
-
-        # recorrect x, y for case x,y < 0 reset to zero,
-        # after dx and dy, some box can smaller than zero
-        boxes_t[:, 0:2][boxes_t[:, 0:2] < 0] = 0
-        # recorrect w,h not higher than input size
-        boxes_t[:, 2][boxes_t[:, 2] > input_w] = input_w
-        boxes_t[:, 3][boxes_t[:, 3] > input_h] = input_h
-        box_w = boxes_t[:, 2] - boxes_t[:, 0]
-        box_h = boxes_t[:, 3] - boxes_t[:, 1]
-        # discard invalid box: w or h smaller than 1 pixel
-        mask3 = np.logical_and(box_w > 1, box_h > 1)
-        boxes_t = boxes_t[mask3]
-        landms_t = landms_t[mask3]
-        labels_t = labels_t[mask3]
-
-        # normal
-        boxes_t[:, [0, 2]] /= input_w
-        boxes_t[:, [1, 3]] /= input_h
-        landms_t[:, :, 0] /= input_w
-        landms_t[:, :, 1] /= input_h
-
-        landms_t = landms_t.reshape([-1, 10])
-        labels_t = np.expand_dims(labels_t, 1)
-
-        targets_t = np.hstack((boxes_t, landms_t, labels_t))
-
-        if boxes_t.shape[0] > 0:
-
+            landms_t = landms_t[:, [1, 0, 2, 4, 3]]
+
+        # discard the boxes whose center is outside the crop,
+        # recorrect x, y for case x,y < 0 reset to zero, after dx and dy, some box can smaller than zero,
+        # recorrect w,h not higher than input size and discard invalid box: w or h smaller than 1 pixel
+        keep = np.ones(boxes_t.shape[0], dtype=bool)
+        if not allow_outside_center:
+            center_x = (boxes_t[:, 0] + boxes_t[:, 2]) / 2.
+            center_y = (boxes_t[:, 1] + boxes_t[:, 3]) / 2.
+            keep = (center_x >= 0.) & (center_y >= 0.) & (center_x <= input_w) & (center_y <= input_h)
+        boxes_t[:, 0:2] = np.maximum(boxes_t[:, 0:2], 0)
+        boxes_t[:, 2] = np.minimum(boxes_t[:, 2], input_w)
+        boxes_t[:, 3] = np.minimum(boxes_t[:, 3], input_h)
+        keep &= (boxes_t[:, 2] - boxes_t[:, 0] > 1) & (boxes_t[:, 3] - boxes_t[:, 1] > 1)
+
+        if keep.any():
+            # normal
+            boxes_t = boxes_t[keep] / np.array((input_w, input_h, input_w, input_h), dtype=boxes_t.dtype)
+            landms_t = landms_t[keep] / np.array((input_w, input_h), dtype=landms_t.dtype)
+            targets_t = np.hstack((boxes_t, landms_t.reshape([-1, 10]), labels[keep, None]))
             return targets_t, candidate
 
     raise Exception('all candidates can not satisfied re-correct bbox')
@@ -226,50 +190,84 @@ def color_convert(image, a=1, b=0):
 
     image[:] = c_image
 
+def _hsv_lut(saturation=None, hue=None):
+    """The lookup table of the saturation scale and hue shift of an HSV image, identity on the value."""
+    lut = np.tile(np.arange(256, dtype=np.uint8)[:, None], (1, 3))
+    if saturation is not None:
+        color_convert(lut[:, 1], a=saturation)
+    if hue is not None:
+        lut[:180, 0] = (np.arange(180) + hue) % 180
+    return lut.reshape(256, 1, 3)
+
 def color_distortion(image):
-    """color_distortion"""
-    image = copy.deepcopy(image)
+    """
+    Distort the brightness, contrast, saturation and hue of a uint8 BGR image in place.
 
+    The steps are composed into 256-entry lookup tables applied with ``cv2.LUT``, the saturation and hue
+    ones on the HSV image, so the image stays uint8 without float temporaries. The parameters are drawn
+    in the same order and from the same distributions as the steps applied one by one.
+    """
+    lut = np.arange(256, dtype=np.uint8)
+    saturation, hue, contrast = None, None, None
     if _rand() > 0.5:
         if _rand() > 0.5:
-            color_convert(image, b=_rand(-32, 32))
+            color_convert(lut, b=_rand(-32, 32))
         if _rand() > 0.5:
-            color_convert(image, a=_rand(0.5, 1.5))
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            color_convert(lut, a=_rand(0.5, 1.5))
         if _rand() > 0.5:
-            color_convert(image[:, :, 1], a=_rand(0.5, 1.5))
+            saturation = _rand(0.5, 1.5)
         if _rand() > 0.5:
-            h_img = image[:, :, 0].astype(int) + random.randint(-18, 18)
-            h_img %= 180
-            image[:, :, 0] = h_img
-        image = cv2.cvtColor(image, cv2.COLOR_HSV2BGR)
+            hue = random.randint(-18, 18)
     else:
         if _rand() > 0.5:
-            color_convert(image, b=random.uniform(-32, 32))
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            color_convert(lut, b=random.uniform(-32, 32))
         if _rand() > 0.5:
-            color_convert(image[:, :, 1], a=random.uniform(0.5, 1.5))
+            saturation = random.uniform(0.5, 1.5)
         if _rand() > 0.5:
-            tmp = image[:, :, 0].astype(int) + random.randint(-18, 18)
-            tmp %= 180
-            image[:, :, 0] = tmp
-        image = cv2.cvtColor(image, cv2.COLOR_HSV2BGR)
+            hue = random.randint(-18, 18)
         if _rand() > 0.5:
-            color_convert(image, a=random.uniform(0.5, 1.5))
+            contrast = random.uniform(0.5, 1.5)
+
+    cv2.LUT(image, lut, dst=image)
+    cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=image)
+    if saturation is not None or hue is not None:
+        cv2.LUT(image, _hsv_lut(saturation, hue), dst=image)
+    cv2.cvtColor(image, cv2.COLOR_HSV2BGR, dst=image)
+    if contrast is not None:
+        lut = np.arange(256, dtype=np.uint8)
+        color_convert(lut, a=contrast)
+        cv2.LUT(image, lut, dst=image)
 
     return image
 
 class Preproc():
-    """Preproc"""
-    def __init__(self, image_dim):
+    """
+    Preproc
+    Crop, resize and flip an image with its targets, then subtract the mean and transpose it to CHW.
+
+    The boxes and landmarks are moved by the affine matrix of the crop, scale and flip. The image is resized
+    from a view of the crop, and flipped, mean-subtracted and transposed in one pass into a new float32 array,
+    as the dataset pipeline keeps the arrays it is given. With uint8_output the image stays uint8 HWC for the
+    network to normalize, see ``InputNormalize``.
+
+    Args:
+        image_dim (Int): The size of the square input image.
+        uint8_output (Bool): Emit the flipped uint8 HWC image instead of the normalized CHW one. Default: False
+
+    Examples:
+        >>> aug = Preproc(640)
+        >>> image, targets = aug(image, target)
+    """
+    def __init__(self, image_dim, uint8_output=False):
         self.image_input_size = image_dim
+        self.uint8_output = uint8_output
+        self.mean = np.array((104, 117, 123), dtype=np.float32).reshape(3, 1, 1)
 
     def __call__(self, image, target):
         assert target.shape[0] > 0, "target without ground truth."
-        copy_target = copy.deepcopy(target)
-        boxes = copy_target[:, :4]
-        landms = copy_target[:, 4:-1]
-        labels = copy_target[:, -1]
+        boxes = target[:, :4]
+        landms = target[:, 4:-1]
+        labels = target[:, -1]
 
         aug_image, aug_target = self._data_aug(image, boxes, labels, landms, self.image_input_size)
 
@@ -294,27 +292,25 @@ class Preproc():
                                                          labels=labels,
                                                          landms=landms,
                                                          allow_outside_center=False)
-        # crop image
+
+        # the crop is a view, only the uncropped default candidate is padded to a square
         dx, dy, nw, nh = candidate
         image = image[dy:(dy + nh), dx:(dx + nw)]
-
         if nw != nh:
             assert nw == image_w and nh == image_h
-            # pad ori image to square
             l = max(nw, nh)
-            t_image = np.empty((l, l, 3), dtype=image.dtype)
-            t_image[:, :] = (104, 117, 123)
-            t_image[:nh, :nw] = image
-            image = t_image
+            image = cv2.copyMakeBorder(image, 0, l - nh, 0, l - nw, cv2.BORDER_CONSTANT, value=(104, 117, 123))
 
         interp = get_interp_method(interp=10)
         image = cv2.resize(image, (input_w, input_h), interpolation=cv_image_reshape(interp))
 
+        if self.uint8_output:
+            return (cv2.flip(image, 1) if flip else image), targets
+
+        # flip, subtract the mean and transpose in one pass
         if flip:
             image = image[:, ::-1]
+        output = np.empty((3, input_h, input_w), dtype=np.float32)
+        np.subtract(image.transpose(2, 0, 1), self.mean, out=output, dtype=np.float32)
 
-        image = image.astype(np.float32)
-        image -= (104, 117, 123)
-        image = image.transpose(2, 0, 1)
-
-        return image, targets
+        return output, targets
@@ -13,13 +13,16 @@
 
 """Dataset for train and eval."""
 import os
-import copy
 import cv2
 import numpy as np
 import mindspore.dataset as de
+from mindspore.common.seed import get_seed
 from mindspore.communication.management import init, get_rank, get_group_size
 
+from mindface.utils.resume import ResumableSampler
 from mindface.detection.datasets.augmentation import Preproc
+from mindface.detection.datasets.annotation_index import compile_index, load_index
+from mindface.detection.datasets.shards import WiderFaceShards, ShardSampler, is_shard_dir
 
 from mindface.detection.utils.box_utils import Bboxencode
 
@@ -28,120 +31,136 @@ class WiderFace():
     """
     A source dataset that reads and parses WIDERFace dataset.
 
+    The label.txt is compiled once into an annotation index saved next to it, see ``compile_index``, which is
+    rebuilt when the label.txt is newer. Every worker memory-maps the same index.
+
     Args:
-        label_path (String): Path to the root directory that contains the dataset.
+        label_path (String): Path to the label.txt of the dataset.
+        index_path (String): Path of the compiled annotation index. Default: None, label.npz next to label.txt.
 
     Examples:
-        >>> wider_face_dir = "/path/to/wider_face_dataset"
+        >>> wider_face_dir = "/path/to/wider_face_dataset/label.txt"
         >>> dataset = WiderFace(label_path = wider_face_dir)
     """
-    def __init__(self, label_path):
-        self.images_list = []
-        self.labels_list = []
-        with open (label_path, mode = "r",encoding = "utf-8") as file:
-            lines = file.readlines()
-        first = True
-        labels = []
-        for line in lines:
-            line = line.rstrip()
-            if line.startswith('#'):
-                if first is True:
-                    first = False
-                else:
-                    c_labels = copy.deepcopy(labels)
-                    self.labels_list.append(c_labels)
-                    labels.clear()
-                # remove '# '
-                path = line[2:]
-                path = label_path.replace('label.txt', 'images/') + path
-
-                assert os.path.exists(path), 'image path is not exists.'
-
-                self.images_list.append(path)
-            else:
-                line = line.split(' ')
-                label = [float(x) for x in line]
-                labels.append(label)
-        # add the last label
-        self.labels_list.append(labels)
-
-        # del bbox which width is zero or height is zero
-        for i in range(len(self.labels_list) - 1, -1, -1):
-            labels = self.labels_list[i]
-            for j in range(len(labels) - 1, -1, -1):
-                label = labels[j]
-                if label[2] <= 0 or label[3] <= 0:
-                    labels.pop(j)
-            if not labels:
-                self.images_list.pop(i)
-                self.labels_list.pop(i)
-            else:
-                self.labels_list[i] = labels
+    def __init__(self, label_path, index_path=None):
+        self.images_dir = os.path.join(os.path.dirname(label_path), 'images')
+        self.index_path = index_path or os.path.splitext(label_path)[0] + '.npz'
+        self.index = None
+        if not os.path.exists(self.index_path) or \
+                os.path.getmtime(self.index_path) < os.path.getmtime(label_path):
+            try:
+                compile_index(label_path, self.index_path)
+            except OSError:
+                # the dataset folder is read-only, keep the index in memory
+                self.index = compile_index(label_path)
+                self.index_path = None
+        if self.index is None:
+            self.index = load_index(self.index_path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.index_path is not None:
+            # pickling a memmap copies its data, the worker maps the file again instead
+            state['index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.index is None:
+            self.index = load_index(self.index_path)
 
     def __len__(self):
-        return len(self.images_list)
+        return self.index['offsets'].shape[0] - 1
 
     def __getitem__(self, item):
-        return self.images_list[item], self.labels_list[item]
+        offsets = self.index['offsets']
+        path = os.path.join(self.images_dir, str(self.index['paths'][item]))
+        return path, np.array(self.index['targets'][offsets[item]:offsets[item + 1]])
 
 def read_dataset(img_path, annotation):
     """
     Read the data from a python function.
 
     Args:
-        img_path (String): The path of dataset.
-        annotation (Dict): The annotation file related to image.
+        img_path (String): The path of the image, or its encoded bytes as a uint8 array from ``WiderFaceShards``.
+        annotation (Numpy): The targets of the image from the annotation index, [num_faces, 15].
 
     Returns:
         img (Object), a batch of data.
         target (Object), a batch of label.
 
     Examples:
-        >>> img_path = "/path/to/wider_face_dataset"
+        >>> img_path, annotation = dataset[0]
         >>> image, target = read_dataset(img_path, annotation)
     """
-    cv2.setNumThreads(2)
-
     if isinstance(img_path, str):
         img = cv2.imread(img_path)
+    elif img_path.dtype == np.uint8:
+        img = cv2.imdecode(img_path, cv2.IMREAD_COLOR)
     else:
         img = cv2.imread(img_path.tostring().decode("utf-8"))
 
-    labels = annotation
-    anns = np.zeros((0, 15))
-    if labels.shape[0] <= 0:
-        return anns
-    for _, label in enumerate(labels):
-        ann = np.zeros((1, 15))
+    target = np.asarray(annotation, dtype=np.float32)
 
-        # get bbox
-        ann[0, 0:2] = label[0:2]  # x1, y1
-        ann[0, 2:4] = label[0:2] + label[2:4]  # x2, y2
+    return img, target
 
-        # get landmarks
-        ann[0, 4:14] = label[[4, 5, 7, 8, 10, 11, 13, 14, 16, 17]]
+def pad_faces(image, annotation, max_faces):
+    """Pad the targets of an image to [max_faces, 15] with zero rows, keeping its max_faces largest faces."""
+    if annotation.shape[0] > max_faces:
+        area = (annotation[:, 2] - annotation[:, 0]) * (annotation[:, 3] - annotation[:, 1])
+        annotation = annotation[np.sort(np.argsort(-area, kind='stable')[:max_faces])]
+    gt = np.zeros((max_faces, 15), dtype=np.float32)
+    gt[:annotation.shape[0]] = annotation
+    return image, gt
 
-        # set flag
-        if (ann[0, 4] < 0):
-            ann[0, 14] = -1
-        else:
-            ann[0, 14] = 1
+class SampleTransform():
+    """
+    The read, augmentation and encoding of a sample as one function, so a single map stage emits the final
+    columns and the decoded image is not pickled between the worker processes of several stages.
 
-        anns = np.append(anns, ann, axis=0)
-    target = np.array(anns).astype(np.float32)
+    Args:
+        aug (Preproc): The augmentation.
+        encode (Bboxencode): The encoding of the targets. Default: None, emit the augmented image and targets.
+        read (Bool): Whether the image column is a path or encoded bytes to read with ``read_dataset``. Default: True
+        max_faces (Int): Pad the targets to [max_faces, 15] instead of encoding them. Default: None
+        core_plan (CorePlan): Sets the threads of the worker on its first sample. Default: None
 
-    return img, target
+    Examples:
+        >>> transform = SampleTransform(Preproc(640), Bboxencode([0.1, 0.2], 0.35, 640))
+        >>> image, truths, conf, landm = transform(*dataset[0])
+    """
+    def __init__(self, aug, encode=None, read=True, max_faces=None, core_plan=None):
+        self.aug = aug
+        self.encode = encode
+        self.read = read
+        self.max_faces = max_faces
+        self.core_plan = core_plan
+
+    def __call__(self, image, annotation):
+        if self.core_plan is not None:
+            self.core_plan.init_worker()
+        if self.read:
+            image, annotation = read_dataset(image, annotation)
+        image, annotation = self.aug(image, annotation)
+        if self.max_faces:
+            return pad_faces(image, annotation, self.max_faces)
+        if self.encode is not None:
+            return self.encode(image, annotation)
+        return image, annotation
 
 
 def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, clip=False, batch_size=32,
-                        repeat_num=1, shuffle=True, multiprocessing=True, num_worker=4, is_distribute=False):
+                        repeat_num=1, shuffle=True, multiprocessing=True, num_worker=4, is_distribute=False,
+                        anchor_cfg=None, batch_encode=False, max_faces=None, fuse_stages=False,
+                        uint8_output=False, core_plan=None, start_epoch=None, skip_steps=0):
     """
     Create a callable dataloader from a python function.
 
     This allows us to get all kinds of face-related data sets.
 
     Args:
-        data_dir (String): The path of dataset.
+        data_dir (String): The path of the label.txt of the dataset, or a folder of shards written by
+            ``pack_shards``, read shard after shard with a ``ShardSampler``.
         variance (List): The variance of the data. Default: None
         match_thresh (Float): The threshold of match the ground truth. Default: 0.35
         image_size (Int): The image size of per image. Default: 640
@@ -152,6 +171,22 @@ def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, c
         multiprocessing (Bool): Parallelize Python function per_batch_map with multi-processing. Default: True
         num_worker (Int): The number of child processes that process data in parallel. Default: 4
         is_distribute (Bool): Distributed training parameters. Default: False
+        anchor_cfg (AnchorConfig): The anchors the targets are matched to. Default: None, the default AnchorConfig.
+        batch_encode (Bool): Match the targets of a whole batch at once in the per_batch_map of the batch
+            instead of one sample at a time. Default: False
+        max_faces (Int): Pad the ground truths of every image to [max_faces, 15] instead of encoding the targets,
+            for ``PriorMatcher`` to encode them on the device. Only the max_faces largest faces of an image are
+            kept. Default: None, encode on the host.
+        fuse_stages (Bool): Read, augment and encode every sample in one map stage of num_worker workers instead
+            of one stage per step, which pickles every sample once instead of once per stage. Default: False
+        uint8_output (Bool): Emit uint8 HWC images for ``InputNormalize`` to normalize inside the network, instead
+            of float32 CHW images with the mean subtracted. Default: False
+        core_plan (CorePlan): Sets the cv2 threads and the cores of the workers that read and augment the images.
+            Default: None
+        start_epoch (Int): Draw the samples with a ``ResumableSampler`` of the global seed from this epoch, so a
+            resumed training continues the order of the interrupted one. Default: None, the sampler of MindSpore,
+            or a ``ShardSampler`` from epoch 0 for shards.
+        skip_steps (Int): The steps to skip at the begin of every epoch of the sampler of start_epoch. Default: 0
 
     Returns:
         de_dataset (Object): Data loader.
@@ -161,7 +196,8 @@ def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, c
         >>> ds_train = create_dataset(data_dir, variance=[0.1,0.2], match_thresh=0.35, image_size=640, clip=False,
                 batch_size=32, repeat_num=1, shuffle=True,multiprocessing=True, num_worker=4, is_distribute=False)
     """
-    dataset = WiderFace(data_dir)
+    from_shards = is_shard_dir(data_dir)
+    dataset = WiderFaceShards(data_dir) if from_shards else WiderFace(data_dir)
     variance = variance or [0.1, 0.2]
     if is_distribute:
         init("nccl")
@@ -171,7 +207,18 @@ def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, c
         rank_id = 0
         device_num = 1
 
-    if device_num == 1:
+    sampler = None
+    if from_shards:
+        sampler = ShardSampler(dataset.index['shards'], shuffle, get_seed() or 0, device_num, rank_id,
+                               start_epoch or 0, skip_steps * batch_size)
+    elif start_epoch is not None:
+        sampler = ResumableSampler(len(dataset), shuffle, get_seed() or 0, device_num, rank_id,
+                                   start_epoch, skip_steps * batch_size)
+    if sampler is not None:
+        de_dataset = de.GeneratorDataset(dataset, ["image", "annotation"],
+                                         sampler=sampler,
+                                         num_parallel_workers=num_worker)
+    elif device_num == 1:
         de_dataset = de.GeneratorDataset(dataset, ["image", "annotation"],
                                          shuffle=shuffle,
                                          num_parallel_workers=num_worker)
@@ -182,14 +229,18 @@ def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, c
                                          num_shards=device_num,
                                          shard_id=rank_id)
 
-    aug = Preproc(image_size)
-    encode = Bboxencode(variance, match_thresh, image_size, clip)
+    aug = Preproc(image_size, uint8_output)
+    encode = Bboxencode(variance, match_thresh, image_size, clip, anchor_cfg)
 
     def read_data_from_dataset(image, annot):
+        if core_plan is not None:
+            core_plan.init_worker()
         i, a = read_dataset(image, annot)
         return i, a
 
     def augmentation(image, annot):
+        if core_plan is not None:
+            core_plan.init_worker()
         i, a = aug(image, annot)
         return i, a
 
@@ -197,26 +248,52 @@ def create_dataset(data_dir, variance=None, match_thresh=0.35, image_size=640, c
         out = encode(image, annot)
         return out
 
-    de_dataset = de_dataset.map(input_columns=["image", "annotation"],
-                                output_columns=["image", "annotation"],
-                                column_order=["image", "annotation"],
-                                operations=read_data_from_dataset,
-                                python_multiprocessing=multiprocessing,
-                                num_parallel_workers=num_worker)
-    de_dataset = de_dataset.map(input_columns=["image", "annotation"],
-                                output_columns=["image", "annotation"],
-                                column_order=["image", "annotation"],
-                                operations=augmentation,
-                                python_multiprocessing=multiprocessing,
-                                num_parallel_workers=num_worker)
-    de_dataset = de_dataset.map(input_columns=["image", "annotation"],
-                                output_columns=["image", "truths", "conf", "landm"],
-                                column_order=["image", "truths", "conf", "landm"],
-                                operations=encode_data,
-                                python_multiprocessing=multiprocessing,
-                                num_parallel_workers=num_worker)
-
-    de_dataset = de_dataset.batch(batch_size, drop_remainder=True)
+    def pad_data(image, annot):
+        return pad_faces(image, annot, max_faces)
+
+    # the per_batch_map of the batch encodes the targets of batch_encode and the device matches max_faces
+    encode_per_sample = not max_faces and not batch_encode
+    columns = ["image", "truths", "conf", "landm"] if encode_per_sample else ["image", "annotation"]
+    if fuse_stages:
+        transform = SampleTransform(aug, encode if encode_per_sample else None,
+                                    max_faces=max_faces, core_plan=core_plan)
+        de_dataset = de_dataset.map(input_columns=["image", "annotation"],
+                                    output_columns=columns,
+                                    column_order=columns,
+                                    operations=transform,
+                                    python_multiprocessing=multiprocessing,
+                                    num_parallel_workers=num_worker)
+    else:
+        de_dataset = de_dataset.map(input_columns=["image", "annotation"],
+                                    output_columns=["image", "annotation"],
+                                    column_order=["image", "annotation"],
+                                    operations=read_data_from_dataset,
+                                    python_multiprocessing=multiprocessing,
+                                    num_parallel_workers=num_worker)
+        de_dataset = de_dataset.map(input_columns=["image", "annotation"],
+                                    output_columns=["image", "annotation"],
+                                    column_order=["image", "annotation"],
+                                    operations=augmentation,
+                                    python_multiprocessing=multiprocessing,
+                                    num_parallel_workers=num_worker)
+        if max_faces or encode_per_sample:
+            de_dataset = de_dataset.map(input_columns=["image", "annotation"],
+                                        output_columns=columns,
+                                        column_order=columns,
+                                        operations=pad_data if max_faces else encode_data,
+                                        python_multiprocessing=multiprocessing,
+                                        num_parallel_workers=num_worker)
+
+    if batch_encode and not max_faces:
+        de_dataset = de_dataset.batch(batch_size, drop_remainder=True,
+                                      per_batch_map=encode.encode_batch,
+                                      input_columns=["image", "annotation"],
+                                      output_columns=["image", "truths", "conf", "landm"],
+                                      column_order=["image", "truths", "conf", "landm"],
+                                      python_multiprocessing=multiprocessing,
+                                      num_parallel_workers=num_worker)
+    else:
+        de_dataset = de_dataset.batch(batch_size, drop_remainder=True)
     de_dataset = de_dataset.repeat(repeat_num)
 
 
@@ -0,0 +1,109 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Downscaled image cache of WiderFace."""
+import os
+import shutil
+from multiprocessing import Pool
+import cv2
+import numpy as np
+
+from mindface.detection.datasets.annotation_index import compile_index
+
+
+def _resize_image(args):
+    """Write the downscaled copy of one image, return the scales of its x and y axes."""
+    src, dst, max_short_side, quality = args
+    img = cv2.imread(src, cv2.IMREAD_COLOR)
+    height, width = img.shape[:2]
+    scale = min(1.0, max_short_side / min(height, width))
+    size = (round(width * scale), round(height * scale))
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # an interrupted or concurrent build never leaves a partial image at dst
+        tmp_path = f'{dst}.{os.getpid()}.tmp'
+        if scale == 1.0:
+            shutil.copyfile(src, tmp_path)
+        else:
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+            _, data = cv2.imencode(os.path.splitext(dst)[1] or '.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            data.tofile(tmp_path)
+        os.replace(tmp_path, dst)
+    return size[0] / width, size[1] / height
+
+def _label_line(target):
+    """Format a target of the annotation index as a line of label.txt."""
+    values = [target[0], target[1], target[2] - target[0], target[3] - target[1]]
+    for k in range(5):
+        if target[14] < 0:
+            values += [-1.0, -1.0, -1.0]
+        else:
+            values += [target[4 + 2 * k], target[5 + 2 * k], 0.0]
+    values.append(1.0)
+    return ' '.join(f'{value:.7g}' for value in values)
+
+def build_resized_cache(label_path, cache_dir, max_short_side=640, num_workers=None, quality=95):
+    """
+    Store every image of a WiderFace label.txt downscaled so that its short side is at most max_short_side.
+
+    The crops of ``Preproc`` are sized relative to the short side and resized to the input size afterwards,
+    so sampling from the downscaled images yields the same crops and targets, only with less detail in the
+    crops smaller than the input size. The cache of a max_short_side and quality is the folder
+    ``{max_short_side}_q{quality}`` of cache_dir, so changing either builds a new cache. It holds a label.txt
+    with the rescaled annotations and an images folder, and works everywhere a WiderFace label.txt does. It
+    is built once with num_workers processes and reused as long as it is newer than label_path. Every file is
+    written to a temporary file and renamed into place, so the ranks of a distributed training may build it
+    at the same time.
+
+    Args:
+        label_path (String): The path of label.txt.
+        cache_dir (String): The folder of the caches.
+        max_short_side (Int): The largest short side of the cached images. Default: 640.
+        num_workers (Int): The processes that resize the images. Default: None, one per CPU.
+        quality (Int): The JPEG quality of the resized images. Default: 95.
+
+    Returns:
+        cache_label_path (String), the label.txt of the cache.
+
+    Examples:
+        >>> training_dataset = build_resized_cache('data/WiderFace/train/label.txt', 'data/WiderFace/train_640')
+    """
+    cache_dir = os.path.join(cache_dir, f'{max_short_side}_q{quality}')
+    cache_label_path = os.path.join(cache_dir, 'label.txt')
+    if os.path.exists(cache_label_path) and os.path.getmtime(cache_label_path) >= os.path.getmtime(label_path):
+        return cache_label_path
+
+    index = compile_index(label_path)
+    images_dir = os.path.join(os.path.dirname(label_path), 'images')
+    tasks = [(os.path.join(images_dir, str(path)), os.path.join(cache_dir, 'images', str(path)),
+              max_short_side, quality) for path in index['paths']]
+    with Pool(num_workers) as pool:
+        scales = pool.map(_resize_image, tasks, chunksize=16)
+
+    offsets, targets = index['offsets'], index['targets'].copy()
+    lines = []
+    for i, (path, scale) in enumerate(zip(index['paths'], scales)):
+        faces = targets[offsets[i]:offsets[i + 1]]
+        # x and y alternate in the boxes and landmarks, missing landmarks stay -1
+        scale = np.tile(np.array(scale, dtype=np.float32), 7)
+        faces[:, :4] *= scale[:4]
+        faces[faces[:, 14] >= 0, 4:14] *= scale[:10]
+        lines.append(f'# {path}')
+        lines += [_label_line(face) for face in faces]
+
+    # label.txt is written last, so an interrupted build is resumed instead of reused
+    tmp_path = f'{cache_label_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, cache_label_path)
+    return cache_label_path
@@ -0,0 +1,161 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Packed shards of WiderFace images."""
+import os
+import mmap
+import numpy as np
+
+from mindface.detection.datasets.annotation_index import compile_index, load_index
+from mindface.utils.resume import ResumableSampler
+
+SHARD_INDEX = 'index.npz'
+
+
+def is_shard_dir(data_dir):
+    """Whether data_dir holds shards written by ``pack_shards``."""
+    return os.path.isdir(data_dir) and os.path.exists(os.path.join(data_dir, SHARD_INDEX))
+
+def _permute_index(index, order):
+    """The annotation index of the images in the given order."""
+    offsets = index['offsets']
+    counts = np.diff(offsets)[order]
+    targets = [index['targets'][offsets[i]:offsets[i + 1]] for i in order]
+    return {'targets': np.concatenate(targets, axis=0) if targets else index['targets'],
+            'offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            'paths': index['paths'][order]}
+
+def pack_shards(label_path, output_dir, shard_size=1 << 30, seed=0):
+    """
+    Pack the images of a WiderFace label.txt into a few large shard files.
+
+    Every shard holds the raw JPEG bytes of consecutive images. The images are packed in a random order, so
+    a shard read from start to end, see ``ShardSampler``, is not grouped by the events of label.txt.
+    index.npz holds the annotation index of ``compile_index`` in the packed order and, for every image, its
+    shard and the byte range in it.
+
+    Args:
+        label_path (String): The path of label.txt.
+        output_dir (String): The folder of the shards.
+        shard_size (Int): Start a new shard once a shard reaches this many bytes. Default: 1 << 30.
+        seed (Int): The seed of the packed order. Default: 0.
+
+    Returns:
+        num_shards (Int), the number of shards written.
+
+    Examples:
+        >>> pack_shards('data/WiderFace/train/label.txt', 'data/WiderFace/train/shards')
+    """
+    index = compile_index(label_path)
+    index = _permute_index(index, np.random.default_rng(seed).permutation(index['paths'].shape[0]))
+    images_dir = os.path.join(os.path.dirname(label_path), 'images')
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_images = index['paths'].shape[0]
+    shards = np.zeros(num_images, dtype=np.int32)
+    starts = np.zeros(num_images, dtype=np.int64)
+    sizes = np.zeros(num_images, dtype=np.int64)
+    shard_id, file = -1, None
+    for i, path in enumerate(index['paths']):
+        if file is None or file.tell() >= shard_size:
+            if file is not None:
+                file.close()
+            shard_id += 1
+            file = open(os.path.join(output_dir, f'shard-{shard_id:05d}.bin'), 'wb')
+        with open(os.path.join(images_dir, str(path)), 'rb') as image_file:
+            data = image_file.read()
+        shards[i], starts[i], sizes[i] = shard_id, file.tell(), len(data)
+        file.write(data)
+    if file is not None:
+        file.close()
+
+    np.savez(os.path.join(output_dir, SHARD_INDEX), shards=shards, starts=starts, sizes=sizes, **index)
+    return shard_id + 1
+
+class ShardSampler(ResumableSampler):
+    """
+    Draw the images of the shards of ``pack_shards`` shard by shard, the shards in a random order of the seed
+    and the epoch and every shard from start to end, so the shards are read sequentially instead of at random
+    offsets. The images were shuffled when packed.
+
+    Args:
+        shards (Numpy): The shard of every image, the shards of the index of ``WiderFaceShards``.
+        shuffle (Bool): Shuffle the shards of every epoch. Default: True.
+        seed (Int): The seed of the orders. Default: 0.
+        num_shards (Int): The shards of distributed training. Default: 1.
+        shard_id (Int): The shard of this device. Default: 0.
+        start_epoch (Int): The epoch of the first order drawn. Default: 0.
+        skip_samples (Int): The samples of this device to skip in every epoch. Default: 0.
+
+    Examples:
+        >>> source = WiderFaceShards('data/WiderFace/train/shards')
+        >>> dataset = de.GeneratorDataset(source, ["image", "annotation"], sampler=ShardSampler(source.index['shards']))
+    """
+    def __init__(self, shards, shuffle=True, seed=0, num_shards=1, shard_id=0, start_epoch=0, skip_samples=0):
+        shards = np.asarray(shards)
+        # pack_shards writes every shard as a run of consecutive images
+        self.bounds = np.flatnonzero(np.diff(shards, prepend=-1, append=-1))
+        super().__init__(shards.shape[0], shuffle, seed, num_shards, shard_id, start_epoch, skip_samples)
+
+    def order(self, epoch):
+        runs = np.arange(self.bounds.shape[0] - 1)
+        if self.shuffle:
+            runs = np.random.default_rng([self.seed, epoch]).permutation(runs)
+        return np.concatenate([np.arange(self.bounds[run], self.bounds[run + 1]) for run in runs] or [runs])
+
+class WiderFaceShards():
+    """
+    A source dataset that reads WiderFace images from the shards written by ``pack_shards``.
+
+    Every sample is the encoded bytes of an image, copied from a memory-mapped shard, for the map workers
+    to decode with ``read_dataset``. Reading the dataset turns into a few large files instead of one small
+    file per image, sequential ones with a ``ShardSampler``.
+
+    Args:
+        shard_dir (String): The folder of the shards.
+
+    Examples:
+        >>> dataset = WiderFaceShards('data/WiderFace/train/shards')
+        >>> image, target = read_dataset(*dataset[0])
+    """
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.index = load_index(os.path.join(shard_dir, SHARD_INDEX))
+        self.shards = {}
+
+    def __getstate__(self):
+        # every worker maps the files again instead of pickling their contents
+        state = self.__dict__.copy()
+        state['index'] = None
+        state['shards'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index = load_index(os.path.join(self.shard_dir, SHARD_INDEX))
+
+    def _shard(self, shard_id):
+        """The memory map of a shard, opened on first use."""
+        if shard_id not in self.shards:
+            with open(os.path.join(self.shard_dir, f'shard-{shard_id:05d}.bin'), 'rb') as file:
+                self.shards[shard_id] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.shards[shard_id]
+
+    def __len__(self):
+        return self.index['offsets'].shape[0] - 1
+
+    def __getitem__(self, item):
+        start, size = int(self.index['starts'][item]), int(self.index['sizes'][item])
+        data = np.frombuffer(self._shard(int(self.index['shards'][item])), dtype=np.uint8, count=size, offset=start)
+        offsets = self.index['offsets']
+        return data.copy(), np.array(self.index['targets'][offsets[item]:offsets[item + 1]])
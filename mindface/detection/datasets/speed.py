@@ -0,0 +1,53 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Stage throughput of the WiderFace training loader."""
+import numpy as np
+
+from mindface.utils import time_stage
+from mindface.detection.datasets.augmentation import Preproc
+from mindface.detection.datasets.dataset import WiderFace, read_dataset
+from mindface.detection.datasets.shards import WiderFaceShards, is_shard_dir
+from mindface.detection.utils.box_utils import Bboxencode, AnchorConfig
+
+
+def stage_speed(cfg, num_samples=32):
+    """The samples per second of one worker in the read, augment, encode and batch stages."""
+    data_dir = cfg['training_dataset']
+    source = WiderFaceShards(data_dir) if is_shard_dir(data_dir) else WiderFace(data_dir)
+
+    def read(item):
+        return read_dataset(*source[item])
+
+    batch_size = cfg['batch_size']
+    num_samples = max(batch_size, min(num_samples, len(source)) // batch_size * batch_size)
+    aug = Preproc(cfg['image_size'], cfg['uint8_input'])
+    encode = Bboxencode(cfg['variance'], cfg['match_thresh'], cfg['image_size'], cfg['clip'],
+                        AnchorConfig.from_config(cfg))
+
+    stages = {}
+    stages['read'], samples = time_stage(read, [(i % len(source),) for i in range(num_samples)])
+    stages['augment'], samples = time_stage(aug, samples)
+    batches = [samples[i:i + batch_size] for i in range(0, num_samples, batch_size)]
+    if cfg['batch_encode']:
+        batches_per_second, batches = time_stage(lambda batch: encode.encode_batch(*zip(*batch)),
+                                                 [(batch,) for batch in batches])
+        stages['encode'] = batches_per_second * batch_size
+        batches = [list(zip(*batch)) for batch in batches]
+    else:
+        stages['encode'], samples = time_stage(encode, samples)
+        batches = [samples[i:i + batch_size] for i in range(0, num_samples, batch_size)]
+    batches_per_second, _ = time_stage(lambda batch: [np.stack(column) for column in zip(*batch)],
+                                       [(batch,) for batch in batches])
+    stages['batch'] = batches_per_second * batch_size
+    return stages
@@ -18,38 +18,37 @@ import numpy as np
 import cv2
 
 from mindspore import Tensor, context
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
+from mindspore.train.serialization import load_param_into_net
 from mindspore import ops
 
-from utils import prior_box
-from models import RetinaFace, resnet50, mobilenet025
+from mindface.utils import fuse_for_inference, slim_channels, CorePlan, load_delta_checkpoint
+from utils import AnchorConfig
+from models import RetinaFace, build_backbone
 from runner import DetectionEngine, Timer, read_yaml
 
-def val(cfg):
-    """val"""
-    if cfg['mode'] == 'Graph':
-        context.set_context(mode=context.GRAPH_MODE, device_target=cfg['device_target'])
-    else :
-        context.set_context(mode=context.PYNATIVE_MODE, device_target = cfg['device_target'])
-
-
-    if cfg['name'] == 'ResNet50':
-        backbone = resnet50(1001)
-    elif cfg['name'] == 'MobileNet025':
-        backbone = mobilenet025(1000)
-    network = RetinaFace(phase='predict',backbone=backbone,in_channel=cfg['in_channel'],out_channel=cfg['out_channel'])
+def build_network(cfg):
+    """Build the RetinaFace predict network and load cfg['val_model'] into it."""
+    backbone = build_backbone(cfg['name'])
+    network = RetinaFace(phase='predict', backbone=backbone, out_channel=cfg['out_channel'],
+                         anchor_cfg=AnchorConfig.from_config(cfg))
     backbone.set_train(False)
     network.set_train(False)
+    if cfg['prune_widths']:
+        network = slim_channels(network, cfg['prune_widths'])
 
     # load checkpoint
     assert cfg['val_model'] is not None, 'val_model is None.'
-    param_dict = load_checkpoint(cfg['val_model'])
+    param_dict = load_delta_checkpoint(cfg['val_model'])
     print(f"Load trained model done. {cfg['val_model']}")
     network.init_parameters_data()
     load_param_into_net(network, param_dict)
+    if cfg['val_fuse_bn']:
+        network = fuse_for_inference(network)
+        print("Folded the BatchNorm layers into their Conv2d and Dense layers.")
+    return network
 
-    # testing dataset
-    testset_folder = cfg['val_dataset_folder']
+def read_test_dataset(cfg):
+    """Return the image names listed in the label.txt of cfg['val_dataset_folder']."""
     testset_label_path = cfg['val_dataset_folder'] + "label.txt"
     with open(testset_label_path, 'r', encoding = 'utf-8') as file:
         all_test_dataset = file.readlines()
@@ -57,10 +56,17 @@ def val(cfg):
         for im_path in all_test_dataset:
             if im_path.startswith('# '):
                 test_dataset.append(im_path[2:-1])  # delete '# ...\n'
+    return test_dataset
+
+def predict(network, cfg, detection):
+    """Run the multi-scale prediction of every val image and add it to the detection engine."""
+    testset_folder = cfg['val_dataset_folder']
+    test_dataset = read_test_dataset(cfg)
 
     num_images = len(test_dataset)
 
     timers = {'forward_time': Timer(), 'misc': Timer()}
+    anchor_cfg = AnchorConfig.from_config(cfg)
 
     if cfg['val_origin_size']:
         h_max, w_max = 0, 0
@@ -75,23 +81,11 @@ def val(cfg):
         h_max = (int(h_max / 32) + 1) * 32
         w_max = (int(w_max / 32) + 1) * 32
 
-        priors = prior_box(image_sizes=(h_max, w_max),
-                           min_sizes=[[16, 32], [64, 128], [256, 512]],
-                           steps=[8, 16, 32],
-                           clip=False)
+        priors = anchor_cfg.priors((h_max, w_max), clip=False)
     else:
         target_size = 1600
         max_size = 2160
-        priors = prior_box(image_sizes=(max_size, max_size),
-                           min_sizes=[[16, 32], [64, 128], [256, 512]],
-                           steps=[8, 16, 32],
-                           clip=False)
-
-    # init detection engine
-    detection = DetectionEngine(nms_thresh=cfg['val_nms_threshold'], conf_thresh=cfg['val_confidence_threshold'],
-        iou_thresh=cfg['val_iou_threshold'], var=cfg['variance'],
-        save_prefix=cfg['val_predict_save_folder'], gt_dir=cfg['val_gt_dir'])
-
+        priors = anchor_cfg.priors((max_size, max_size), clip=False)
 
     # testing begin
     print('Predict box starting')
@@ -171,15 +165,34 @@ def val(cfg):
     print(f"ave_forward_pass_time: {(ave_forward_pass_time/(i+1)):.4f}s")
     print(f"ave_misc: {(ave_misc/(i+1)):.4f}s")
     print('Predict box done.')
+
+    return ave_forward_pass_time / (i + 1)
+
+def val(cfg):
+    """val"""
+    if cfg['mode'] == 'Graph':
+        context.set_context(mode=context.GRAPH_MODE, device_target=cfg['device_target'])
+    else :
+        context.set_context(mode=context.PYNATIVE_MODE, device_target = cfg['device_target'])
+    CorePlan.from_config(cfg).apply()
+
+    network = build_network(cfg)
+
+    # init detection engine
+    detection = DetectionEngine(nms_thresh=cfg['val_nms_threshold'], conf_thresh=cfg['val_confidence_threshold'],
+        iou_thresh=cfg['val_iou_threshold'], var=cfg['variance'], gt_dir=cfg['val_gt_dir'])
+
+    predict(network, cfg, detection)
     print('Eval starting')
 
     if cfg['val_save_result']:
         # Save the predict result if you want.
-        predict_result_path = detection.write_result()
+        predict_result_path = detection.write_result(cfg['val_predict_save_folder'])
         print(f'predict result path is {predict_result_path}')
 
-    detection.get_eval_result()
+    ap_dict = detection.get_eval_result()
     print('Eval done.')
+    return ap_dict
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='val')
@@ -17,10 +17,11 @@ import numpy as np
 import cv2
 
 from mindspore import Tensor, context
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
+from mindspore.train.serialization import load_param_into_net
 
-from utils import prior_box
-from models import RetinaFace, resnet50, mobilenet025
+from mindface.utils import fuse_for_inference, slim_channels, CorePlan, load_delta_checkpoint
+from utils import AnchorConfig
+from models import RetinaFace, build_backbone
 from runner import DetectionEngine, read_yaml
 
 def infer(cfg):
@@ -29,25 +30,30 @@ def infer(cfg):
         context.set_context(mode=context.GRAPH_MODE, device_target=cfg['device_target'])
     else :
         context.set_context(mode=context.PYNATIVE_MODE, device_target = cfg['device_target'])
+    CorePlan.from_config(cfg).apply()
 
-    if cfg['name'] == 'ResNet50':
-        backbone = resnet50(1001)
-    elif cfg['name'] == 'MobileNet025':
-        backbone = mobilenet025(1000)
-    network = RetinaFace(phase='predict',backbone=backbone,in_channel=cfg['in_channel'],out_channel=cfg['out_channel'])
+    backbone = build_backbone(cfg['name'])
+    network = RetinaFace(phase='predict', backbone=backbone, out_channel=cfg['out_channel'],
+                         anchor_cfg=AnchorConfig.from_config(cfg))
     backbone.set_train(False)
     network.set_train(False)
+    if cfg['prune_widths']:
+        network = slim_channels(network, cfg['prune_widths'])
 
     # load checkpoint
     assert cfg['val_model'] is not None, 'val_model is None.'
-    param_dict = load_checkpoint(cfg['val_model'])
+    param_dict = load_delta_checkpoint(cfg['val_model'])
     print(f"Load trained model done. {cfg['val_model']}")
     network.init_parameters_data()
     load_param_into_net(network, param_dict)
+    if cfg['val_fuse_bn']:
+        network = fuse_for_inference(network)
+        print("Folded the BatchNorm layers into their Conv2d and Dense layers.")
 
     # testing image
 
     conf_test = cfg['conf']
+    anchor_cfg = AnchorConfig.from_config(cfg)
     test_origin_size = False
     image_path = cfg['image_path']
 
@@ -63,17 +69,11 @@ def infer(cfg):
         h_max = (int(h_max / 32) + 1) * 32
         w_max = (int(w_max / 32) + 1) * 32
 
-        priors = prior_box(image_sizes=(h_max, w_max),
-                           min_sizes=[[16, 32], [64, 128], [256, 512]],
-                           steps=[8, 16, 32],
-                           clip=False)
+        priors = anchor_cfg.priors((h_max, w_max), clip=False)
     else:
         target_size = 1600
         max_size = 2176
-        priors = prior_box(image_sizes=(max_size, max_size),
-                            min_sizes=[[16, 32], [64, 128], [256, 512]],
-                            steps=[8, 16, 32],
-                            clip=False)
+        priors = anchor_cfg.priors((max_size, max_size), clip=False)
     detection = DetectionEngine(nms_thresh = cfg['val_nms_threshold'], conf_thresh = cfg['val_confidence_threshold'],
                                     iou_thresh = cfg['val_iou_threshold'], var = cfg['variance'])
 
@@ -1,4 +1,5 @@
 """loss init"""
 from .loss import MultiBoxLoss, SoftmaxCrossEntropyWithLogits
+from .matcher import PriorMatcher
 
-__all__ = ['MultiBoxLoss']
\ No newline at end of file
+__all__ = ['MultiBoxLoss', 'PriorMatcher']
\ No newline at end of file
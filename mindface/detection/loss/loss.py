@@ -43,17 +43,23 @@ class MultiBoxLoss(nn.Cell):
 
     Args:
         num_classes (Int): The number of classes.
-        num_boxes (Int): The number of classes.
+        num_boxes (Int): The number of priors, see ``AnchorConfig.num_priors``.
         neg_pre_positive (Int): Negative and Positive sample ratios.
+        mining (Str): How the hard negatives are mined, 'sort' ranks every anchor with two sorts, 'threshold'
+            takes the loss of the k-th hardest negative of every image from one sort and computes the
+            cross entropy once, with the same loss. Default: 'sort'.
 
     Returns:
         loss_l, loss_c, loss_landm (Tensor): Face Boxes Loss, Classfication Loss, LandMarks Loss.
 
     Examples:
-        >>> multibox_loss = MultiBoxLoss(num_classes=2, num_anchor=16800, negative_ratio=7)
+        >>> multibox_loss = MultiBoxLoss(num_classes=2, num_boxes=16800, neg_pre_positive=7, mining='threshold')
     """
-    def __init__(self, num_classes, num_boxes, neg_pre_positive):
+    def __init__(self, num_classes, num_boxes, neg_pre_positive, mining='sort'):
         super().__init__()
+        if mining not in ('sort', 'threshold'):
+            raise ValueError(f"mining must be 'sort' or 'threshold', but got {mining}.")
+        self.mining = mining
         self.num_classes = num_classes
         self.num_boxes = num_boxes
         self.neg_pre_positive = neg_pre_positive
@@ -76,11 +82,15 @@ class MultiBoxLoss(nn.Cell):
         self.reduce_sum2 = P.ReduceSum(keep_dims=True)
         self.mul = P.Mul()
         self.reduce_sum_new = P.ReduceSum(keep_dims=True)
+        self.gather_d = P.GatherD()
+        self.greater = P.Greater()
+        self.equal = P.Equal()
+        self.zero = Tensor(0.0, mstype.float32)
 
     def construct(self, loc_data, loc_t, conf_data, conf_t, landm_data, landm_t):
         """construct"""
         # landm loss
-        mask_pos1 = F.cast(self.less(0.0, F.cast(conf_t, mstype.float32)), mstype.float32)
+        mask_pos1 = F.cast(self.less(self.zero, F.cast(conf_t, mstype.float32)), mstype.float32)
 
         num_1 = self.maximum(self.reduce_sum(mask_pos1), 1)
         mask_pos_idx1 = self.tile(self.expand_dims(mask_pos1, -1), (1, 1, 10))
@@ -97,6 +107,8 @@ class MultiBoxLoss(nn.Cell):
         loss_l = loss_l / num
 
         # Conf Loss
+        if self.mining == 'threshold':
+            return loss_l, self.threshold_conf_loss(conf_data, conf_t, mask_pos, num), loss_landm
         conf_t_shape = F.shape(conf_t)
         conf_t = F.reshape(conf_t, (-1,))
         indices = self.concat((1 - F.reshape(conf_t, (-1, 1)), F.reshape(conf_t, (-1, 1))))
@@ -130,3 +142,29 @@ class MultiBoxLoss(nn.Cell):
         loss_c = loss_c / num
 
         return loss_l, loss_c, loss_landm
+
+    def threshold_conf_loss(self, conf_data, conf_t, mask_pos, num):
+        """
+        The classification loss of the positives and the hardest negatives, the negatives above the loss of the
+        k-th hardest one and as many at that loss as needed for k, so ties weigh as much as with two sorts.
+        The weight of the ties is shared by all the negatives at that loss, which the two sorts would pick
+        from arbitrarily, so their gradient is spread over them rather than put on a single one.
+        """
+        conf_t_shape = F.shape(conf_t)
+        cross_entropy = self.cross_entropy(F.reshape(conf_data, (-1, self.num_classes)), F.reshape(conf_t, (-1,)))
+        cross_entropy = F.reshape(cross_entropy, conf_t_shape)
+
+        num_matched_boxes = self.reduce_sum(mask_pos, 1)
+        num_neg_boxes = self.minimum(num_matched_boxes * self.neg_pre_positive, self.num_boxes - 1)
+        neg_cross_entropy = cross_entropy * (1 - mask_pos)
+        sorted_loss, _ = self.sort_descend(neg_cross_entropy, self.num_boxes)
+        kth = F.cast(self.maximum(num_neg_boxes - 1, 0), mstype.int32)
+        threshold = self.gather_d(sorted_loss, 1, self.expand_dims(kth, -1))
+        hard_neg_mask = F.cast(self.greater(neg_cross_entropy, threshold), mstype.float32)
+
+        num_ties = num_neg_boxes - self.reduce_sum(hard_neg_mask, 1)
+        tie_mask = F.cast(self.equal(neg_cross_entropy, threshold), mstype.float32) * (1 - mask_pos)
+        tie_weight = num_ties / self.maximum(self.reduce_sum(tie_mask, 1), 1)
+        weight = self.minimum(mask_pos + hard_neg_mask, 1) + tie_mask * self.expand_dims(tie_weight, -1)
+        loss_c = self.reduce_sum(cross_entropy * F.stop_gradient(weight))
+        return loss_c / num
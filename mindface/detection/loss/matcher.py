@@ -0,0 +1,140 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Prior matching inside the graph."""
+import numpy as np
+import mindspore.common.dtype as mstype
+from mindspore import nn
+from mindspore.ops import operations as P
+from mindspore.ops import functional as F
+from mindspore import Tensor
+
+
+class PriorMatcher(nn.Cell):
+    """PriorMatcher
+    Match the priors to the ground truths and encode the targets on the device, the in-graph counterpart of
+    ``Bboxencode``. Every ground truth with an IoU of at least 0.2 is forced onto its best prior, and every
+    other prior takes the ground truth it overlaps most, as background below match_thresh.
+
+    A ground truth that overlaps several priors equally is forced onto the first of them, where the host matcher
+    takes the one its sort puts first, so such ties change which prior is forced and nothing else. The IoU is a
+    float32 [batch_size, max_faces, num_priors] tensor, so the memory of the matching grows with max_faces.
+
+    Args:
+        priors (Numpy): The priors, cx, cy, w, h, [num_priors, 4].
+        variances (List): The variances of the encoding.
+        match_thresh (Float): The IoU below which a prior is background.
+        max_faces (Int): The number of ground truth rows of every image, keep it as small as the crops allow.
+
+    Inputs:
+        gt (Tensor): The ground truths padded with zero rows, [batch_size, max_faces, 15] of boxes, landmarks
+            and label.
+
+    Returns:
+        loc_t, conf_t, landm_t (Tensor): The targets of ``MultiBoxLoss``.
+
+    Examples:
+        >>> matcher = PriorMatcher(anchor_cfg.priors((640, 640)), [0.1, 0.2], 0.35, max_faces=64)
+    """
+    def __init__(self, priors, variances, match_thresh, max_faces):
+        super().__init__()
+        priors = np.asarray(priors, dtype=np.float32)
+        self.num_priors = priors.shape[0]
+        self.match_thresh = match_thresh
+        self.prior_x1 = Tensor(priors[:, 0] - priors[:, 2] / 2)
+        self.prior_y1 = Tensor(priors[:, 1] - priors[:, 3] / 2)
+        self.prior_x2 = Tensor(priors[:, 0] + priors[:, 2] / 2)
+        self.prior_y2 = Tensor(priors[:, 1] + priors[:, 3] / 2)
+        self.prior_area = (self.prior_x2 - self.prior_x1) * (self.prior_y2 - self.prior_y1)
+        self.prior_center = Tensor(priors[:, 0:2])
+        self.prior_wh = Tensor(priors[:, 2:4])
+        self.prior_center_landm = Tensor(priors[:, None, 0:2])
+        self.prior_wh_landm = Tensor(priors[:, None, 2:4] * variances[0])
+        self.variances = variances
+        # 1-based row numbers, the largest forced row of a prior wins like the last one of the host matcher
+        self.gt_order = Tensor(np.arange(1, max_faces + 1, dtype=np.float32).reshape(1, max_faces))
+
+        self.maximum = P.Maximum()
+        self.minimum = P.Minimum()
+        self.argmax_with_value_prior = P.ArgMaxWithValue(axis=2)
+        self.argmax_with_value_gt = P.ArgMaxWithValue(axis=1)
+        self.reduce_max = P.ReduceMax()
+        self.cumsum = P.CumSum()
+        self.segment_max = P.UnsortedSegmentMax()
+        self.gather = P.GatherD()
+        self.tile = P.Tile()
+        self.expand_dims = P.ExpandDims()
+        self.concat = P.Concat(axis=-1)
+        self.reshape = P.Reshape()
+        self.select = P.Select()
+        self.log = P.Log()
+        self.fill = P.Fill()
+        self.shape = P.Shape()
+
+    def construct(self, gt):
+        """construct"""
+        gt = F.stop_gradient(gt)
+        labels = gt[:, :, 14]
+        is_gt = F.cast(labels != 0, mstype.float32)
+
+        # IoU of every ground truth and prior, [batch_size, max_faces, num_priors]. The zero rows of the padding
+        # overlap nothing, and come after the faces, so they never win a prior over a face.
+        inter_w = self.maximum(self.minimum(gt[:, :, 2:3], self.prior_x2) - self.maximum(gt[:, :, 0:1], self.prior_x1),
+                               0.0)
+        inter_h = self.maximum(self.minimum(gt[:, :, 3:4], self.prior_y2) - self.maximum(gt[:, :, 1:2], self.prior_y1),
+                               0.0)
+        inter = inter_w * inter_h
+        area = (gt[:, :, 2:3] - gt[:, :, 0:1]) * (gt[:, :, 3:4] - gt[:, :, 1:2])
+        overlaps = inter / (area + self.prior_area - inter)
+
+        best_prior_idx, best_prior_overlap = self.argmax_with_value_prior(overlaps)
+        valid_gt = F.cast(best_prior_overlap >= 0.2, mstype.float32) * is_gt
+        best_truth_idx, best_truth_overlap = self.argmax_with_value_gt(overlaps)
+
+        # force every ground truth onto its best prior, scattered by [batch_size, max_faces] prior ids rather
+        # than by another [batch_size, max_faces, num_priors] tensor
+        batch_size = self.shape(gt)[0]
+        segments = F.cast(self.cumsum(F.ones_like(labels), 0) - 1, mstype.int32) * self.num_priors + best_prior_idx
+        forced_row = self.segment_max(self.gt_order * is_gt, segments, batch_size * self.num_priors)
+        forced_row = self.reshape(forced_row, (batch_size, self.num_priors))
+        best_truth_idx = self.select(forced_row > 0, F.cast(forced_row - 1, mstype.int32), best_truth_idx)
+        valid_forced = self.segment_max(valid_gt, segments, batch_size * self.num_priors)
+        valid_forced = self.reshape(valid_forced, (batch_size, self.num_priors)) > 0
+        best_truth_overlap = self.select(valid_forced, self.fill(mstype.float32, self.shape(best_truth_overlap), 2.0),
+                                         best_truth_overlap)
+
+        index = self.tile(self.expand_dims(best_truth_idx, -1), (1, 1, 15))
+        matches = self.gather(gt, 1, index)
+
+        # encode boxes
+        offset_cxcy = (matches[:, :, 0:2] + matches[:, :, 2:4]) / 2 - self.prior_center
+        offset_cxcy = offset_cxcy / (self.variances[0] * self.prior_wh)
+        wh = (matches[:, :, 2:4] - matches[:, :, 0:2]) / self.prior_wh
+        wh = self.select(wh == 0, self.fill(mstype.float32, self.shape(wh), 1e-12), wh)
+        wh = self.log(wh) / self.variances[1]
+        loc_t = self.concat((offset_cxcy, wh))
+
+        # encode landms
+        matched = self.reshape(matches[:, :, 4:14], (batch_size, self.num_priors, 5, 2))
+        landm_t = (matched - self.prior_center_landm) / self.prior_wh_landm
+        landm_t = self.reshape(landm_t, (batch_size, self.num_priors, 10))
+
+        conf_t = matches[:, :, 14] * F.cast(best_truth_overlap >= self.match_thresh, mstype.float32)
+
+        # images without a ground truth of IoU 0.2 get no targets at all
+        has_valid = self.reduce_max(valid_gt, 1)
+        has_valid = self.expand_dims(has_valid, -1)
+        loc_t = loc_t * self.expand_dims(has_valid, -1)
+        landm_t = landm_t * self.expand_dims(has_valid, -1)
+        conf_t = F.cast(conf_t * has_valid, mstype.int32)
+        return F.stop_gradient(loc_t), F.stop_gradient(conf_t), F.stop_gradient(landm_t)
@@ -1,9 +1,12 @@
 """models init"""
+from .registry import register_backbone, build_backbone, list_backbones
 from .retinaface import RetinaFace, RetinaFaceWithLossCell
 from .mobilenet import MobileNetV1,mobilenet025
+from .mobilenetv2 import MobileNetV2, mobilenetv2_025, mobilenetv2_050
 from .resnet import ResNet, resnet50
 
 __all__ = [
-    'MobileNetV1','mobilenet025','ResNet','resnet50',
+    'register_backbone', 'build_backbone', 'list_backbones',
+    'MobileNetV1','mobilenet025','MobileNetV2','mobilenetv2_025','mobilenetv2_050','ResNet','resnet50',
     'RetinaFace', 'RetinaFaceWithLossCell'
 ]
@@ -15,6 +15,8 @@
 from mindspore import nn
 from mindspore.ops import operations as P
 
+from .registry import register_backbone
+
 # MobileNet0.25
 def conv_bn(inp, oup, stride=1, leaky=0):
     """conv_bn"""
@@ -74,9 +76,37 @@ class MobileNetV1(nn.Cell):
             conv_dw(128, 256, 2),  # 219 +3 2 = 241
             conv_dw(256, 256, 1),  # 241 + 64 = 301
         ])
+        self.out_channels = (64, 128, 256)
         self.avg = P.ReduceMean()
         self.fc = nn.Dense(in_channels=256, out_channels=num_classes)
 
+    def prune_groups(self, prefix='', consumers=((), (), ())):
+        """
+        Prunable channel groups, see ``mindface.utils.prune_channels``.
+
+        Args:
+            prefix (String): The name of the backbone in the parent network. Default: ''.
+            consumers (Tuple): The layers of the parent network that read x1, x2 and x3.
+        """
+        blocks = []
+        for stage_name in ('stage1', 'stage2', 'stage3'):
+            stage = getattr(self, stage_name)
+            blocks += [f'{prefix}{stage_name}.{i}' for i in range(len(stage))]
+        stage_ends = {f'{prefix}stage1.{len(self.stage1) - 1}': list(consumers[0]),
+                      f'{prefix}stage2.{len(self.stage2) - 1}': list(consumers[1]),
+                      f'{prefix}stage3.{len(self.stage3) - 1}': list(consumers[2]) + [f'{prefix}fc']}
+
+        groups = []
+        for i, block in enumerate(blocks):
+            # conv_bn ends with (conv, bn, relu), conv_dw with its pointwise (conv, bn, relu)
+            outputs = [f'{block}.0', f'{block}.1'] if i == 0 else [f'{block}.3', f'{block}.4']
+            inputs = stage_ends.get(block, [])
+            if i + 1 < len(blocks):
+                outputs += [f'{blocks[i + 1]}.0', f'{blocks[i + 1]}.1']
+                inputs = inputs + [f'{blocks[i + 1]}.3']
+            groups.append((outputs, inputs))
+        return groups
+
     def construct(self, x):
         """construct"""
         x1 = self.stage1(x)
@@ -87,6 +117,7 @@ class MobileNetV1(nn.Cell):
         return x1, x2, x3
 
 
+@register_backbone('MobileNet025', class_num=1000)
 def mobilenet025(class_num=1000):
     """
     mobilenet025 model, returns last 3 layers outputs
@@ -0,0 +1,159 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Network."""
+from mindspore import nn
+from mindspore.ops import operations as P
+
+from .registry import register_backbone
+
+# MobileNetV2
+def _make_divisible(value, divisor=8):
+    """Round the channel number to a multiple of divisor, losing at most 10%."""
+    new_value = max(divisor, int(value + divisor / 2) // divisor * divisor)
+    if new_value < 0.9 * value:
+        new_value += divisor
+    return new_value
+
+def conv_bn_relu(inp, oup, kernel_size=3, stride=1, groups=1):
+    """conv_bn_relu"""
+    return nn.SequentialCell([
+        nn.Conv2d(in_channels=inp, out_channels=oup, kernel_size=kernel_size, stride=stride,
+                  pad_mode='pad', padding=kernel_size // 2, group=groups, has_bias=False),
+        nn.BatchNorm2d(num_features=oup, momentum=0.9),
+        nn.ReLU6()
+    ])
+
+class InvertedResidual(nn.Cell):
+    """InvertedResidual"""
+    def __init__(self, inp, oup, stride, expand_ratio):
+        super().__init__()
+        hidden_dim = int(round(inp * expand_ratio))
+        self.use_res_connect = stride == 1 and inp == oup
+        self.has_expand = expand_ratio != 1
+
+        layers = []
+        if self.has_expand:
+            layers.append(conv_bn_relu(inp, hidden_dim, kernel_size=1))
+        layers.extend([
+            conv_bn_relu(hidden_dim, hidden_dim, stride=stride, groups=hidden_dim),
+            nn.Conv2d(in_channels=hidden_dim, out_channels=oup, kernel_size=1, stride=1,
+                      pad_mode='pad', padding=0, has_bias=False),
+            nn.BatchNorm2d(num_features=oup, momentum=0.9),
+        ])
+        self.conv = nn.SequentialCell(layers)
+        self.add = P.Add()
+
+    def prune_groups(self, prefix=''):
+        """Prunable channel groups inside the block, see ``mindface.utils.prune_channels``."""
+        if not self.has_expand:
+            return []
+        return [([f'{prefix}conv.0.0', f'{prefix}conv.0.1', f'{prefix}conv.1.0', f'{prefix}conv.1.1'],
+                 [f'{prefix}conv.2'])]
+
+    def construct(self, x):
+        """construct"""
+        if self.use_res_connect:
+            return self.add(x, self.conv(x))
+        return self.conv(x)
+
+
+class MobileNetV2(nn.Cell):
+    """
+    MobileNetV2 architecture, returns the outputs of stride 8, 16 and 32
+
+    Args:
+        num_classes (int): num of classes.
+        width_mult (float): The channel multiplier. Default: 1.0.
+
+    Examples:
+        >>> mobilenetv2_050 = MobileNetV2(1000, width_mult=0.5)
+    """
+    # expand_ratio, channel, num_blocks, stride of every stage of blocks
+    stage_settings = (
+        ((1, 16, 1, 1), (6, 24, 2, 2), (6, 32, 3, 2)),
+        ((6, 64, 4, 2), (6, 96, 3, 1)),
+        ((6, 160, 3, 2), (6, 320, 1, 1)),
+    )
+
+    def __init__(self, num_classes, width_mult=1.0):
+        super().__init__()
+        input_channel = _make_divisible(32 * width_mult)
+        stages = [[conv_bn_relu(3, input_channel, stride=2)], [], []]
+        out_channels = []
+        for stage, settings in zip(stages, self.stage_settings):
+            for expand_ratio, channel, num_blocks, stride in settings:
+                output_channel = _make_divisible(channel * width_mult)
+                for i in range(num_blocks):
+                    stage.append(InvertedResidual(input_channel, output_channel, stride if i == 0 else 1,
+                                                  expand_ratio))
+                    input_channel = output_channel
+            out_channels.append(input_channel)
+        self.out_channels = tuple(out_channels)
+
+        self.stage1 = nn.SequentialCell(stages[0])
+        self.stage2 = nn.SequentialCell(stages[1])
+        self.stage3 = nn.SequentialCell(stages[2])
+        self.avg = P.ReduceMean()
+        self.fc = nn.Dense(in_channels=input_channel, out_channels=num_classes)
+
+    def prune_groups(self, prefix='', consumers=None):
+        """
+        Prunable channel groups, see ``mindface.utils.prune_channels``.
+
+        Only the expansion channels of the inverted residual blocks are pruned, the stage outputs are tied
+        by the residual additions, so ``consumers`` is unused.
+        """
+        groups = []
+        for stage_name in ('stage1', 'stage2', 'stage3'):
+            for i, cell in enumerate(getattr(self, stage_name)):
+                if isinstance(cell, InvertedResidual):
+                    groups += cell.prune_groups(f'{prefix}{stage_name}.{i}.')
+        return groups
+
+    def construct(self, x):
+        """construct"""
+        x1 = self.stage1(x)
+        x2 = self.stage2(x1)
+        x3 = self.stage3(x2)
+        out = self.avg(x3, (2, 3))
+        out = self.fc(out)
+        return x1, x2, x3
+
+
+@register_backbone('MobileNetV2_050', class_num=1000)
+def mobilenetv2_050(class_num=1000):
+    """
+    mobilenetv2 model of width 0.5, returns last 3 layers outputs
+
+    Args:
+        classnum (int): num of classes
+
+    Examples:
+        >>> backbone = mobilenetv2_050(1000)
+    """
+    return MobileNetV2(class_num, width_mult=0.5)
+
+
+@register_backbone('MobileNetV2_025', class_num=1000)
+def mobilenetv2_025(class_num=1000):
+    """
+    mobilenetv2 model of width 0.25, returns last 3 layers outputs
+
+    Args:
+        classnum (int): num of classes
+
+    Examples:
+        >>> backbone = mobilenetv2_025(1000)
+    """
+    return MobileNetV2(class_num, width_mult=0.25)
@@ -0,0 +1,59 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Backbone registry."""
+
+_BACKBONES = {}
+
+def register_backbone(name, **default_kwargs):
+    """
+    Register a backbone factory under the name used by cfg['name'].
+
+    The backbone returns three feature maps of stride 8, 16 and 32 and sets ``out_channels`` to their
+    channel numbers, from which ``RetinaFace`` builds its FPN.
+
+    Args:
+        name (String): The backbone name in the config file.
+        default_kwargs (Dict): The arguments the factory is called with.
+
+    Examples:
+        >>> @register_backbone('MobileNet025', class_num=1000)
+        ... def mobilenet025(class_num=1000):
+        ...     return MobileNetV1(class_num)
+    """
+    def decorator(factory):
+        if name in _BACKBONES:
+            raise ValueError(f"Backbone {name} is already registered.")
+        _BACKBONES[name] = (factory, default_kwargs)
+        return factory
+    return decorator
+
+def build_backbone(name, **kwargs):
+    """
+    Build a registered backbone.
+
+    Args:
+        name (String): The backbone name, cfg['name'].
+        kwargs (Dict): Arguments overriding the registered defaults.
+
+    Examples:
+        >>> backbone = build_backbone(cfg['name'])
+    """
+    if name not in _BACKBONES:
+        raise ValueError(f"Unsupported backbone {name}, choose from {list_backbones()}.")
+    factory, default_kwargs = _BACKBONES[name]
+    return factory(**dict(default_kwargs, **kwargs))
+
+def list_backbones():
+    """Return the names of the registered backbones."""
+    return sorted(_BACKBONES)
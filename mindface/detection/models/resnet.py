@@ -19,6 +19,8 @@ from mindspore import nn
 from mindspore.ops import operations as P
 from mindspore import Tensor
 
+from .registry import register_backbone
+
 # conv_weight_init = 'HeUniform'
 
 # ResNet
@@ -70,6 +72,7 @@ def _fc(in_channel, out_channel):
 class ResidualBlock(nn.Cell):
     """ResidualBlock"""
     expansion = 4
+    fuse_pairs = (('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3'))
 
     def __init__(self,
                  in_channel,
@@ -144,6 +147,8 @@ class ResNet(nn.Cell):
                   [1, 2, 2, 2],
                   class_num)
     """
+    fuse_pairs = (('conv1', 'bn1'),)
+
     def __init__(self,
                  block,
                  layer_nums,
@@ -188,6 +193,7 @@ class ResNet(nn.Cell):
                                        out_channel=out_channels[3],
                                        stride=strides[3])
 
+        self.out_channels = tuple(out_channels[1:])
         self.mean = P.ReduceMean(keep_dims=True)
         self.flatten = nn.Flatten()
         self.end_point = _fc(out_channels[3], num_classes)
@@ -228,6 +234,7 @@ class ResNet(nn.Cell):
 
         return c3, c4, c5
 
+@register_backbone('ResNet50', class_num=1001)
 def resnet50(class_num=10):
     """
     resnet50 model, returns last 3 layers outputs
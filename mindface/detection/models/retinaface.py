@@ -17,9 +17,11 @@ from functools import reduce
 import numpy as np
 
 from mindspore import nn
+from mindspore.common import dtype as mstype
 from mindspore.ops import operations as P
 from mindspore import Tensor
 
+from mindface.detection.utils.box_utils import AnchorConfig
 
 # RetinaFace
 def init_kaiming_uniform(arr_shape, a=0, nonlinearity='leaky_relu', has_bias=False):
@@ -126,6 +128,17 @@ class SSH(nn.Cell):
         self.cat = P.Concat(axis=1)
         self.relu = nn.ReLU()
 
+    def prune_groups(self, prefix=''):
+        """Prunable channel groups inside the block, see ``mindface.utils.prune_channels``."""
+        return [
+            ([f'{prefix}conv5x5_1.0', f'{prefix}conv5x5_1.1'], [f'{prefix}conv5x5_2.0', f'{prefix}conv7x7_2.0']),
+            ([f'{prefix}conv7x7_2.0', f'{prefix}conv7x7_2.1'], [f'{prefix}conv7x7_3.0']),
+        ]
+
+    def input_layers(self, prefix=''):
+        """The layers reading the input of the block."""
+        return [f'{prefix}conv3x3.0', f'{prefix}conv5x5_1.0']
+
     def construct(self, x):
         """construct"""
         conv3x3 = self.conv3x3(x)
@@ -142,36 +155,40 @@ class SSH(nn.Cell):
         return out
 
 class FPN(nn.Cell):
-    """FPN"""
-    def __init__(self, in_channel, out_channel):
+    """FPN, passes input1 through unchanged instead of building the stride 8 output when fine_level is False"""
+    def __init__(self, in_channels, out_channel, fine_level=True):
         super().__init__()
+        self.fine_level = fine_level
         out_channels = out_channel
         leaky = 0
         if out_channels <= 64:
             leaky = 0.1
         norm_layer = nn.BatchNorm2d
-        self.output1 = ConvBNReLU(in_channel * 2, out_channel, kernel_size=1, stride=1,
+        if fine_level:
+            self.output1 = ConvBNReLU(in_channels[0], out_channel, kernel_size=1, stride=1,
+                                      padding=0, groups=1, norm_layer=norm_layer, leaky=leaky)
+            self.merge1 = ConvBNReLU(out_channel, out_channel, kernel_size=3, stride=1, padding=1, groups=1,
+                                     norm_layer=norm_layer, leaky=leaky)
+        self.output2 = ConvBNReLU(in_channels[1], out_channel, kernel_size=1, stride=1,
                                   padding=0, groups=1, norm_layer=norm_layer, leaky=leaky)
-        self.output2 = ConvBNReLU(in_channel * 4, out_channel, kernel_size=1, stride=1,
-                                  padding=0, groups=1, norm_layer=norm_layer, leaky=leaky)
-        self.output3 = ConvBNReLU(in_channel * 8, out_channel, kernel_size=1, stride=1,
+        self.output3 = ConvBNReLU(in_channels[2], out_channel, kernel_size=1, stride=1,
                                   padding=0, groups=1, norm_layer=norm_layer, leaky=leaky)
 
-        self.merge1 = ConvBNReLU(out_channel, out_channel, kernel_size=3, stride=1, padding=1, groups=1,
-                                 norm_layer=norm_layer, leaky=leaky)
         self.merge2 = ConvBNReLU(out_channel, out_channel, kernel_size=3, stride=1, padding=1, groups=1,
                                  norm_layer=norm_layer, leaky=leaky)
 
     def construct(self, input1, input2, input3):
         """construct"""
-        output1 = self.output1(input1)
         output2 = self.output2(input2)
         output3 = self.output3(input3)
 
         up3 = P.ResizeNearestNeighbor([P.Shape()(output2)[2], P.Shape()(output2)[3]])(output3)
         output2 = up3 + output2
         output2 = self.merge2(output2)
+        if not self.fine_level:
+            return input1, output2, output3
 
+        output1 = self.output1(input1)
         up2 = P.ResizeNearestNeighbor([P.Shape()(output1)[2], P.Shape()(output1)[3]])(output2)
         output1 = up2 + output1
         output1 = self.merge1(output1)
@@ -240,34 +257,41 @@ class RetinaFace(nn.Cell):
     Args:
         phase (String): Set the 'train' mode or 'val' mode. Default: 'train'
         backbone (Object): The backbone is used to extract features.
-        in_channel (int): DetectionHead input channel.
+        in_channel (int): The FPN inputs have in_channel * 2, 4 and 8 channels. Only used when the backbone
+            does not set out_channels. Default: 32.
         out_channel (int): DetectionHead output channel.
+        anchor_cfg (AnchorConfig): The anchors of every pyramid level. Only the levels in anchor_cfg.steps get
+            an SSH module and heads. Default: None, two anchors on each of the stride 8, 16 and 32 levels.
 
     Examples:
         >>> backbone = resnet50(1001)
-        >>> net = RetinaFace(phase='train', backbone=backbone, in_channel=32, out_channel=64)
+        >>> net = RetinaFace(phase='train', backbone=backbone, out_channel=256)
     """
-    def __init__(self, phase='train', backbone=None, in_channel=32, out_channel=64):
+    def __init__(self, phase='train', backbone=None, in_channel=32, out_channel=64, anchor_cfg=None):
 
         super().__init__()
         self.phase = phase
 
         self.base = backbone
 
-        self.fpn = FPN(in_channel, out_channel)
+        anchor_cfg = anchor_cfg or AnchorConfig()
+        self.use_level = tuple(level in anchor_cfg.levels for level in range(3))
+
+        in_channels = getattr(backbone, 'out_channels', (in_channel * 2, in_channel * 4, in_channel * 8))
+        self.fpn = FPN(in_channels, out_channel, fine_level=self.use_level[0])
 
-        self.ssh1 = SSH(out_channel, out_channel)
-        self.ssh2 = SSH(out_channel, out_channel)
-        self.ssh3 = SSH(out_channel, out_channel)
+        # the SSH modules keep their names so that checkpoints of the full layout still load
+        for level, name in enumerate(('ssh1', 'ssh2', 'ssh3')):
+            if self.use_level[level]:
+                setattr(self, name, SSH(out_channel, out_channel))
 
-        self.classhead = self._make_class_head(fpn_num=3, inchannels=[out_channel, out_channel,
-                                                                      out_channel], anchor_num=[2, 2, 2])
-        self.bboxhead = self._make_bbox_head(fpn_num=3, inchannels=[out_channel, out_channel,
-                                                                    out_channel], anchor_num=[2, 2, 2])
-        self.landmarkhead = self._make_landmark_head(fpn_num=3, inchannels=[out_channel,
-                                                                            out_channel,
-                                                                            out_channel],
-                                                     anchor_num=[2, 2, 2])
+        fpn_num = len(anchor_cfg.levels)
+        self.classhead = self._make_class_head(fpn_num=fpn_num, inchannels=[out_channel] * fpn_num,
+                                               anchor_num=anchor_cfg.anchor_num)
+        self.bboxhead = self._make_bbox_head(fpn_num=fpn_num, inchannels=[out_channel] * fpn_num,
+                                             anchor_num=anchor_cfg.anchor_num)
+        self.landmarkhead = self._make_landmark_head(fpn_num=fpn_num, inchannels=[out_channel] * fpn_num,
+                                                     anchor_num=anchor_cfg.anchor_num)
 
         self.cat = P.Concat(axis=1)
 
@@ -292,16 +316,48 @@ class RetinaFace(nn.Cell):
             landmarkhead.append(LandmarkHead(inchannels[i], anchor_num[i]))
         return landmarkhead
 
+    def prune_groups(self):
+        """
+        Prunable channel groups, see ``mindface.utils.prune_channels``.
+
+        The FPN inputs are pruned with the backbone outputs when the backbone defines ``prune_groups``.
+        output1, output2, output3 and merge2 of the FPN are added together, so they share one group.
+        """
+        fine_level = self.use_level[0]
+        groups = []
+        if hasattr(self.base, 'prune_groups'):
+            groups += self.base.prune_groups('base.', consumers=(['fpn.output1.0'] if fine_level else [],
+                                                                 ['fpn.output2.0'], ['fpn.output3.0']))
+        outputs = ['fpn.output2.0', 'fpn.output2.1', 'fpn.output3.0', 'fpn.output3.1',
+                   'fpn.merge2.0', 'fpn.merge2.1']
+        inputs = ['fpn.merge2.0']
+        if fine_level:
+            outputs += ['fpn.output1.0', 'fpn.output1.1']
+            inputs += ['fpn.merge1.0']
+        for level, name in ((1, 'ssh2'), (2, 'ssh3')):
+            if self.use_level[level]:
+                inputs += getattr(self, name).input_layers(f'{name}.')
+        groups.append((outputs, inputs))
+        if fine_level:
+            groups.append((['fpn.merge1.0', 'fpn.merge1.1'], self.ssh1.input_layers('ssh1.')))
+        for level, name in enumerate(('ssh1', 'ssh2', 'ssh3')):
+            if self.use_level[level]:
+                groups += getattr(self, name).prune_groups(f'{name}.')
+        return groups
+
     def construct(self, inputs):
         """construct"""
         f1, f2, f3 = self.base(inputs)
         f1, f2, f3 = self.fpn(f1, f2, f3)
 
         # SSH
-        f1 = self.ssh1(f1)
-        f2 = self.ssh2(f2)
-        f3 = self.ssh3(f3)
-        features = [f1, f2, f3]
+        features = ()
+        if self.use_level[0]:
+            features = features + (self.ssh1(f1),)
+        if self.use_level[1]:
+            features = features + (self.ssh2(f2),)
+        if self.use_level[2]:
+            features = features + (self.ssh3(f3),)
 
         bbox = ()
         for i, feature in enumerate(features):
@@ -332,23 +388,41 @@ class RetinaFaceWithLossCell(nn.Cell):
     Args:
         network (Object): Retinaface model without loss function.
         multibox_loss (Object): The loss function used.
-        config (Dict): The configuration file that contains parameters related to loss.
+        loc_weight, class_weight, landm_weight (Float): The weights of the three losses.
+        matcher (Object): Encodes the targets from padded ground truths inside the graph, see ``PriorMatcher``.
+            The cell then takes (img, gt) instead of (img, loc_t, conf_t, landm_t). Default: None.
+        normalize (Object): Normalizes the images before the network, e.g. ``InputNormalize`` for uint8 HWC images.
+            Default: None.
+
+    The predictions are cast to float32, so the loss stays in float32 when the network runs in float16.
 
     Examples:
         >>> backbone = resnet50(1001)
         >>> net = RetinaFace(phase='train', backbone=backbone, cfg = cfg)
         >>> net = RetinaFaceWithLossCell(net, multibox_loss, config = cfg)
     """
-    def __init__(self, network, multibox_loss, loc_weight=2.0, class_weight=1.0, landm_weight=1.0):
+    def __init__(self, network, multibox_loss, loc_weight=2.0, class_weight=1.0, landm_weight=1.0, matcher=None,
+                 normalize=None):
         super().__init__()
         self.network = network
+        self.matcher = matcher
+        self.normalize = normalize
         self.loc_weight = loc_weight
         self.class_weight = class_weight
         self.landm_weight = landm_weight
         self.multibox_loss = multibox_loss
-
-    def construct(self, img, loc_t, conf_t, landm_t):
+        self.cast = P.Cast()
+
+    def construct(self, img, *targets):
+        if self.matcher is not None:
+            targets = self.matcher(targets[0])
+        loc_t, conf_t, landm_t = targets
+        if self.normalize is not None:
+            img = self.normalize(img)
         pred_loc, pre_conf, pre_landm = self.network(img)
+        pred_loc = self.cast(pred_loc, mstype.float32)
+        pre_conf = self.cast(pre_conf, mstype.float32)
+        pre_landm = self.cast(pre_landm, mstype.float32)
         loss_loc, loss_conf, loss_landm = self.multibox_loss(pred_loc, loc_t, pre_conf, conf_t, pre_landm, landm_t)
 
         return loss_loc * self.loc_weight + loss_conf * self.class_weight + loss_landm * self.landm_weight
@@ -0,0 +1,29 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Pack the WiderFace training images into shards."""
+import argparse
+
+from datasets import pack_shards
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='pack_dataset')
+    parser.add_argument('--label_path', default='data/WiderFace/train/label.txt', type=str,
+                        help='label.txt of the images to pack')
+    parser.add_argument('--output_dir', default='data/WiderFace/train/shards', type=str,
+                        help='folder of the shards, set it as training_dataset in the config file')
+    parser.add_argument('--shard_size', default=1024, type=int, help='size of every shard in MB')
+    args = parser.parse_args()
+
+    num_shards = pack_shards(args.label_path, args.output_dir, args.shard_size << 20)
+    print(f'Packed {args.label_path} into {num_shards} shards in {args.output_dir}.')
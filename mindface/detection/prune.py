@@ -0,0 +1,68 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Structured channel pruning of Retinaface_resnet50_or_mobilenet0.25."""
+import argparse
+import yaml
+
+from mindspore import context
+from mindspore.train.serialization import save_checkpoint
+
+from mindface.utils import prune_channels, count_params, count_flops, measure_throughput
+from eval import build_network
+from runner import read_yaml
+
+def profile(network, input_shape):
+    """Return the parameters, FLOPs and measured latency of a network."""
+    latency, _ = measure_throughput(network, input_shape)
+    return count_params(network), count_flops(network, input_shape), latency
+
+def prune(cfg):
+    """prune"""
+    # counting FLOPs reads the layer outputs on the host, which needs PYNATIVE_MODE
+    context.set_context(mode=context.PYNATIVE_MODE, device_target=cfg['device_target'])
+
+    network = build_network(dict(cfg, val_fuse_bn=False))
+    input_shape = (1, 3, cfg['image_size'], cfg['image_size'])
+    before = profile(network, input_shape)
+
+    network, widths = prune_channels(network, cfg['prune_ratio'], cfg['prune_criterion'])
+    after = profile(network, input_shape)
+
+    ckpt_path = cfg['prune_save_path'] + '.ckpt'
+    save_checkpoint(network, ckpt_path)
+    # the slim config fine-tunes from the pruned checkpoint and evaluates it
+    slim_cfg = dict(cfg, prune_widths=widths, pretrain=False, resume_net=ckpt_path, val_model=ckpt_path)
+    with open(cfg['prune_save_path'] + '.yaml', 'w', encoding='utf-8') as file:
+        yaml.safe_dump(slim_cfg, file, sort_keys=False)
+    print(f"Save pruned model to {ckpt_path} and its config to {cfg['prune_save_path']}.yaml")
+
+    print(f"{'model':<8}{'params(M)':>12}{'FLOPs(G)':>12}{'latency(ms)':>14}")
+    for name, (params, flops, latency) in (('origin', before), ('pruned', after)):
+        print(f"{name:<8}{params / 1e6:>12.3f}{flops / 1e9:>12.3f}{latency:>14.2f}")
+    return before, after, widths
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='prune')
+    # configs
+    parser.add_argument('--config', default='mindface/detection/configs/RetinaFace_mobilenet025.yaml', type=str,
+                        help='configs path')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checpoint path')
+    args = parser.parse_args()
+
+    config = read_yaml(args.config)
+
+    if args.checkpoint:
+        config['val_model'] = args.checkpoint
+    prune(cfg=config)
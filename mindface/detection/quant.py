@@ -0,0 +1,99 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Post-training int8 quantization of Retinaface_resnet50_or_mobilenet0.25."""
+import argparse
+import os
+import numpy as np
+import cv2
+
+from mindspore import Tensor, context
+from mindspore.train.serialization import save_checkpoint
+
+from mindface.utils import calibrate, quantize, measure_throughput
+from eval import build_network, read_test_dataset, predict
+from runner import DetectionEngine, read_yaml
+
+def calib_dataset(cfg):
+    """Yield the first cfg['quant_calib_num'] WIDER val images, padded to image_size."""
+    image_size = cfg['image_size']
+    for img_name in read_test_dataset(cfg)[:cfg['quant_calib_num']]:
+        image_path = os.path.join(cfg['val_dataset_folder'], 'images', img_name)
+        img = np.float32(cv2.imread(image_path, cv2.IMREAD_COLOR))
+
+        resize = float(image_size) / float(np.max(img.shape[0:2]))
+        img = cv2.resize(img, None, None, fx=resize, fy=resize, interpolation=cv2.INTER_LINEAR)
+        image_t = np.empty((image_size, image_size, 3), dtype=img.dtype)
+        image_t[:, :] = (104.0, 117.0, 123.0)
+        image_t[0:img.shape[0], 0:img.shape[1]] = img
+
+        image_t -= (104, 117, 123)
+        image_t = image_t.transpose(2, 0, 1)
+        yield Tensor(np.expand_dims(image_t, 0))
+
+def quant(cfg):
+    """quant"""
+    # calibration reads the activations back on the host, which needs PYNATIVE_MODE
+    context.set_context(mode=context.PYNATIVE_MODE, device_target=cfg['device_target'])
+
+    network = build_network(cfg)
+    q_network = build_network(cfg)
+
+    print(f"Calibrate on {cfg['quant_calib_num']} images of {cfg['val_dataset_folder']}")
+    ranges = calibrate(q_network, calib_dataset(cfg))
+    q_network = quantize(q_network, ranges, num_bits=cfg['quant_num_bits'])
+    print(f"Quantized the calibrated layers to int{cfg['quant_num_bits']}.")
+    save_checkpoint(q_network, cfg['quant_save_path'])
+    print(f"Save quantized model to {cfg['quant_save_path']}")
+
+    if cfg['mode'] == 'Graph':
+        context.set_context(mode=context.GRAPH_MODE)
+
+    results = {}
+    for name, net in (('fp32', network), (f"int{cfg['quant_num_bits']}", q_network)):
+        latency, throughput = measure_throughput(net, (1, 3, cfg['image_size'], cfg['image_size']))
+        ap_dict = {}
+        if cfg['quant_eval']:
+            detection = DetectionEngine(nms_thresh=cfg['val_nms_threshold'],
+                                        conf_thresh=cfg['val_confidence_threshold'],
+                                        iou_thresh=cfg['val_iou_threshold'], var=cfg['variance'],
+                                        gt_dir=cfg['val_gt_dir'])
+            predict(net, cfg, detection)
+            ap_dict = detection.get_eval_result()
+        results[name] = (latency, throughput, ap_dict)
+
+    print(f"{'model':<8}{'latency(ms)':>14}{'img/s':>10}{'Easy':>10}{'Medium':>10}{'Hard':>10}")
+    base_ap = results['fp32'][2]
+    for name, (latency, throughput, ap_dict) in results.items():
+        aps = ''.join(f"{ap_dict[key]:>10.4f}" for key in ('easy', 'medium', 'hard') if key in ap_dict)
+        print(f"{name:<8}{latency:>14.2f}{throughput:>10.2f}{aps}")
+    if cfg['quant_eval']:
+        q_ap = results[f"int{cfg['quant_num_bits']}"][2]
+        deltas = ''.join(f"{q_ap[key] - base_ap[key]:>10.4f}" for key in ('easy', 'medium', 'hard'))
+        print(f"{'delta':<8}{'':>24}{deltas}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='quant')
+    # configs
+    parser.add_argument('--config', default='mindface/detection/configs/RetinaFace_mobilenet025.yaml', type=str,
+                        help='configs path')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checpoint path')
+    args = parser.parse_args()
+
+    config = read_yaml(args.config)
+
+    if args.checkpoint:
+        config['val_model'] = args.checkpoint
+    quant(cfg=config)
@@ -1,4 +1,4 @@
 """runner init"""
-from .engine import DetectionEngine, TrainingWrapper
+from .engine import DetectionEngine, TrainingWrapper, Timer, read_yaml
 
-__all__ = ['DetectionEngine', 'TrainingWrapper']
+__all__ = ['DetectionEngine', 'TrainingWrapper', 'Timer', 'read_yaml']
@@ -409,7 +409,7 @@ class DetectionEngine:
                 precision[i-1] = np.maximum(precision[i-1], precision[i])
             index = np.where(recall[1:] != recall[:-1])[0]
             ap = np.sum((recall[index + 1] - recall[index]) * precision[index + 1])
-
+            ap_dict[sets[index_set]] = ap
 
             print(ap_key_dict[index_set] + f'{ap:.4f}')
 
@@ -437,15 +437,41 @@ def _clip_grad(clip_type, clip_value, grad):
     return new_grad
 
 
+grad_scale = C.MultitypeFuncGraph("grad_scale")
+
+
+@grad_scale.register("Tensor", "Tensor")
+def _grad_scale(scale, grad):
+    """_grad_scale"""
+    return grad * F.cast(ops.Reciprocal()(scale), F.dtype(grad))
+
+
+grad_finite = C.MultitypeFuncGraph("grad_finite")
+
+
+@grad_finite.register("Tensor")
+def _grad_finite(grad):
+    """_grad_finite"""
+    return ops.ReduceAll()(ops.IsFinite()(grad))
+
+
 class TrainingWrapper(nn.Cell):
     """TrainingWrapper
 
     Args:
         network (Object): The network.
         optimizer (Object): The optimizer.
+        sens (Float): The gradient of the loss the backward pass starts from, times the loss scale if
+            scale_update_cell is set. Default: 1.0.
         grad_clip (Bool): Whether to clip the gradient.
+        scale_update_cell (Object): Scales the loss dynamically for mixed precision, e.g.
+            ``nn.DynamicLossScaleUpdateCell``. The gradients are unscaled, a step whose gradients overflow is
+            skipped and the scale is updated. The wrapper then returns (loss, overflow, scale). Default: None.
+
+    The train_step parameter counts the steps run, the skipped ones too, unlike the global step of the
+    optimizer, so a checkpoint holds the data position of the training, see ``TrainState``.
     """
-    def __init__(self, network, optimizer, sens=1.0,grad_clip=True):
+    def __init__(self, network, optimizer, sens=1.0,grad_clip=True, scale_update_cell=None):
         super().__init__(auto_prefix=False)
         self.clip = grad_clip
         self.network = network
@@ -453,12 +479,22 @@ class TrainingWrapper(nn.Cell):
         self.optimizer = optimizer
         self.grad = C.GradOperation(get_by_list=True, sens_param=True)
         self.sens = sens
+        self.scale_update_cell = scale_update_cell
+        self.train_step = mindspore.Parameter(mindspore.Tensor([0], mindspore.int32), name="train_step")
+        self.assign_add = ops.AssignAdd()
+        self.one = mindspore.Tensor([1], mindspore.int32)
+        if scale_update_cell is not None:
+            self.scale_sense = mindspore.Parameter(mindspore.Tensor(scale_update_cell.get_loss_scale(),
+                                                                    mindspore.float32), name="scale_sense")
         self.reducer_flag = False
         self.grad_reducer = None
         self.parallel_mode = context.get_auto_parallel_context("parallel_mode")
         self.shape = ops.Shape()
         self.fill = ops.Fill()
         self.dtype = ops.DType()
+        self.stack = ops.Stack()
+        self.reduce_all = ops.ReduceAll()
+        self.logical_not = ops.LogicalNot()
         class_list = [mindspore.context.ParallelMode.DATA_PARALLEL, mindspore.context.ParallelMode.HYBRID_PARALLEL]
         if self.parallel_mode in class_list:
             self.reducer_flag = True
@@ -475,6 +511,9 @@ class TrainingWrapper(nn.Cell):
         """construct"""
         weights = self.weights
         loss = self.network(*args)
+        loss = F.depend(loss, self.assign_add(self.train_step, self.one))
+        if self.scale_update_cell is not None:
+            return self.scaled_step(loss, *args)
         sens = self.fill(self.dtype(loss), self.shape(loss), self.sens)
         grads = self.grad(self.network, weights)(*args, sens)
         if self.clip:
@@ -483,3 +522,19 @@ class TrainingWrapper(nn.Cell):
             # apply grad reducer on grads
             grads = self.grad_reducer(grads)
         return F.depend(loss, self.optimizer(grads))
+
+    def scaled_step(self, loss, *args):
+        """The step with a dynamic loss scale, skipped when the unscaled gradients overflow."""
+        sens = self.fill(self.dtype(loss), self.shape(loss), self.sens) * F.cast(self.scale_sense, self.dtype(loss))
+        grads = self.grad(self.network, self.weights)(*args, sens)
+        if self.reducer_flag:
+            # reduce before the overflow check, so an overflow on any device skips the step on every device
+            grads = self.grad_reducer(grads)
+        grads = self.hyper_map(F.partial(grad_scale, self.scale_sense), grads)
+        overflow = self.logical_not(self.reduce_all(self.stack(self.hyper_map(grad_finite, grads))))
+        overflow = self.scale_update_cell(self.scale_sense, overflow)
+        if self.clip:
+            grads = self.hyper_map(F.partial(clip_grad, GRADIENT_CLIP_TYPE, GRADIENT_CLIP_VALUE), grads)
+        if not overflow:
+            loss = F.depend(loss, self.optimizer(grads))
+        return loss, overflow, self.scale_sense
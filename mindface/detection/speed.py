@@ -0,0 +1,67 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Compare the size, FLOPs, latency and AP of RetinaFace backbones."""
+import argparse
+
+from mindspore import context
+
+from mindface.utils import count_params, count_flops, measure_throughput
+from eval import val
+from models import RetinaFace, build_backbone
+from utils import AnchorConfig
+from runner import read_yaml
+
+def speed(configs, num_iters=20, with_ap=False):
+    """speed"""
+    rows = []
+    for cfg in configs:
+        # counting FLOPs reads the layer outputs on the host, which needs PYNATIVE_MODE
+        context.set_context(mode=context.PYNATIVE_MODE, device_target=cfg['device_target'])
+        network = RetinaFace(phase='predict', backbone=build_backbone(cfg['name']), out_channel=cfg['out_channel'],
+                             anchor_cfg=AnchorConfig.from_config(cfg))
+        network.set_train(False)
+        input_shape = (1, 3, cfg['image_size'], cfg['image_size'])
+        params, flops = count_params(network), count_flops(network, input_shape)
+
+        if cfg['mode'] == 'Graph':
+            context.set_context(mode=context.GRAPH_MODE)
+        latency, _ = measure_throughput(network, input_shape, num_iters=num_iters)
+        ap_dict = val(cfg) if with_ap else {}
+        rows.append((cfg['name'], params, flops, latency, ap_dict))
+
+    print(f"{'backbone':<16}{'params(M)':>12}{'FLOPs(G)':>12}{'latency(ms)':>14}{'Easy':>10}{'Medium':>10}{'Hard':>10}")
+    for name, params, flops, latency, ap_dict in rows:
+        aps = ''.join(f"{ap_dict[key]:>10.4f}" for key in ('easy', 'medium', 'hard') if key in ap_dict)
+        print(f"{name:<16}{params / 1e6:>12.3f}{flops / 1e9:>12.3f}{latency:>14.2f}{aps}")
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='speed')
+    # configs
+    parser.add_argument('--configs', nargs='+', type=str,
+                        default=['mindface/detection/configs/RetinaFace_mobilenet025.yaml',
+                                 'mindface/detection/configs/RetinaFace_mobilenetv2_025.yaml',
+                                 'mindface/detection/configs/RetinaFace_mobilenetv2_050.yaml'],
+                        help='configs path')
+    parser.add_argument('--device_target', type=str, default='CPU', help='device target')
+    parser.add_argument('--num_iters', type=int, default=20, help='timed forward passes')
+    parser.add_argument('--eval', action='store_true', help='also evaluate the val_model of every config')
+    args = parser.parse_args()
+
+    config_list = []
+    for path in args.configs:
+        config = read_yaml(path)
+        config['device_target'] = args.device_target
+        config_list.append(config)
+    speed(config_list, num_iters=args.num_iters, with_ap=args.eval)
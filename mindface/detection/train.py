@@ -13,9 +13,11 @@
 
 """Train Retinaface_resnet50ormobilenet0.25."""
 
+import os
 import argparse
 import math
 import mindspore
+import mindspore.dataset
 
 from mindspore import context
 from mindspore.context import ParallelMode
@@ -24,11 +26,14 @@ from mindspore.train.callback import ModelCheckpoint, CheckpointConfig, LossMoni
 from mindspore.communication.management import init, get_rank, get_group_size
 from mindspore.train.serialization import load_checkpoint, load_param_into_net
 
-from loss import MultiBoxLoss
-from datasets import create_dataset
-from utils import adjust_learning_rate
+from mindface.utils import slim_channels, InputNormalize, autotune_loader, CorePlan, StepProfiler, to_half, \
+    AsyncCheckpoint, load_delta_checkpoint, TrainState, resume_phases
 
-from models import RetinaFace, RetinaFaceWithLossCell, resnet50, mobilenet025
+from loss import MultiBoxLoss, PriorMatcher
+from datasets import create_dataset, build_resized_cache, stage_speed
+from utils import adjust_learning_rate, resize_schedule, AnchorConfig
+
+from models import RetinaFace, RetinaFaceWithLossCell, build_backbone
 from runner import read_yaml, TrainingWrapper
 
 def train(cfg):
@@ -39,8 +44,9 @@ def train(cfg):
         context.set_context(mode=context.GRAPH_MODE, device_target=cfg['device_target'])
     else :
         context.set_context(mode=context.PYNATIVE_MODE, device_target = cfg['device_target'])
-
-    # rank=0
+    rank = 0
+    # the ranks are started on one host and split its cores
+    local_ranks, local_rank = 1, 0
     if cfg['device_target'] == "Ascend":
         device_num = cfg['nnpu']
         if device_num > 1:
@@ -49,6 +55,7 @@ def train(cfg):
                                               gradients_mean=True)
             init()
             rank = get_rank()
+            local_ranks, local_rank = device_num, rank
             print(f"The rank ID of current device is {rank}.")
         else:
             context.set_context(device_id=cfg['device_id'])
@@ -58,7 +65,10 @@ def train(cfg):
             context.set_auto_parallel_context(device_num=get_group_size(), parallel_mode=ParallelMode.DATA_PARALLEL,
                                               gradients_mean=True)
             rank = get_rank()
+            local_ranks, local_rank = get_group_size(), rank
             print(f"The rank ID of current device is {rank}.")
+    core_plan = CorePlan.from_config(cfg, local_ranks, local_rank)
+    core_plan.apply()
 
     batch_size = cfg['batch_size']
     max_epoch = cfg['epoch']
@@ -72,18 +82,39 @@ def train(cfg):
     num_classes = cfg['num_classes']
     negative_ratio = 7
     stepvalues = (cfg['decay1'], cfg['decay2'])
-
-    ds_train = create_dataset(training_dataset, cfg['variance'], cfg['match_thresh'], cfg['image_size'],
-                                clip, batch_size, multiprocessing=True, num_worker=cfg['num_workers'])
+    anchor_cfg = AnchorConfig.from_config(cfg)
+    if cfg['cache_short_side']:
+        training_dataset = build_resized_cache(training_dataset, cfg['cache_dir'], cfg['cache_short_side'])
+        print(f"Train on the images downscaled to a short side of {cfg['cache_short_side']} in "
+              f"{os.path.dirname(training_dataset)}")
+
+    # one phase per image size of the progressive resizing, every one with its priors, loss and graph
+    phases = resize_schedule(cfg['progressive_resize'], max_epoch, cfg['image_size'])
+
+    def make_dataset(num_workers, image_size=cfg['image_size'], start_epoch=0, skip_steps=0):
+        return create_dataset(training_dataset, cfg['variance'], cfg['match_thresh'], image_size,
+                              clip, batch_size, multiprocessing=True, num_worker=num_workers,
+                              anchor_cfg=anchor_cfg, batch_encode=cfg['batch_encode'],
+                              max_faces=cfg['max_faces'] if cfg['device_match'] else None,
+                              fuse_stages=cfg['fuse_stages'], uint8_output=cfg['uint8_input'],
+                              core_plan=core_plan, start_epoch=start_epoch, skip_steps=skip_steps)
+
+    num_workers = core_plan.num_workers
+    if cfg['prefetch_size']:
+        mindspore.dataset.config.set_prefetch_size(cfg['prefetch_size'])
+    if cfg['autotune_loader']:
+        max_workers = max(1, len(core_plan.loader_cores) // core_plan.cv2_threads)
+        num_workers, _ = autotune_loader(make_dataset, max_workers=max_workers,
+                                         step_time=cfg['autotune_step_time'], batch_size=batch_size,
+                                         stage_speed=lambda: stage_speed(dict(cfg, training_dataset=training_dataset)))
+    ds_train = make_dataset(num_workers, phases[0][2])
     print('dataset size is : \n', ds_train.get_dataset_size())
 
     steps_per_epoch = math.ceil(ds_train.get_dataset_size())
+    # the weights, optimizer moments, global step of the learning rate and loss scale, and the data position
+    state = TrainState(cfg['resume_state'], steps_per_epoch) if cfg['resume_state'] else None
 
-    multibox_loss = MultiBoxLoss(num_classes, cfg['num_anchor'], negative_ratio)
-    if cfg['name'] == 'ResNet50':
-        backbone = resnet50(1001)
-    elif cfg['name'] == 'MobileNet025':
-        backbone = mobilenet025(1000)
+    backbone = build_backbone(cfg['name'])
     backbone.set_train(True)
 
     if  cfg['pretrain'] and cfg['resume_net'] is None:
@@ -92,44 +123,92 @@ def train(cfg):
         load_param_into_net(backbone, param_dict)
         print(f"Load RetinaFace_{cfg['name']} from [{cfg['pretrain_path']}] done.")
 
-    net = RetinaFace(phase='train', backbone=backbone, in_channel=cfg['in_channel'], out_channel=cfg['out_channel'])
+    net = RetinaFace(phase='train', backbone=backbone, out_channel=cfg['out_channel'], anchor_cfg=anchor_cfg)
+    if cfg['prune_widths']:
+        net = slim_channels(net, cfg['prune_widths'])
+    if cfg['amp']:
+        # backbone, FPN, SSH and heads in float16, MultiBoxLoss in float32
+        net = to_half(net)
     net.set_train(True)
 
     if cfg['resume_net'] is not None:
         pretrain_model_path = cfg['resume_net']
-        param_dict_retinaface = load_checkpoint(pretrain_model_path)
+        param_dict_retinaface = load_delta_checkpoint(pretrain_model_path)
         load_param_into_net(net, param_dict_retinaface)
         print(f"Resume Model from [{cfg['resume_net']}] Done.")
 
     loc_weight = cfg['loc_weight']
     class_weight = cfg['class_weight']
     landm_weight = cfg['landm_weight']
-    net = RetinaFaceWithLossCell(net, multibox_loss, loc_weight, class_weight, landm_weight)
+    normalize = InputNormalize((104, 117, 123)) if cfg['uint8_input'] else None
+
+    def make_loss_net(image_size):
+        multibox_loss = MultiBoxLoss(num_classes, anchor_cfg.num_priors(image_size), negative_ratio,
+                                     cfg['neg_mining'])
+        matcher = None
+        if cfg['device_match']:
+            matcher = PriorMatcher(anchor_cfg.priors((image_size, image_size), clip), cfg['variance'],
+                                   cfg['match_thresh'], cfg['max_faces'])
+        return RetinaFaceWithLossCell(net, multibox_loss, loc_weight, class_weight, landm_weight, matcher, normalize)
+
+    loss_net = make_loss_net(phases[0][2])
 
     lr = adjust_learning_rate(initial_lr, gamma, stepvalues, steps_per_epoch, max_epoch,
                               warmup_epoch=cfg['warmup_epoch'], lr_type1=lr_type)
 
     if cfg['optim'] == 'momentum':
-        opt = mindspore.nn.Momentum(net.trainable_params(), lr, momentum,weight_decay, loss_scale=1)
+        opt = mindspore.nn.Momentum(loss_net.trainable_params(), lr, momentum,weight_decay, loss_scale=1)
     elif cfg['optim'] == 'sgd':
-        opt = mindspore.nn.SGD(params=net.trainable_params(), learning_rate=lr, momentum=momentum,
+        opt = mindspore.nn.SGD(params=loss_net.trainable_params(), learning_rate=lr, momentum=momentum,
                                weight_decay=weight_decay, loss_scale=1)
     else:
         raise ValueError('optim is not define.')
 
-    net = TrainingWrapper(net, opt, grad_clip=cfg['grad_clip'])
-
-    model = Model(net)
-
-    config_ck = CheckpointConfig(save_checkpoint_steps=cfg['save_checkpoint_steps'],
-                                 keep_checkpoint_max=cfg['keep_checkpoint_max'])
-    ckpoint_cb = ModelCheckpoint(prefix="RetinaFace", directory=cfg['ckpt_path'], config=config_ck)
-
-    time_cb = TimeMonitor(data_size=ds_train.get_dataset_size())
-    callback_list = [LossMonitor(), time_cb, ckpoint_cb]
+    scale_update_cell = None
+    if cfg['amp']:
+        scale_update_cell = mindspore.nn.DynamicLossScaleUpdateCell(cfg['loss_scale'], 2, cfg['loss_scale_window'])
+
+    # the steps of every phase, the replayed rest of an interrupted epoch too
+    time_cb = TimeMonitor()
+    callback_list = [LossMonitor(), time_cb]
+    # the ranks share ckpt_path and hold the same weights, only the first one saves them
+    if rank == 0:
+        if cfg['async_checkpoint']:
+            ckpoint_cb = AsyncCheckpoint("RetinaFace", cfg['ckpt_path'], cfg['save_checkpoint_steps'],
+                                         cfg['keep_checkpoint_max'], cfg['checkpoint_only_changed'], steps_per_epoch)
+        else:
+            config_ck = CheckpointConfig(save_checkpoint_steps=cfg['save_checkpoint_steps'],
+                                         keep_checkpoint_max=cfg['keep_checkpoint_max'])
+            ckpoint_cb = ModelCheckpoint(prefix="RetinaFace", directory=cfg['ckpt_path'], config=config_ck)
+        callback_list.append(ckpoint_cb)
+    if cfg['profile_steps']:
+        callback_list.append(StepProfiler(cfg['profile_steps'], batch_size))
 
     print("============== Starting Training ==============")
-    model.train(max_epoch, ds_train, callbacks=callback_list, dataset_sink_mode=False)
+    train_net = None
+    loss_size = phases[0][2]
+    # a resumed training starts with the rest of its interrupted epoch, in the sample order of its seed
+    for start_epoch, end_epoch, image_size, skip_steps in resume_phases(
+            phases, *((state.epoch, state.step) if state else (0, 0))):
+        ds_train = make_dataset(num_workers, image_size, start_epoch, skip_steps)
+        if image_size != loss_size:
+            loss_net, loss_size = make_loss_net(image_size), image_size
+        loss_scale = train_net.scale_sense.asnumpy() if scale_update_cell and train_net else None
+        train_step = train_net.train_step.asnumpy() if train_net else None
+        # the phases share the weights of RetinaFace, the optimizer state, the learning rate schedule and the steps
+        train_net = TrainingWrapper(loss_net, opt, grad_clip=cfg['grad_clip'],
+                                    scale_update_cell=scale_update_cell)
+        if loss_scale is not None:
+            train_net.scale_sense.set_data(mindspore.Tensor(loss_scale))
+        if train_step is not None:
+            train_net.train_step.set_data(mindspore.Tensor(train_step))
+        if state is not None:
+            state.load(train_net)
+            state = None
+        print(f"Train epochs {start_epoch + 1} to {end_epoch} at {image_size}x{image_size}, "
+              f"{anchor_cfg.num_priors(image_size)} priors, from step {skip_steps + 1}.")
+        model = Model(train_net)
+        model.train(end_epoch, ds_train, callbacks=callback_list, dataset_sink_mode=False, initial_epoch=start_epoch)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='train')
@@ -1,5 +1,6 @@
 """detection init"""
 from .lr_schedule import *
-from .box_utils import decode_bbox, prior_box
+from .box_utils import decode_bbox, prior_box, AnchorConfig
 
-__all__ = ['warmup_cosine_annealing_lr','decode_bbox','prior_box','adjust_learning_rate']
+__all__ = ['warmup_cosine_annealing_lr','decode_bbox','prior_box','AnchorConfig','adjust_learning_rate',
+           'resize_schedule']
@@ -40,6 +40,56 @@ def prior_box(image_sizes, min_sizes, steps, clip=False):
 
     return output
 
+class AnchorConfig():
+    """
+    The anchor layout of RetinaFace, shared by the priors, the detection heads and the loss.
+
+    Args:
+        min_sizes (List): The anchor sizes of every active pyramid level. Default: [[16, 32], [64, 128], [256, 512]]
+        steps (List): The strides of the active pyramid levels, increasing and taken from 8, 16 and 32.
+            Default: [8, 16, 32]
+
+    Examples:
+        >>> anchor_cfg = AnchorConfig(min_sizes=[[64], [256]], steps=[16, 32])
+        >>> anchor_cfg.num_priors(640)
+        2000
+    """
+    strides = (8, 16, 32)
+
+    def __init__(self, min_sizes=None, steps=None):
+        self.min_sizes = [list(sizes) for sizes in (min_sizes or [[16, 32], [64, 128], [256, 512]])]
+        self.steps = list(steps or [8, 16, 32])
+        if len(self.min_sizes) != len(self.steps):
+            raise ValueError(f"Got {len(self.min_sizes)} levels of min_sizes but {len(self.steps)} steps.")
+        if any(step not in self.strides for step in self.steps) or sorted(set(self.steps)) != self.steps:
+            raise ValueError(f"steps must be increasing and taken from {self.strides}, but got {self.steps}.")
+        if not all(self.min_sizes):
+            raise ValueError("Every active level needs at least one anchor.")
+        self.levels = tuple(self.strides.index(step) for step in self.steps)
+        self.anchor_num = [len(sizes) for sizes in self.min_sizes]
+        self.cache = {}
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build the anchor layout from the 'anchor' entry of a config, the default layout if it is absent."""
+        anchor = cfg.get('anchor') or {}
+        return cls(anchor.get('min_sizes'), anchor.get('steps'))
+
+    def priors(self, image_sizes, clip=False):
+        """
+        The priors of an image of image_sizes (height, width), see ``prior_box``. The priors of every size are
+        built once and shared read-only, as training at several sizes asks for them again.
+        """
+        key = (tuple(image_sizes), clip)
+        if key not in self.cache:
+            self.cache[key] = prior_box(image_sizes, self.min_sizes, self.steps, clip)
+            self.cache[key].flags.writeable = False
+        return self.cache[key]
+
+    def num_priors(self, image_size):
+        """The number of priors of an image_size x image_size image, the num_boxes of ``MultiBoxLoss``."""
+        return sum(math.ceil(image_size / step) ** 2 * num for step, num in zip(self.steps, self.anchor_num))
+
 def center_point_2_box(boxes):
     """center_point_2_box"""
     return np.concatenate((boxes[:, 0:2] - boxes[:, 2:4] / 2,
@@ -47,94 +97,153 @@ def center_point_2_box(boxes):
 
 def compute_intersect(a, b):
     """compute_intersect"""
-    a_shape0 = a.shape[0]
-    b_shape0 = b.shape[0]
-    max_xy = np.minimum(
-        np.broadcast_to(np.expand_dims(a[:, 2:4], 1), [a_shape0, b_shape0, 2]),
-        np.broadcast_to(np.expand_dims(b[:, 2:4], 0), [a_shape0, b_shape0, 2]))
-    min_xy = np.maximum(
-        np.broadcast_to(np.expand_dims(a[:, 0:2], 1), [a_shape0, b_shape0, 2]),
-        np.broadcast_to(np.expand_dims(b[:, 0:2], 0), [a_shape0, b_shape0, 2]))
-    inter = np.maximum((max_xy - min_xy), np.zeros_like(max_xy - min_xy))
-    return inter[:, :, 0] * inter[:, :, 1]
+    # the x and y extents are broadcast separately, without [len(a), len(b), 2] copies
+    inter_w = np.minimum(a[..., :, None, 2], b[..., None, :, 2]) - np.maximum(a[..., :, None, 0], b[..., None, :, 0])
+    inter_h = np.minimum(a[..., :, None, 3], b[..., None, :, 3]) - np.maximum(a[..., :, None, 1], b[..., None, :, 1])
+    return np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
 
 def compute_overlaps(a, b):
     """compute_overlaps"""
     inter = compute_intersect(a, b)
-    area_a = np.broadcast_to(
-        np.expand_dims(
-            (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]), 1),
-        np.shape(inter))
-    area_b = np.broadcast_to(
-        np.expand_dims(
-            (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]), 0),
-        np.shape(inter))
-    union = area_a + area_b - inter
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a[..., :, None] + area_b[..., None, :] - inter
     return inter / union
 
+def _encode(matches, matches_landm, priors, var):
+    """Encode the matched boxes and landmarks of every prior."""
+    offset_cxcy = (matches[..., 0:2] + matches[..., 2:4]) / 2 - priors[:, 0:2]
+    offset_cxcy /= (var[0] * priors[:, 2:4])
+    wh = (matches[..., 2:4] - matches[..., 0:2]) / priors[:, 2:4]
+    wh[wh == 0] = 1e-12
+    wh = np.log(wh) / var[1]
+    loc = np.concatenate([offset_cxcy, wh], axis=-1)
+
+    matched = matches_landm.reshape(matches_landm.shape[:-1] + (5, 2))
+    offset_cxcy = matched - priors[:, None, 0:2]
+    offset_cxcy /= (priors[:, None, 2:4] * var[0])
+    landm = offset_cxcy.reshape(matches_landm.shape[:-1] + (10,))
+    return loc, landm
+
+def _best_index(overlaps, min_tie=-np.inf):
+    """
+    The index of the largest overlap of every row.
+
+    The IoU of a small box is the same for every prior of one size that contains it, so a row can peak at
+    several indices. Rows tied at a maximum of at least min_tie take the first index of ``np.argsort`` as the
+    sort-based matcher did, which keeps the targets identical to it. All other rows take the argmax.
+    """
+    best = overlaps.argmax(-1)
+    best_overlap = np.take_along_axis(overlaps, best[..., None], -1)
+    tied = ((overlaps == best_overlap).sum(-1) > 1) & (best_overlap[..., 0] >= min_tie)
+    if tied.any():
+        best[tied] = np.argsort(-overlaps[tied], axis=-1)[:, 0]
+    return best
+
 def match(threshold, boxes, priors, var, labels, landms):
-    """match"""
+    """
+    Match every prior to a ground truth box and encode its targets.
+
+    Every ground truth with an IoU of at least 0.2 is forced onto its best prior, and every other prior takes
+    the ground truth it overlaps most, as background below threshold. Ties go to the lowest index.
+
+    Args:
+        threshold (Float): The IoU below which a prior is background.
+        boxes (Numpy): The ground truth boxes, x1, y1, x2, y2, [num_gt, 4].
+        priors (Numpy): The priors, cx, cy, w, h, [num_priors, 4].
+        var (List): The variances of the encoding.
+        labels (Numpy): The labels of the ground truths, [num_gt].
+        landms (Numpy): The landmarks of the ground truths, [num_gt, 10].
+
+    Returns:
+        loc (Numpy), [num_priors, 4]. conf (Numpy), int32 [num_priors]. landm (Numpy), [num_priors, 10].
+    """
     overlaps = compute_overlaps(boxes, center_point_2_box(priors))
 
-    best_prior_overlap = overlaps.max(1, keepdims=True)
-    best_prior_idx = np.argsort(-overlaps, axis=1)[:, 0:1]
-
-    valid_gt_idx = best_prior_overlap[:, 0] >= 0.2
-    best_prior_idx_filter = best_prior_idx[valid_gt_idx, :]
-    if best_prior_idx_filter.shape[0] <= 0:
+    best_prior_idx = _best_index(overlaps)
+    valid_gt = overlaps[np.arange(boxes.shape[0]), best_prior_idx] >= 0.2
+    if not valid_gt.any():
         loc = np.zeros((priors.shape[0], 4), dtype=np.float32)
         conf = np.zeros((priors.shape[0],), dtype=np.int32)
         landm = np.zeros((priors.shape[0], 10), dtype=np.float32)
         return loc, conf, landm
 
-    best_truth_overlap = overlaps.max(0, keepdims=True)
-    best_truth_idx = np.argsort(-overlaps, axis=0)[:1, :]
-
-    best_truth_idx = best_truth_idx.squeeze(0)
-    best_truth_overlap = best_truth_overlap.squeeze(0)
-    best_prior_idx = best_prior_idx.squeeze(1)
-    best_prior_idx_filter = best_prior_idx_filter.squeeze(1)
-    best_truth_overlap[best_prior_idx_filter] = 2
-
-    for j in range(best_prior_idx.shape[0]):
-        best_truth_idx[best_prior_idx[j]] = j
-
-    matches = boxes[best_truth_idx]
-
-    # encode boxes
-    offset_cxcy = (matches[:, 0:2] + matches[:, 2:4]) / 2 - priors[:, 0:2]
-    offset_cxcy /= (var[0] * priors[:, 2:4])
-    wh = (matches[:, 2:4] - matches[:, 0:2]) / priors[:, 2:4]
-    wh[wh == 0] = 1e-12
-    wh = np.log(wh) / var[1]
-    loc = np.concatenate([offset_cxcy, wh], axis=1)
-
+    # a tie below threshold is background either way
+    best_truth_idx = _best_index(overlaps.T, min_tie=threshold)
+    best_truth_overlap = overlaps[best_truth_idx, np.arange(priors.shape[0])]
+    best_truth_overlap[best_prior_idx[valid_gt]] = 2
+    # force every ground truth onto its best prior, the last one wins when they share it
+    forced_prior, last = np.unique(best_prior_idx[::-1], return_index=True)
+    best_truth_idx[forced_prior] = boxes.shape[0] - 1 - last
 
+    loc, landm = _encode(boxes[best_truth_idx], landms[best_truth_idx], priors, var)
     conf = labels[best_truth_idx]
     conf[best_truth_overlap < threshold] = 0
 
-    matches_landm = landms[best_truth_idx]
-
-    # encode landms
-    matched = np.reshape(matches_landm, [-1, 5, 2])
-    priors = np.broadcast_to(np.expand_dims(priors, 1), [priors.shape[0], 5, 4])
-    offset_cxcy = matched[:, :, 0:2] - priors[:, :, 0:2]
-    offset_cxcy /= (priors[:, :, 2:4] * var[0])
-    landm = np.reshape(offset_cxcy, [-1, 10])
+    return loc, np.array(conf, dtype=np.int32), landm
 
+def match_batch(threshold, targets, priors, var):
+    """
+    ``match`` of a whole batch at once.
+
+    Args:
+        threshold (Float): The IoU below which a prior is background.
+        targets (List): The targets of every image, [num_gt, 15] of boxes, landmarks and label.
+        priors (Numpy): The priors, cx, cy, w, h, [num_priors, 4].
+        var (List): The variances of the encoding.
+
+    Returns:
+        loc (Numpy), [batch_size, num_priors, 4]. conf (Numpy), int32 [batch_size, num_priors].
+        landm (Numpy), [batch_size, num_priors, 10].
+    """
+    batch_size, num_priors = len(targets), priors.shape[0]
+    max_gt = max([target.shape[0] for target in targets] + [1])
+    # pad with empty boxes, which overlap no prior
+    padded = np.zeros((batch_size, max_gt, 15), dtype=np.float32)
+    is_gt = np.zeros((batch_size, max_gt), dtype=bool)
+    for i, target in enumerate(targets):
+        padded[i, :target.shape[0]] = target
+        is_gt[i, :target.shape[0]] = True
+
+    overlaps = compute_overlaps(padded[..., :4], center_point_2_box(priors))
+    overlaps[~is_gt] = -1
+
+    batch_idx = np.arange(batch_size)[:, None]
+    best_prior_idx = np.zeros((batch_size, max_gt), dtype=np.int64)
+    best_prior_idx[is_gt] = _best_index(overlaps[is_gt])
+    valid_gt = (overlaps[batch_idx, np.arange(max_gt), best_prior_idx] >= 0.2) & is_gt
+
+    best_truth_idx = overlaps.argmax(1)
+    best_truth_overlap = np.take_along_axis(overlaps, best_truth_idx[:, None], axis=1)[:, 0]
+    # ties are broken over the ground truths of one image, without the padding
+    tied = (best_truth_overlap >= threshold) & ((overlaps == best_truth_overlap[:, None]).sum(1) > 1)
+    for i, j in zip(*np.nonzero(tied)):
+        best_truth_idx[i, j] = _best_index(overlaps[i, :targets[i].shape[0], j][None], threshold)[0]
+    best_truth_overlap[np.nonzero(valid_gt)[0], best_prior_idx[valid_gt]] = 2
+    # force every ground truth onto its best prior, the last one of an image wins when they share it
+    gt_image, gt_idx = np.nonzero(is_gt)
+    keys = (gt_image * num_priors + best_prior_idx[gt_image, gt_idx])[::-1]
+    keys, last = np.unique(keys, return_index=True)
+    best_truth_idx[keys // num_priors, keys % num_priors] = gt_idx[::-1][last]
+
+    matches = padded[batch_idx, best_truth_idx]
+    loc, landm = _encode(matches[..., :4], matches[..., 4:14], priors, var)
+    conf = matches[..., 14]
+    conf[best_truth_overlap < threshold] = 0
 
+    # images without a ground truth of IoU 0.2 get no targets at all
+    empty = ~valid_gt.any(1)
+    loc[empty], conf[empty], landm[empty] = 0, 0, 0
     return loc, np.array(conf, dtype=np.int32), landm
 
 
 class Bboxencode():
     """Bbox_encode"""
-    def __init__(self, variances, match_thresh, image_size, clip=False):
+    def __init__(self, variances, match_thresh, image_size, clip=False, anchor_cfg=None):
         self.match_thresh = match_thresh
         self.variances = variances
-        self.priors = prior_box((image_size, image_size),
-                                [[16, 32], [64, 128], [256, 512]],
-                                [8, 16, 32],
-                                clip)
+        anchor_cfg = anchor_cfg or AnchorConfig()
+        self.priors = anchor_cfg.priors((image_size, image_size), clip)
 
     def __call__(self, image, targets):
 
@@ -147,6 +256,11 @@ class Bboxencode():
 
         return image, loc_t, conf_t, landm_t
 
+    def encode_batch(self, images, targets, batch_info=None):
+        """Encode a whole batch, the ``per_batch_map`` of ``Dataset.batch``."""
+        loc_t, conf_t, landm_t = match_batch(self.match_thresh, targets, self.priors, self.variances)
+        return images, list(loc_t), list(conf_t), list(landm_t)
+
 def decode_bbox(bbox, priors, var):
     """decode_bbox"""
     boxes = np.concatenate((
@@ -81,3 +81,30 @@ def adjust_learning_rate(initial_lr, gamma, stepvalues, steps_pre_epoch, total_e
                     lr = initial_lr
             lr_each_step.append(lr)
     return lr_each_step
+
+
+def resize_schedule(stages, total_epochs, image_size):
+    """
+    The phases of progressive resizing, training at smaller sizes in the first epochs and at image_size after.
+
+    Args:
+        stages (List): [start_epoch, size] pairs with increasing start epochs, the first one 0. Sizes are multiples
+            of 32, the largest stride. Default: None, image_size in every epoch.
+        total_epochs (Int): The epochs of the training.
+        image_size (Int): The size of every epoch without stages.
+
+    Returns:
+        List of (start_epoch, end_epoch, size), the end epoch excluded.
+
+    Examples:
+        >>> resize_schedule([[0, 320], [40, 480], [80, 640]], 120, 640)
+        [(0, 40, 320), (40, 80, 480), (80, 120, 640)]
+    """
+    stages = [list(stage) for stage in stages or [[0, image_size]]]
+    starts = [start for start, _ in stages]
+    if starts[0] != 0 or sorted(set(starts)) != starts or starts[-1] >= total_epochs:
+        raise ValueError(f"The start epochs must increase from 0 and stay below {total_epochs}, but got {starts}.")
+    if any(size % 32 for _, size in stages):
+        raise ValueError(f"The sizes must be multiples of 32, but got {[size for _, size in stages]}.")
+    ends = starts[1:] + [total_epochs]
+    return [(start, end, size) for (start, size), end in zip(stages, ends)]
@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmark the training dataset of a config without a model, per stage and as a whole."""
+import os
+import json
+import argparse
+import tempfile
+import cv2
+import numpy as np
+
+from datasets import create_dataset, stage_speed
+from utils import read_yaml
+
+from mindface.utils import benchmark_loader, CorePlan
+
+
+def make_synthetic_faces(root, num_classes, images_per_class, seed=0):
+    """
+    Write random 112x112 images into a folder per class, the layout of ImageFolderDataset
+    """
+    rng = np.random.default_rng(seed)
+    for label in range(num_classes):
+        os.makedirs(os.path.join(root, str(label)), exist_ok=True)
+        for i in range(images_per_class):
+            image = cv2.resize(rng.integers(0, 256, (14, 14, 3), dtype=np.uint8), (112, 112))
+            cv2.imwrite(os.path.join(root, str(label), f'{i}.jpg'), image)
+    return root
+
+
+def dataset_speed(train_info, num_batches=50, num_samples=256):
+    """
+    Report the stage throughput of one worker, and the throughput, batch time, ready ratio and worker CPU
+    share of the training dataset, see ``benchmark_loader``
+    """
+    core_plan = CorePlan.from_config(train_info)
+    report = {'backbone': train_info['backbone'], 'num_workers': core_plan.num_workers,
+              'stages': stage_speed(train_info, num_samples)}
+    report['bottleneck'] = min(report['stages'], key=report['stages'].get)
+    train_dataset = create_dataset(dataset_path=train_info['data_url'], do_train=True,
+                                   batch_size=train_info['batch_size'], target='CPU', is_parallel=False,
+                                   uint8_output=train_info['uint8_input'], num_workers=core_plan.num_workers)
+    report['loader'] = benchmark_loader(train_dataset, train_info['batch_size'], num_batches)
+
+    print(f"{'stage':<12}{'samples/s per worker':>22}")
+    for stage, samples_per_second in report['stages'].items():
+        print(f"{stage:<12}{samples_per_second:>22.1f}")
+    print(f"The slowest stage is {report['bottleneck']}.")
+    loader = report['loader']
+    print(f"{'workers':>10}{'samples/s':>12}{'batch(ms)':>12}{'ready':>8}{'worker CPU':>12}{'main CPU':>10}")
+    print(f"{core_plan.num_workers:>10}{loader['samples_per_second']:>12.1f}{loader['batch_ms']:>12.1f}"
+          f"{loader['ready_ratio']:>8.0%}{sum(loader['worker_cpu_share'].values()):>12.2f}"
+          f"{loader['main_cpu_share']:>10.2f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='dataset_speed')
+    parser.add_argument('--config', default='configs/train_config_casia.yaml', type=str, help='config path')
+    parser.add_argument('--num_batches', type=int, default=50, help='timed batches of the loader')
+    parser.add_argument('--num_samples', type=int, default=256, help='timed samples of every stage')
+    parser.add_argument('--num_workers', type=int, default=None, help='workers of the loader, num_workers of '
+                        'the config by default')
+    parser.add_argument('--synthetic', type=int, default=0, help='benchmark this many random images in 10 classes '
+                        'instead of the data_url of the config')
+    parser.add_argument('--json', type=str, default=None, help='also write the report to this file')
+    args = parser.parse_args()
+
+    config = read_yaml(args.config)
+    if args.num_workers:
+        config['num_workers'] = args.num_workers
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.synthetic:
+            config['data_url'] = make_synthetic_faces(synthetic_dir, 10, max(1, args.synthetic // 10))
+        result = dataset_speed(config, num_batches=args.num_batches, num_samples=args.num_samples)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
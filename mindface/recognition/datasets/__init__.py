@@ -1 +1,2 @@
-from .face_dataset import *
\ No newline at end of file
+from .face_dataset import *
+from .speed import *
\ No newline at end of file
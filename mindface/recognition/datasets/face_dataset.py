@@ -3,11 +3,20 @@ import mindspore.common.dtype as mstype
 import mindspore.dataset.engine as de
 import mindspore.dataset.vision as C
 import mindspore.dataset.transforms as C2
+from mindspore.common.seed import get_seed
 from mindspore.communication.management import init, get_rank, get_group_size
 
-__all__=["create_dataset"]
+from mindface.utils.resume import ResumableSampler
 
-def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmentation=None, target="Ascend", is_parallel=True):
+__all__=["create_dataset", "MEAN", "STD"]
+
+# the normalization of the images, by C.Normalize or by InputNormalize inside the network
+MEAN = [0.5 * 255, 0.5 * 255, 0.5 * 255]
+STD = [0.5 * 255, 0.5 * 255, 0.5 * 255]
+
+def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmentation=None, target="Ascend", is_parallel=True,
+                   uint8_output=False, num_workers=8, start_epoch=None, skip_steps=0, rank_info=None,
+                   dataset_size=None):
     """
     Create a train dataset.
     
@@ -19,6 +28,16 @@ def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmenta
         augmentation (List): Data augmentation. Default: None.
         target (String): The device target. Default: "Ascend".
         is_parallel (Bool): Parallel training parameters. Default: True.
+        uint8_output (Bool): Emit uint8 HWC images for ``InputNormalize`` to normalize inside the network, instead
+            of normalized float32 CHW images. Default: False.
+        num_workers (Int): The workers of the source and of every map. Default: 8.
+        start_epoch (Int): Draw the images with a ``ResumableSampler`` of the global seed from this epoch, so a
+            resumed training continues the order of the interrupted one. Default: None, the sampler of MindSpore.
+        skip_steps (Int): The steps to skip at the begin of every epoch of the ``ResumableSampler``. Default: 0.
+        rank_info (Tuple): The device number and rank id of a communication the caller has initialized, so the
+            datasets it builds one after another do not initialize it again. Default: None.
+        dataset_size (Int): The images of dataset_path, counted once by a caller that builds datasets one after
+            another. Default: None, the ``ResumableSampler`` of start_epoch counts them.
 
     Returns:
         ds (Object), data loader.
@@ -27,7 +46,9 @@ def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmenta
         >>> training_dataset = "/path/to/face_dataset"
         >>> train_dataset = create_dataset(dataset_path=training_dataset, do_train=True)
     """
-    if target == "Ascend":
+    if rank_info is not None:
+        device_num, rank_id = rank_info
+    elif target == "Ascend":
         device_num, rank_id = _get_rank_info()
     else:
         if is_parallel:
@@ -38,16 +59,21 @@ def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmenta
             rank_id = 0
             device_num = 1
 
-    if device_num == 1:
+    if start_epoch is not None:
+        if dataset_size is None:
+            dataset_size = de.ImageFolderDataset(dataset_path, shuffle=False).get_dataset_size()
+        sampler = ResumableSampler(dataset_size, True, get_seed() or 0, device_num, rank_id,
+                                   start_epoch, skip_steps * batch_size)
+        ds = de.ImageFolderDataset(dataset_path, num_parallel_workers=num_workers, sampler=sampler)
+    elif device_num == 1:
         ds = de.ImageFolderDataset(
-            dataset_path, num_parallel_workers=8, shuffle=True)
+            dataset_path, num_parallel_workers=num_workers, shuffle=True)
     else:
-        ds = de.ImageFolderDataset(dataset_path, num_parallel_workers=8, shuffle=True,
+        ds = de.ImageFolderDataset(dataset_path, num_parallel_workers=num_workers, shuffle=True,
                                    num_shards=device_num, shard_id=rank_id)
 
     image_size = 112
-    mean = [0.5 * 255, 0.5 * 255, 0.5 * 255]
-    std = [0.5 * 255, 0.5 * 255, 0.5 * 255]
+    normalize = [] if uint8_output else [C.Normalize(mean=MEAN, std=STD), C.HWC2CHW()]
 
     # define map operations
     if do_train:
@@ -56,24 +82,20 @@ def create_dataset(dataset_path, do_train, repeat_num=1, batch_size=32, augmenta
         else:
             trans = [
                 C.Decode(),
-                C.RandomHorizontalFlip(prob=0.5),
-                C.Normalize(mean=mean, std=std),
-                C.HWC2CHW()
-            ]
+                C.RandomHorizontalFlip(prob=0.5)
+            ] + normalize
     else:
         trans = [
             C.Decode(),
             C.Resize(256),
-            C.CenterCrop(image_size),
-            C.Normalize(mean=mean, std=std),
-            C.HWC2CHW()
-        ]
+            C.CenterCrop(image_size)
+        ] + normalize
 
     type_cast_op = C2.TypeCast(mstype.int32)
 
     ds = ds.map(input_columns="image",
-                num_parallel_workers=8, operations=trans)
-    ds = ds.map(input_columns="label", num_parallel_workers=8,
+                num_parallel_workers=num_workers, operations=trans)
+    ds = ds.map(input_columns="label", num_parallel_workers=num_workers,
                 operations=type_cast_op)
 
     # apply batch operations
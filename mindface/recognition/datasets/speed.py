@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import mindspore.dataset.vision as C
+
+from mindface.utils import time_stage
+from .face_dataset import MEAN, STD
+
+__all__=["stage_speed"]
+
+
+def stage_speed(train_info, num_samples=256):
+    """
+    The samples per second of one worker in the read, decode, augment and batch stages
+    """
+    data_dir = train_info['data_url']
+    paths = [os.path.join(root, name) for root, _, names in os.walk(data_dir) for name in sorted(names)]
+    paths = [paths[i % len(paths)] for i in range(num_samples)]
+    batch_size = min(train_info['batch_size'], num_samples)
+
+    def read(path):
+        with open(path, 'rb') as file:
+            return np.frombuffer(file.read(), dtype=np.uint8)
+
+    augment = [C.RandomHorizontalFlip(prob=0.5)]
+    if not train_info['uint8_input']:
+        augment += [C.Normalize(mean=MEAN, std=STD), C.HWC2CHW()]
+
+    def augmentation(image):
+        for op in augment:
+            image = op(image)
+        return image
+
+    stages = {}
+    stages['read'], samples = time_stage(read, [(path,) for path in paths])
+    stages['decode'], samples = time_stage(C.Decode(), [(data,) for data in samples])
+    stages['augment'], samples = time_stage(augmentation, [(image,) for image in samples])
+    batches = [(samples[i:i + batch_size],) for i in range(0, num_samples - batch_size + 1, batch_size)]
+    batches_per_second, _ = time_stage(np.stack, batches)
+    stages['batch'] = batches_per_second * batch_size
+    return stages
@@ -26,9 +26,10 @@ from sklearn.model_selection import KFold
 import matplotlib.pyplot as plt
 from scipy import interpolate
 import mindspore as ms
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
+from mindspore.train.serialization import load_param_into_net
 from mindspore import context
 
+from mindface.utils import fuse_for_inference, slim_channels, load_delta_checkpoint
 from .models import iresnet50, iresnet100, get_mbf
 
 
@@ -284,7 +285,7 @@ def test(data_set, backbone, batch_size, nfolds=10):
 
 def face_eval(model_name, ckpt_url, eval_url, num_features=512,
         target='lfw,cfp_fp,agedb_30,calfw,cplfw',
-        device_id=0, device_target="GPU", batch_size=64, nfolds=10
+        device_id=0, device_target="GPU", batch_size=64, nfolds=10, fuse=False, prune_widths=None, reparam=False
     ):
     """
     The eval of arcface.
@@ -298,6 +299,10 @@ def face_eval(model_name, ckpt_url, eval_url, num_features=512,
         device_target (String): The device target. Default: "GPU".
         batch_size (Int): The batch size of dataset. Default: 64.
         nfolds (Int): The eval folds. Default: 10.
+        fuse (Bool): Fold the BatchNorm layers into the convolutions before testing. Default: False.
+        prune_widths (List): The channel widths of a model pruned by prune.py. Default: None.
+        reparam (Bool): The iresnet was trained with reparameterizable blocks, collapse them before testing.
+            Default: False.
 
     Examples:
         >>> model_name = "iresnet50"
@@ -311,16 +316,23 @@ def face_eval(model_name, ckpt_url, eval_url, num_features=512,
     time0 = datetime.datetime.now()
 
     if model_name == "iresnet50":
-        model = iresnet50(num_features=num_features)
+        model = iresnet50(num_features=num_features, reparam=reparam)
     elif model_name == "iresnet100":
-        model = iresnet100(num_features=num_features)
+        model = iresnet100(num_features=num_features, reparam=reparam)
     elif model_name == "mobilefacenet":
         model = get_mbf(num_features=num_features)
     else:
         raise NotImplementedError
+    if prune_widths:
+        model = slim_channels(model, prune_widths)
 
-    param_dict = load_checkpoint(ckpt_url)
+    param_dict = load_delta_checkpoint(ckpt_url)
     load_param_into_net(model, param_dict)
+    if reparam:
+        model = model.reparameterize()
+    if fuse:
+        model = fuse_for_inference(model)
+        print("Folded the BatchNorm layers into their Conv2d and Dense layers.")
     time_now = datetime.datetime.now()
     diff = time_now - time0
     print('model loading time', diff.total_seconds())
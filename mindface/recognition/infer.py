@@ -15,11 +15,13 @@ inference of face recognition models
 # ============================================================================
 
 import mindspore as ms
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
+from mindspore.train.serialization import load_param_into_net
 
+from mindface.utils import fuse_for_inference, slim_channels, load_delta_checkpoint
 from .models import iresnet100, iresnet50, get_mbf
 
-def infer(img, backbone="iresnet50", num_features=512, pretrained=False):
+def infer(img, backbone="iresnet50", num_features=512, pretrained=False, fuse=False, prune_widths=None,
+          reparam=False):
     """
     The inference of arcface.
 
@@ -27,6 +29,10 @@ def infer(img, backbone="iresnet50", num_features=512, pretrained=False):
         img (NumPy): The input image.
         backbone (Object): Arcface model without loss function. Default: "iresnet50".
         pretrained (Bool): Pretrain. Default: False.
+        fuse (Bool): Fold the BatchNorm layers into the convolutions before inference. Default: False.
+        prune_widths (List): The channel widths of a model pruned by prune.py. Default: None.
+        reparam (Bool): The iresnet was trained with reparameterizable blocks, collapse them before inference.
+            Default: False.
 
     Examples:
         >>> img = input_img
@@ -42,17 +48,23 @@ def infer(img, backbone="iresnet50", num_features=512, pretrained=False):
         img = img.expand_dims(axis=0)
 
     if backbone == "iresnet50":
-        model = iresnet50(num_features=num_features)
+        model = iresnet50(num_features=num_features, reparam=reparam)
     elif backbone == "iresnet100":
-        model = iresnet100(num_features=num_features)
+        model = iresnet100(num_features=num_features, reparam=reparam)
     elif backbone == "mobilefacenet":
         model = get_mbf(num_features=num_features)
     else:
         raise NotImplementedError
+    if prune_widths:
+        model = slim_channels(model, prune_widths)
 
     if pretrained:
-        param_dict = load_checkpoint(pretrained)
+        param_dict = load_delta_checkpoint(pretrained)
         load_param_into_net(model, param_dict)
+    if reparam:
+        model = model.reparameterize()
+    if fuse:
+        model = fuse_for_inference(model)
 
     net_out = model(img)
     embeddings = net_out.asnumpy()
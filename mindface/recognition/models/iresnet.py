@@ -1,4 +1,6 @@
-from mindspore import nn
+import numpy as np
+
+from mindspore import nn, Tensor
 import mindspore.ops as ops
 from mindspore.common.initializer import initializer, HeNormal
 
@@ -36,6 +38,8 @@ class IBasicBlock(nn.Cell):
     IBasicBlock
     '''
     expansion = 1
+    residual = True
+    fuse_pairs = (('conv1', 'bn2'), ('conv2', 'bn3'))
 
     def __init__(self, inplanes, planes, stride=1, downsample=None,
                  groups=1, base_width=64, dilation=1):
@@ -86,6 +90,104 @@ class IBasicBlock(nn.Cell):
         return out
 
 
+class RepConv(nn.Cell):
+    '''
+    RepVGG-style convolution: a 3x3 conv-bn, a 1x1 conv-bn and, when the shapes allow it, an identity bn
+    branch that are summed while training and collapsed into one 3x3 convolution by reparameterize().
+    '''
+    def __init__(self, in_planes, out_planes, stride=1):
+        super(RepConv, self).__init__()
+        self.conv3x3 = conv3x3(in_planes, out_planes, stride)
+        self.bn3x3 = nn.BatchNorm2d(out_planes, eps=1e-05)
+        self.conv1x1 = conv1x1(in_planes, out_planes, stride)
+        self.bn1x1 = nn.BatchNorm2d(out_planes, eps=1e-05)
+        self.has_identity = in_planes == out_planes and stride == 1
+        if self.has_identity:
+            self.bn_identity = nn.BatchNorm2d(out_planes, eps=1e-05)
+
+    def construct(self, x):
+        '''
+        construct
+        '''
+        out = self.bn3x3(self.conv3x3(x)) + self.bn1x1(self.conv1x1(x))
+        if self.has_identity:
+            out += self.bn_identity(x)
+        return out
+
+    @staticmethod
+    def _fold(kernel, norm):
+        '''
+        fold an inference-mode bn into a 3x3 kernel
+        '''
+        gamma = norm.gamma.asnumpy().astype(np.float64)
+        std = np.sqrt(norm.moving_variance.asnumpy().astype(np.float64) + norm.eps)
+        mean = norm.moving_mean.asnumpy().astype(np.float64)
+        scale = gamma / std
+        return kernel * scale.reshape(-1, 1, 1, 1), norm.beta.asnumpy().astype(np.float64) - mean * scale
+
+    def reparameterize(self):
+        '''
+        Return the single 3x3 convolution computing the same output as the branches.
+        '''
+        out_planes, in_planes = self.conv3x3.weight.shape[:2]
+        kernel, bias = self._fold(self.conv3x3.weight.asnumpy().astype(np.float64), self.bn3x3)
+
+        kernel1x1 = np.zeros((out_planes, in_planes, 3, 3))
+        kernel1x1[:, :, 1:2, 1:2] = self.conv1x1.weight.asnumpy()
+        kernel1x1, bias1x1 = self._fold(kernel1x1, self.bn1x1)
+        kernel, bias = kernel + kernel1x1, bias + bias1x1
+
+        if self.has_identity:
+            kernel_id = np.zeros((out_planes, in_planes, 3, 3))
+            kernel_id[np.arange(out_planes), np.arange(in_planes), 1, 1] = 1
+            kernel_id, bias_id = self._fold(kernel_id, self.bn_identity)
+            kernel, bias = kernel + kernel_id, bias + bias_id
+
+        conv = nn.Conv2d(in_planes, out_planes, kernel_size=3, stride=self.conv3x3.stride, padding=1,
+                         pad_mode='pad', has_bias=True, weight_init=Tensor(kernel.astype(np.float32)),
+                         bias_init=Tensor(bias.astype(np.float32)))
+        prefix = self.conv3x3.weight.name[:-len('conv3x3.weight')]
+        conv.weight.name = prefix + 'weight'
+        conv.bias.name = prefix + 'bias'
+        return conv
+
+
+class RepIBasicBlock(nn.Cell):
+    '''
+    Reparameterizable IBasicBlock: RepConv-PReLU-RepConv-PReLU without the residual connection, whose
+    1x1 and identity branches take its place. After IResNet.reparameterize() every RepConv is a plain
+    3x3 convolution.
+    '''
+    expansion = 1
+    residual = False
+
+    def __init__(self, inplanes, planes, stride=1, downsample=None,
+                 groups=1, base_width=64, dilation=1):
+        super(RepIBasicBlock, self).__init__()
+        if groups != 1 or base_width != 64:
+            raise ValueError(
+                'RepIBasicBlock only supports groups=1 and base_width=64')
+        if dilation > 1:
+            raise NotImplementedError(
+                "Dilation > 1 not supported in RepIBasicBlock")
+        # the 1x1 branch of conv2 replaces the downsample
+        self.conv1 = RepConv(inplanes, planes)
+        self.prelu1 = nn.PReLU(planes)
+        self.conv2 = RepConv(planes, planes, stride)
+        self.prelu2 = nn.PReLU(planes)
+        self.stride = stride
+
+    def construct(self, x):
+        '''
+        construct
+        '''
+        out = self.conv1(x)
+        out = self.prelu1(out)
+        out = self.conv2(out)
+        out = self.prelu2(out)
+        return out
+
+
 class IResNet(nn.Cell):
     """
     Build the iresnet model.
@@ -103,6 +205,8 @@ class IResNet(nn.Cell):
         >>> model = IResNet(block, layers, **kwargs)
     """
     fc_scale = 7 * 7
+    fuse_pairs = (('conv1', 'bn1'), ('fc', 'features'))
+    fuse_input_pairs = (('bn2', 'fc'),)
 
     def __init__(self,
                  block, layers, dropout=0, num_features=512, zero_init_residual=False,
@@ -157,7 +261,8 @@ class IResNet(nn.Cell):
         if dilate:
             self.dilation *= stride
             stride = 1
-        if stride != 1 or self.inplanes != planes * block.expansion:
+        # a block without the residual connection has no use for a downsample
+        if block.residual and (stride != 1 or self.inplanes != planes * block.expansion):
             downsample = nn.SequentialCell([
                 conv1x1(self.inplanes, planes * block.expansion, stride),
                 nn.BatchNorm2d(planes * block.expansion, eps=1e-05)
@@ -193,6 +298,28 @@ class IResNet(nn.Cell):
                     cell.bias.set_data(initializer('zeros', cell.bias.data.shape, cell.bias.data.dtype))
 
 
+    def reparameterize(self):
+        '''
+        Collapse every RepConv of a network built with reparam=True into a single 3x3 convolution.
+        The returned network is inference only and computes the same outputs.
+
+        Examples:
+            >>> model = iresnet50(reparam=True)
+            >>> load_param_into_net(model, load_checkpoint(ckpt_url))
+            >>> model = model.reparameterize()
+        '''
+        self.set_train(False)
+        for _, cell in list(self.cells_and_names()):
+            for key, child in cell.name_cells().items():
+                if isinstance(child, RepConv):
+                    conv = child.reparameterize()
+                    names = [(param, param.name) for param in conv.get_parameters()]
+                    setattr(cell, key, conv)
+                    # setattr prefixes the parameter names with the attribute name only
+                    for param, name in names:
+                        param.name = name
+        return self
+
     def construct(self, x):
         '''
         construct
@@ -215,7 +342,9 @@ class IResNet(nn.Cell):
         return x
 
 
-def _iresnet(arch, block, layers, pretrained, progress, **kwargs):
+def _iresnet(arch, block, layers, pretrained, progress, reparam=False, **kwargs):
+    if reparam:
+        block = RepIBasicBlock
     model = IResNet(block, layers, **kwargs)
     if pretrained:
         raise ValueError()
@@ -228,6 +357,7 @@ def iresnet18(pretrained=False, progress=True, **kwargs):
 
     Examples:
         >>> net = iresnet18()
+        >>> net = iresnet18(reparam=True)
     """
     return _iresnet('iresnet18', IBasicBlock, [2, 2, 2, 2], pretrained,
                     progress, **kwargs)
@@ -239,6 +369,7 @@ def iresnet34(pretrained=False, progress=True, **kwargs):
 
     Examples:
         >>> net = iresnet34()
+        >>> net = iresnet34(reparam=True)
     """
     return _iresnet('iresnet34', IBasicBlock, [3, 4, 6, 3], pretrained,
                     progress, **kwargs)
@@ -250,6 +381,7 @@ def iresnet50(pretrained=False, progress=True, **kwargs):
 
     Examples:
         >>> net = iresnet50()
+        >>> net = iresnet50(reparam=True)
     """
     return _iresnet('iresnet50', IBasicBlock, [3, 4, 14, 3], pretrained,
                     progress, **kwargs)
@@ -261,6 +393,7 @@ def iresnet100(pretrained=False, progress=True, **kwargs):
 
     Examples:
         >>> net = iresnet100()
+        >>> net = iresnet100(reparam=True)
     """
     return _iresnet('iresnet100', IBasicBlock, [3, 13, 30, 3], pretrained,
                     progress, **kwargs)
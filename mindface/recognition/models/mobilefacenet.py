@@ -45,6 +45,12 @@ class DepthWise(Cell):
             LinearBlock(group, out_c, kernel=(1, 1), padding=(0, 0, 0, 0), stride=(1, 1))
         )
 
+    def prune_groups(self, prefix=''):
+        """Prunable channel groups inside the block, see ``mindface.utils.prune_channels``."""
+        return [([f'{prefix}layers.0.layers.0', f'{prefix}layers.0.layers.1', f'{prefix}layers.0.layers.2',
+                  f'{prefix}layers.1.layers.0', f'{prefix}layers.1.layers.1', f'{prefix}layers.1.layers.2'],
+                 [f'{prefix}layers.2.layers.0'])]
+
     def construct(self, x):
         short_cut = None
         if self.residual:
@@ -65,6 +71,13 @@ class Residual(Cell):
             Cells.append(DepthWise(c, c, True, kernel, stride, padding, group))
         self.layers = SequentialCell(*Cells)
 
+    def prune_groups(self, prefix=''):
+        """Prunable channel groups inside the block, see ``mindface.utils.prune_channels``."""
+        groups = []
+        for i, cell in enumerate(self.layers):
+            groups += cell.prune_groups(f'{prefix}layers.{i}.')
+        return groups
+
     def construct(self, x):
         return self.layers(x)
 
@@ -142,6 +155,22 @@ class MobileFaceNet(Cell):
                     cell.bias.set_data(initializer('zeros', cell.bias.data.shape, cell.bias.data.dtype))
         
 
+    def prune_groups(self):
+        """
+        Prunable channel groups, see ``mindface.utils.prune_channels``.
+
+        The expansion channels of every DepthWise block and the output of conv_sep, which the depthwise
+        GDC and its Dense read, are pruned. The trunk channels are tied by the residual additions.
+        """
+        groups = []
+        for i, cell in enumerate(self.layers):
+            if isinstance(cell, (DepthWise, Residual)):
+                groups += cell.prune_groups(f'layers.{i}.')
+        groups.append((['conv_sep.layers.0', 'conv_sep.layers.1', 'conv_sep.layers.2',
+                        'features.layers.0.layers.0', 'features.layers.0.layers.1'],
+                       ['features.layers.2']))
+        return groups
+
     def construct(self, x):
         for func in self.layers:
             x = func(x)
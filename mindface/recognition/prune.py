@@ -0,0 +1,78 @@
+'''
+structured channel pruning of the recognition backbones
+'''
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+import yaml
+
+from mindspore.train.serialization import load_param_into_net, save_checkpoint
+from mindspore import context
+
+from mindface.utils import prune_channels, count_params, count_flops, measure_throughput, load_delta_checkpoint
+from .models import get_mbf
+
+
+def face_prune(model_name, ckpt_url, save_url, num_features=512, ratio=0.3, criterion='bn',
+        device_target="GPU", batch_size=64
+    ):
+    """
+    Structured channel pruning of a recognition backbone.
+
+    The pruned weights are saved to save_url.ckpt and the slim architecture to save_url.yaml, whose
+    backbone, num_features and prune_widths go into the train config to fine-tune from the checkpoint.
+
+    Args:
+        model_name (String): The name of backbone, only "mobilefacenet" can be pruned.
+        ckpt_url (String): The The path of .ckpt
+        save_url (String): The path of the pruned model, without extension.
+        num_features (Int): The dimension of the embedding. Default: 512.
+        ratio (Float): The fraction of channels removed from every prunable layer. Default: 0.3.
+        criterion (String): Rank the channels by BatchNorm gamma ('bn') or filter L1 norm ('l1'). Default: 'bn'.
+        device_target (String): The device target. Default: "GPU".
+        batch_size (Int): The batch size used to measure the latency. Default: 64.
+
+    Returns:
+        widths (List), the number of channels kept in every prunable group.
+
+    Examples:
+        >>> widths = face_prune("mobilefacenet", "/path/to/ArcFace.ckpt", "/path/to/mobilefacenet_pruned")
+    """
+    # counting FLOPs reads the layer outputs on the host, which needs PYNATIVE_MODE
+    context.set_context(mode=context.PYNATIVE_MODE, device_target=device_target)
+    if model_name == "mobilefacenet":
+        model = get_mbf(num_features=num_features)
+    elif model_name in ("iresnet50", "iresnet100"):
+        raise NotImplementedError(f'{model_name} can not be pruned, its channels are tied by the residuals')
+    else:
+        raise NotImplementedError
+
+    param_dict = load_delta_checkpoint(ckpt_url)
+    load_param_into_net(model, param_dict)
+    model.set_train(False)
+
+    results = {}
+    results['origin'] = (count_params(model), count_flops(model, (1, 3, 112, 112)),
+                         measure_throughput(model, (batch_size, 3, 112, 112))[0])
+    model, widths = prune_channels(model, ratio, criterion)
+    results['pruned'] = (count_params(model), count_flops(model, (1, 3, 112, 112)),
+                         measure_throughput(model, (batch_size, 3, 112, 112))[0])
+
+    save_checkpoint(model, save_url + '.ckpt')
+    with open(save_url + '.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump({'backbone': model_name, 'num_features': num_features, 'prune_widths': widths,
+                        'resume': save_url + '.ckpt'}, f, sort_keys=False)
+
+    for name, (params, flops, latency) in results.items():
+        print('[%s]params: %.3fM, FLOPs: %.3fG, latency: %.2fms' % (name, params / 1e6, flops / 1e9, latency))
+    return widths
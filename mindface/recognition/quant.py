@@ -0,0 +1,138 @@
+'''
+post-training int8 quantization of the recognition backbones
+'''
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+import os
+
+import mindspore as ms
+from mindspore.train.serialization import load_param_into_net, save_checkpoint
+from mindspore import context
+
+from mindface.utils import fuse_for_inference, calibrate, quantize, measure_throughput, slim_channels, \
+    load_delta_checkpoint
+from .eval import load_bin, test
+from .models import iresnet50, iresnet100, get_mbf
+
+
+def build_model(model_name, ckpt_url, num_features=512, fuse=False, prune_widths=None, reparam=False):
+    '''build a backbone with trained weights, every parameter of the backbone from the checkpoint
+    '''
+    if model_name == "iresnet50":
+        model = iresnet50(num_features=num_features, reparam=reparam)
+    elif model_name == "iresnet100":
+        model = iresnet100(num_features=num_features, reparam=reparam)
+    elif model_name == "mobilefacenet":
+        model = get_mbf(num_features=num_features)
+    else:
+        raise NotImplementedError
+    if prune_widths:
+        model = slim_channels(model, prune_widths)
+
+    param_dict = load_delta_checkpoint(ckpt_url)
+    not_loaded = load_param_into_net(model, param_dict)
+    if isinstance(not_loaded, tuple):
+        # MindSpore 2.x also returns the checkpoint entries the network has no parameter for
+        not_loaded = not_loaded[0]
+    if not_loaded:
+        raise ValueError(f"{ckpt_url} does not hold the parameters {not_loaded} of {model_name}, "
+                         f"check reparam and prune_widths.")
+    if reparam:
+        model = model.reparameterize()
+    if fuse:
+        model = fuse_for_inference(model)
+    model.set_train(False)
+    return model
+
+
+def calib_batches(data, calib_num, batch_size):
+    '''normalized calibration batches from the head of an evalset
+    '''
+    data = data[:calib_num]
+    for ba in range(0, data.shape[0], batch_size):
+        img = ((data[ba: ba + batch_size] / 255) - 0.5) / 0.5
+        yield ms.Tensor(img, ms.float32)
+
+
+def face_quant(model_name, ckpt_url, eval_url, num_features=512, target='lfw',
+        calib_num=512, device_target="GPU", batch_size=64, nfolds=10, fuse=False, save_url=None,
+        prune_widths=None, reparam=False
+    ):
+    """
+    Post-training int8 quantization of a recognition backbone, calibrated on the first evalset of target.
+
+    Args:
+        model_name (String): The name of backbone.
+        ckpt_url (String): The The path of .ckpt
+        eval_url (String): The path of the .bin evalsets.
+        num_features (Int): The dimension of the embedding. Default: 512.
+        target (String): The eval datasets. Default: 'lfw'.
+        calib_num (Int): The number of calibration images. Default: 512.
+        device_target (String): The device target. Default: "GPU".
+        batch_size (Int): The batch size of dataset. Default: 64.
+        nfolds (Int): The eval folds. Default: 10.
+        fuse (Bool): Fold the BatchNorm layers into the convolutions before quantizing. Default: False.
+        save_url (String): The path of the int8 .ckpt, not saved if None. Default: None.
+        prune_widths (List): The channel widths of a pruned backbone, see prune.py. Default: None.
+        reparam (Bool): The IResNet was trained with the multi-branch RepIBasicBlock, which is reparameterized
+            before the BatchNorm layers are fused and the layers calibrated. Default: False.
+
+    Returns:
+        results (Dict), maps 'fp32' and 'int8' to (latency, throughput, {evalset: accuracy-flip}).
+
+    Examples:
+        >>> face_quant("mobilefacenet", "/path/to/ArcFace.ckpt", "/path/to/eval")
+    """
+    # calibration reads the activations back on the host, which needs PYNATIVE_MODE
+    context.set_context(mode=context.PYNATIVE_MODE, device_target=device_target)
+    image_size = [112, 112]
+
+    ver_list = []
+    ver_name_list = []
+    for name in target.split(','):
+        path = os.path.join(eval_url, name + ".bin")
+        if os.path.exists(path):
+            print('loading.. ', name)
+            ver_list.append(load_bin(path, image_size))
+            ver_name_list.append(name)
+    if not ver_list:
+        raise ValueError(f"no evalset of {target} found in {eval_url}")
+
+    model = build_model(model_name, ckpt_url, num_features, fuse, prune_widths, reparam)
+    q_model = build_model(model_name, ckpt_url, num_features, fuse, prune_widths, reparam)
+    print(f'calibrate on {calib_num} images of {ver_name_list[0]}')
+    ranges = calibrate(q_model, calib_batches(ver_list[0][0][0], calib_num, batch_size))
+    q_model = quantize(q_model, ranges)
+    print('quantized the calibrated layers to int8')
+    if save_url:
+        save_checkpoint(q_model, save_url)
+
+    context.set_context(mode=context.GRAPH_MODE)
+    results = {}
+    for name, net in (('fp32', model), ('int8', q_model)):
+        latency, throughput = measure_throughput(net, (batch_size, 3, image_size[0], image_size[1]))
+        accs = {}
+        for i, data_set in enumerate(ver_list):
+            _, _, acc2, _, _, _ = test(data_set, net, batch_size, nfolds)
+            accs[ver_name_list[i]] = acc2
+        results[name] = (latency, throughput, accs)
+
+    for name, (latency, throughput, accs) in results.items():
+        print('[%s]latency: %.2fms, throughput: %.2fimgs/sec' % (name, latency, throughput))
+        for ver_name, acc in accs.items():
+            print('[%s][%s]Accuracy-Flip: %1.5f' % (name, ver_name, acc))
+    for ver_name in ver_name_list:
+        print('[%s]Accuracy-Flip delta: %1.5f' %
+              (ver_name, results['int8'][2][ver_name] - results['fp32'][2][ver_name]))
+    return results
@@ -30,14 +30,24 @@ def lr_generator(lr_init, schedule, gamma, total_epochs, steps_per_epoch):
 class NetWithLoss(nn.Cell):
     """
     WithLossCell
+
+    Args:
+        backbone (Object): The backbone.
+        head (Object): The classification head.
+        loss_func (Object): The loss function.
+        normalize (Object): Normalizes the images before the backbone, e.g. ``InputNormalize`` for uint8 HWC
+            images. Default: None.
     """
-    def __init__(self, backbone, head, loss_func):
+    def __init__(self, backbone, head, loss_func, normalize=None):
         super(NetWithLoss, self).__init__(auto_prefix=False)
         self._backbone = backbone
         self.fc = head
         self.loss_func = loss_func
+        self.normalize = normalize
 
     def construct(self, data, label):
+        if self.normalize is not None:
+            data = self.normalize(data)
         out = self._backbone(data)
         out_fc = self.fc(out)
         loss = self.loss_func(out_fc, label)
@@ -17,23 +17,27 @@ Training face recognition models
 import os
 import argparse
 
-from datasets import create_dataset
+from datasets import create_dataset, stage_speed, MEAN, STD
 from models import iresnet100, iresnet50, get_mbf, PartialFC
 from loss import ArcFace
 from runner import NetWithLoss, TrainingWrapper, lr_generator
 from utils import read_yaml
 
 import mindspore
+import mindspore.dataset
 from mindspore import nn
 from mindspore import dtype as mstype
 from mindspore import context
 
 from mindspore.train.model import Model, ParallelMode
 from mindspore.train.callback import ModelCheckpoint, CheckpointConfig, LossMonitor, TimeMonitor
-from mindspore.communication.management import init, get_rank
+from mindspore.communication.management import init, get_rank, get_group_size
 from mindspore.parallel import _cost_model_context as cost_model_context
 from mindspore.parallel import set_algo_parameters
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
+from mindspore.train.serialization import load_param_into_net
+
+from mindface.utils import slim_channels, InputNormalize, autotune_loader, CorePlan, StepProfiler, \
+    AsyncCheckpoint, load_delta_checkpoint, TrainState, resume_phases
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Training')
@@ -84,14 +88,40 @@ if __name__ == "__main__":
     else:
         device_id = int(os.getenv('DEVICE_ID'))
 
-    train_dataset = create_dataset(
-        dataset_path=train_info['data_url'],
-        do_train=True,
-        repeat_num=1,
-        batch_size=train_info['batch_size'],
-        target=args.device_target,
-        is_parallel=(args.device_num > 1)
-            )
+    # the communication of a parallel GPU training is initialized once above, not by every dataset of the autotuning
+    rank_info = (get_group_size(), get_rank()) if args.device_num > 1 and args.device_target == 'GPU' else None
+
+    # the images are counted once for the ResumableSampler of every dataset built below
+    dataset_size = mindspore.dataset.ImageFolderDataset(train_info['data_url'], shuffle=False).get_dataset_size()
+
+    def make_dataset(num_workers, start_epoch=0, skip_steps=0):
+        return create_dataset(
+            dataset_path=train_info['data_url'],
+            do_train=True,
+            repeat_num=1,
+            batch_size=train_info['batch_size'],
+            target=args.device_target,
+            is_parallel=(args.device_num > 1),
+            uint8_output=train_info['uint8_input'],
+            num_workers=num_workers,
+            start_epoch=start_epoch,
+            skip_steps=skip_steps,
+            rank_info=rank_info,
+            dataset_size=dataset_size
+                )
+
+    # the ranks are started on one host and split its cores
+    core_plan = CorePlan.from_config(train_info, args.device_num, get_rank() if args.device_num > 1 else 0)
+    core_plan.apply()
+    num_workers = core_plan.num_workers
+    if train_info['prefetch_size']:
+        mindspore.dataset.config.set_prefetch_size(train_info['prefetch_size'])
+    if train_info['autotune_loader']:
+        num_workers, _ = autotune_loader(make_dataset, max_workers=len(core_plan.loader_cores),
+                                         step_time=train_info['autotune_step_time'],
+                                         batch_size=train_info['batch_size'],
+                                         stage_speed=lambda: stage_speed(train_info))
+    train_dataset = make_dataset(num_workers)
 
     step = train_dataset.get_dataset_size()
     lr = lr_generator(train_info['learning_rate'], train_info['schedule'],
@@ -100,42 +130,58 @@ if __name__ == "__main__":
     if train_info['backbone'] == 'mobilefacenet':
         net = get_mbf(num_features=train_info['num_features'])
     elif train_info['backbone'] == 'iresnet50':
-        net = iresnet50(num_features=train_info['num_features'])
+        net = iresnet50(num_features=train_info['num_features'], reparam=train_info['reparam'])
     elif train_info['backbone'] == 'iresnet100':
-        net = iresnet100(num_features=train_info['num_features'])
+        net = iresnet100(num_features=train_info['num_features'], reparam=train_info['reparam'])
     else:
         raise NotImplementedError
 
+    if train_info['prune_widths']:
+        net = slim_channels(net, train_info['prune_widths'])
+
     if train_info["resume"]:
-        param_dict = load_checkpoint(train_info["resume"])
+        param_dict = load_delta_checkpoint(train_info["resume"])
         load_param_into_net(net, param_dict)
 
     head = PartialFC(num_classes=train_info["num_classes"], world_size=args.device_num)
 
     loss_func = ArcFace(world_size=args.device_num)
 
-    train_net = NetWithLoss(net.to_float(mstype.float16), head.to_float(mstype.float32), loss_func)
+    normalize = InputNormalize(MEAN, STD) if train_info['uint8_input'] else None
+    train_net = NetWithLoss(net.to_float(mstype.float16), head.to_float(mstype.float32), loss_func, normalize)
     optimizer = nn.SGD(params=train_net.trainable_params(), learning_rate=lr,
                        momentum=train_info['momentum'], weight_decay=train_info['weight_decay'])
 
     train_net = TrainingWrapper(train_net, optimizer)
 
+    # the weights, optimizer moments, global step of the learning rate and the data position
+    state = TrainState(train_info['resume_state'], step) if train_info['resume_state'] else None
+    if state is not None:
+        state.load(train_net)
+
     model = Model(train_net)
 
-    config_ck = CheckpointConfig(save_checkpoint_steps=train_info["save_checkpoint_steps"], 
-                                keep_checkpoint_max=train_info["keep_checkpoint_max"])
+    if train_info['async_checkpoint']:
+        ckpt_cb = AsyncCheckpoint("_".join([train_info["method"], train_info['backbone']]), train_info['train_url'],
+                                  train_info["save_checkpoint_steps"], train_info["keep_checkpoint_max"],
+                                  train_info['checkpoint_only_changed'], step)
+    else:
+        config_ck = CheckpointConfig(save_checkpoint_steps=train_info["save_checkpoint_steps"], 
+                                    keep_checkpoint_max=train_info["keep_checkpoint_max"])
 
-    ckpt_cb = ModelCheckpoint(prefix="_".join([train_info["method"], train_info['backbone']]), 
-                                config=config_ck, directory=train_info['train_url'])
-    time_cb = TimeMonitor(data_size=train_dataset.get_dataset_size())
+        ckpt_cb = ModelCheckpoint(prefix="_".join([train_info["method"], train_info['backbone']]), 
+                                    config=config_ck, directory=train_info['train_url'])
+    # the steps of every phase, the replayed rest of an interrupted epoch too
+    time_cb = TimeMonitor()
     loss_cb = LossMonitor()
     cb = [ckpt_cb, time_cb, loss_cb]
-
-    if args.device_num == 1:
-        model.train(train_info['epochs'], train_dataset,
-                    callbacks=cb, dataset_sink_mode=False)
-    elif args.device_num > 1 and get_rank() % 8 == 0:
-        model.train(train_info['epochs'], train_dataset,
-                    callbacks=cb, dataset_sink_mode=False)
-    else:
-        model.train(train_info['epochs'], train_dataset, dataset_sink_mode=False)
+    if train_info['profile_steps']:
+        cb.append(StepProfiler(train_info['profile_steps'], train_info['batch_size']))
+
+    if args.device_num > 1 and get_rank() % 8 != 0:
+        cb = None
+    # a resumed training starts with the rest of its interrupted epoch, in the image order of its seed
+    for start_epoch, end_epoch, skip_steps in resume_phases(
+            [(0, train_info['epochs'])], *((state.epoch, state.step) if state else (0, 0))):
+        train_dataset = make_dataset(num_workers, start_epoch, skip_steps)
+        model.train(end_epoch, train_dataset, callbacks=cb, dataset_sink_mode=False, initial_epoch=start_epoch)
@@ -0,0 +1,18 @@
+"""utils init"""
+from .fuse import fuse_for_inference
+from .quant import QuantConv2d, QuantDense, calibrate, quantize
+from .prune import prune_channels, slim_channels, count_params
+from .speed import measure_throughput, count_flops
+from .normalize import InputNormalize
+from .loader import cpu_count, time_batches, autotune_loader, time_stage, benchmark_loader
+from .resources import CorePlan
+from .profiler import StepProfiler, host_rss_mb
+from .amp import to_half
+from .checkpoint import AsyncCheckpoint, load_delta_checkpoint
+from .resume import ResumableSampler, TrainState, resume_phases
+
+__all__ = ['fuse_for_inference', 'QuantConv2d', 'QuantDense', 'calibrate', 'quantize',
+           'prune_channels', 'slim_channels', 'count_params', 'measure_throughput', 'count_flops',
+           'InputNormalize', 'cpu_count', 'time_batches', 'autotune_loader',
+           'time_stage', 'benchmark_loader', 'CorePlan', 'StepProfiler', 'host_rss_mb', 'to_half',
+           'AsyncCheckpoint', 'load_delta_checkpoint', 'ResumableSampler', 'TrainState', 'resume_phases']
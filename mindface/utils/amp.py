@@ -0,0 +1,41 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Mixed precision training."""
+from mindspore import nn
+from mindspore.common import dtype as mstype
+
+__all__ = ['to_half']
+
+
+def to_half(network, keep_fp32=(nn.BatchNorm1d, nn.BatchNorm2d)):
+    """
+    Run a network in float16 but its normalization layers, whose statistics stay in float32. The parameters
+    stay in float32, every cell casts its inputs.
+
+    Args:
+        network (Cell): The network.
+        keep_fp32 (Tuple): The cell types that run in float32. Default: (nn.BatchNorm1d, nn.BatchNorm2d).
+
+    Returns:
+        Cell, the network.
+
+    Examples:
+        >>> net = to_half(RetinaFace(phase='train', backbone=backbone))
+        >>> net = RetinaFaceWithLossCell(net, multibox_loss)
+    """
+    network.to_float(mstype.float16)
+    for _, cell in network.cells_and_names():
+        if isinstance(cell, keep_fp32):
+            cell.to_float(mstype.float32)
+    return network
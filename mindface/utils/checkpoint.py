@@ -0,0 +1,217 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Checkpoints written off the training thread."""
+import os
+import queue
+import hashlib
+import threading
+import numpy as np
+
+from mindspore import Tensor
+from mindspore.train.callback import Callback
+from mindspore.train.serialization import save_checkpoint, load_checkpoint
+
+__all__ = ['AsyncCheckpoint', 'load_delta_checkpoint']
+
+
+def _fsync(path):
+    """Flush a file or a directory to the disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove_file(path):
+    """Remove a file unless it is already gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _digest(array):
+    """The digest of the bytes of an array."""
+    return hashlib.blake2b(np.ascontiguousarray(array).view(np.uint8), digest_size=16).digest()
+
+
+class AsyncCheckpoint(Callback):
+    """
+    Save the parameters of the training network every save_checkpoint_steps steps without stalling the steps.
+
+    The training thread only copies the parameters to host memory. A background thread writes them to
+    ``{prefix}-{epoch}_{step}.ckpt``, fsyncs and renames the file into place, so a crash never leaves a partial
+    checkpoint, and keeps the newest keep_checkpoint_max checkpoints. A snapshot waits until the previous one
+    is written before it copies, so at most one copy is held in host memory. With only_changed, the first save is
+    the full ``{prefix}-base.ckpt`` and every later one ``{prefix}-{epoch}_{step}-delta.ckpt`` holds only the
+    parameters that differ from it, see ``load_delta_checkpoint``.
+
+    The epoch and step of a checkpoint and the steps it is saved at count the steps of a whole epoch, so the
+    dataset of an interrupted epoch that skips its first steps, see ``resume_phases``, is saved and named like
+    the epoch it finishes.
+
+    Args:
+        prefix (Str): The prefix of the checkpoint files.
+        directory (Str): The directory of the checkpoint files.
+        save_checkpoint_steps (Int): The steps between two saves. Default: 1000.
+        keep_checkpoint_max (Int): The checkpoints kept, the base not counted. Default: 5.
+        only_changed (Bool): Write only the parameters that changed since the base. Default: False.
+        steps_per_epoch (Int): The steps of a whole epoch. Default: None, the steps of the dataset trained on.
+
+    Examples:
+        >>> ckpt_cb = AsyncCheckpoint("RetinaFace", "./ckpt", save_checkpoint_steps=1000, keep_checkpoint_max=10)
+        >>> model.train(epoch, ds_train, callbacks=[LossMonitor(), ckpt_cb], dataset_sink_mode=False)
+    """
+    def __init__(self, prefix, directory, save_checkpoint_steps=1000, keep_checkpoint_max=5, only_changed=False,
+                 steps_per_epoch=None):
+        super().__init__()
+        self.prefix = prefix
+        self.directory = directory
+        self.save_checkpoint_steps = save_checkpoint_steps
+        self.keep_checkpoint_max = keep_checkpoint_max
+        self.only_changed = only_changed
+        self.steps_per_epoch = steps_per_epoch
+        self.epoch_step = 0
+        self.base_digests = None
+        self.saved_step = None
+        self.queue = queue.Queue(maxsize=1)
+        self.thread = None
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+
+    def on_train_epoch_begin(self, run_context):
+        """Start the step count of the epoch after the steps its dataset skips."""
+        cb_params = run_context.original_args()
+        self.epoch_step = (self.steps_per_epoch or cb_params.batch_num) - cb_params.batch_num
+
+    def on_train_step_end(self, run_context):
+        """Snapshot the parameters every save_checkpoint_steps steps."""
+        cb_params = run_context.original_args()
+        self.epoch_step += 1
+        if self._train_step(cb_params) % self.save_checkpoint_steps == 0:
+            self.snapshot(cb_params)
+
+    def on_train_end(self, run_context):
+        """Snapshot the last step if it is not saved, and wait for the writes."""
+        cb_params = run_context.original_args()
+        if self.saved_step != self._train_step(cb_params):
+            self.snapshot(cb_params)
+        self.flush()
+
+    def _train_step(self, cb_params):
+        """The steps trained since the first epoch."""
+        return (cb_params.cur_epoch_num - 1) * (self.steps_per_epoch or cb_params.batch_num) + self.epoch_step
+
+    def snapshot(self, cb_params):
+        """Copy the parameters of the training network to host memory and queue them for the writer."""
+        # the writer drops the previous copy once it is written
+        self.queue.join()
+        self._raise_error()
+        name = f"{self.prefix}-{cb_params.cur_epoch_num}_{self.epoch_step}"
+        params = [(param.name, param.asnumpy().copy()) for param in cb_params.train_network.get_parameters()]
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._write_loop, name='AsyncCheckpoint', daemon=True)
+            self.thread.start()
+        self.queue.put((name, params))
+        self.saved_step = self._train_step(cb_params)
+
+    def flush(self):
+        """Wait until every queued checkpoint is written."""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Writing a checkpoint failed.") from error
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as error:  # pylint: disable=broad-except
+                self.error = error
+            finally:
+                item = None
+                self.queue.task_done()
+
+    def _write(self, name, params):
+        """Write, fsync and rename a checkpoint into place, then drop the oldest ones."""
+        if self.only_changed:
+            digests = {param_name: _digest(data) for param_name, data in params}
+            if self.base_digests is None:
+                # the deltas of an earlier run refer to the base replaced here
+                self._remove(lambda file: file.endswith('-delta.ckpt'))
+                name = f"{self.prefix}-base"
+                self.base_digests = digests
+            else:
+                name = f"{name}-delta"
+                params = [(param_name, data) for param_name, data in params
+                          if digests[param_name] != self.base_digests.get(param_name)]
+        path = os.path.join(self.directory, f"{name}.ckpt")
+        tmp_path = os.path.join(self.directory, f".{name}.{os.getpid()}.ckpt")
+        save_checkpoint([{'name': param_name, 'data': Tensor(data)} for param_name, data in params], tmp_path)
+        _fsync(tmp_path)
+        os.replace(tmp_path, path)
+        _fsync(self.directory)
+        self._rotate()
+
+    def _checkpoints(self):
+        """The checkpoints of the prefix but the base, the oldest first."""
+        base = f"{self.prefix}-base.ckpt"
+        files = []
+        for file in os.listdir(self.directory):
+            if file.startswith(f"{self.prefix}-") and file.endswith('.ckpt') and file != base:
+                path = os.path.join(self.directory, file)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    # removed by another writer of the directory since it was listed
+                    continue
+        return [path for _, path in sorted(files)]
+
+    def _remove(self, condition):
+        for file in self._checkpoints():
+            if condition(file):
+                _remove_file(file)
+
+    def _rotate(self):
+        files = self._checkpoints()
+        for file in files[:max(0, len(files) - self.keep_checkpoint_max)]:
+            _remove_file(file)
+
+
+def load_delta_checkpoint(path):
+    """
+    Load a checkpoint like ``load_checkpoint``, the delta checkpoint of ``AsyncCheckpoint`` over its base.
+
+    Returns:
+        Dict, the parameters by name.
+
+    Examples:
+        >>> load_param_into_net(network, load_delta_checkpoint('ckpt/RetinaFace-120_402-delta.ckpt'))
+    """
+    if not path.endswith('-delta.ckpt'):
+        return load_checkpoint(path)
+    directory, name = os.path.split(path)
+    prefix = name.rsplit('-', 2)[0]
+    param_dict = load_checkpoint(os.path.join(directory, f"{prefix}-base.ckpt"))
+    param_dict.update(load_checkpoint(path))
+    return param_dict
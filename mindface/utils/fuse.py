@@ -0,0 +1,161 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Fold BatchNorm layers into the neighbouring Conv2d/Dense for inference."""
+import numpy as np
+
+from mindspore import nn
+from mindspore import Tensor
+
+__all__ = ['fuse_for_inference']
+
+
+class _Identity(nn.Cell):
+    """Stand-in for a BatchNorm layer that has been folded away."""
+    def construct(self, x):
+        return x
+
+
+def _norm_scale_shift(norm):
+    """Return the per-channel (scale, shift) that an inference-mode BatchNorm applies."""
+    gamma = norm.gamma.asnumpy().astype(np.float64)
+    beta = norm.beta.asnumpy().astype(np.float64)
+    mean = norm.moving_mean.asnumpy().astype(np.float64)
+    var = norm.moving_variance.asnumpy().astype(np.float64)
+    scale = gamma / np.sqrt(var + norm.eps)
+    return scale, beta - mean * scale
+
+
+def _layer_weight_bias(layer):
+    """Return the float64 (weight, bias) of a Conv2d or Dense, with a zero bias if it has none."""
+    weight = layer.weight.asnumpy().astype(np.float64)
+    if layer.has_bias:
+        bias = layer.bias.asnumpy().astype(np.float64)
+    else:
+        bias = np.zeros(weight.shape[0], dtype=np.float64)
+    return weight, bias
+
+
+def _build_layer(layer, weight, bias):
+    """Build a biased copy of ``layer`` holding the given weight and bias, keeping its parameter names."""
+    dtype = layer.weight.asnumpy().dtype
+    weight = Tensor(weight.astype(dtype))
+    bias = Tensor(bias.astype(dtype))
+    if isinstance(layer, nn.Conv2d):
+        new_layer = nn.Conv2d(layer.in_channels, layer.out_channels, layer.kernel_size, stride=layer.stride,
+                              pad_mode=layer.pad_mode, padding=layer.padding, dilation=layer.dilation,
+                              group=layer.group, has_bias=True, weight_init=weight, bias_init=bias)
+    else:
+        new_layer = nn.Dense(layer.in_channels, layer.out_channels, weight_init=weight, bias_init=bias,
+                             has_bias=True, activation=layer.activation)
+    new_layer.weight.name = layer.weight.name
+    if layer.has_bias:
+        new_layer.bias.name = layer.bias.name
+    else:
+        new_layer.bias.name = layer.weight.name[:-len('weight')] + 'bias'
+    return new_layer
+
+
+def _fold_output_norm(layer, norm):
+    """Fold a BatchNorm applied to the output of ``layer``."""
+    weight, bias = _layer_weight_bias(layer)
+    scale, shift = _norm_scale_shift(norm)
+    weight = weight * scale.reshape((-1,) + (1,) * (weight.ndim - 1))
+    bias = bias * scale + shift
+    return _build_layer(layer, weight, bias)
+
+
+def _fold_input_norm(layer, norm):
+    """Fold a BatchNorm applied (through a flatten) to the input of a Dense ``layer``."""
+    weight, bias = _layer_weight_bias(layer)
+    scale, shift = _norm_scale_shift(norm)
+    repeat = weight.shape[1] // scale.shape[0]
+    scale = np.repeat(scale, repeat)
+    shift = np.repeat(shift, repeat)
+    bias = bias + weight.dot(shift)
+    weight = weight * scale[np.newaxis, :]
+    return _build_layer(layer, weight, bias)
+
+
+def _is_output_pair(layer, norm):
+    """Whether ``norm`` directly follows ``layer`` and can be folded into it."""
+    if isinstance(layer, nn.Conv2d) and isinstance(norm, nn.BatchNorm2d):
+        return True
+    return isinstance(layer, nn.Dense) and isinstance(norm, nn.BatchNorm1d) and layer.activation is None
+
+
+def _set_child(parent, key, child):
+    """Replace the sub cell ``key`` of ``parent`` without renaming the parameters of ``child``."""
+    names = [(param, param.name) for param in child.get_parameters()]
+    setattr(parent, key, child)
+    if isinstance(parent, nn.SequentialCell):
+        parent.cell_list = list(parent.cells())
+    for param, name in names:
+        param.name = name
+
+
+def _fuse_sequential(cell):
+    """Fold every adjacent (Conv2d, BatchNorm2d) or (Dense, BatchNorm1d) pair of a SequentialCell."""
+    for i in range(len(cell) - 1):
+        layer, norm = cell[i], cell[i + 1]
+        if _is_output_pair(layer, norm):
+            _set_child(cell, str(i), _fold_output_norm(layer, norm))
+            _set_child(cell, str(i + 1), _Identity())
+
+
+def _fuse_named(cell):
+    """Fold the attribute pairs a cell declares in ``fuse_pairs`` and ``fuse_input_pairs``."""
+    for norm_name, layer_name in getattr(cell, 'fuse_input_pairs', ()):
+        norm, layer = getattr(cell, norm_name), getattr(cell, layer_name)
+        _set_child(cell, layer_name, _fold_input_norm(layer, norm))
+        _set_child(cell, norm_name, _Identity())
+    for layer_name, norm_name in getattr(cell, 'fuse_pairs', ()):
+        layer, norm = getattr(cell, layer_name), getattr(cell, norm_name)
+        if not _is_output_pair(layer, norm):
+            raise TypeError(f"Can not fold '{norm_name}' into '{layer_name}' of {type(cell).__name__}.")
+        _set_child(cell, layer_name, _fold_output_norm(layer, norm))
+        _set_child(cell, norm_name, _Identity())
+
+
+def fuse_for_inference(net):
+    """
+    Fold every BatchNorm of a trained network into the Conv2d or Dense next to it.
+
+    Cells built with ``nn.SequentialCell`` (``ConvBNReLU``, ``conv_dw``, ``ConvBlock`` ...) are folded
+    automatically. Cells that call their layers by attribute declare the pairs to fold in a ``fuse_pairs``
+    class attribute, ``(layer, norm)`` for a BatchNorm that follows the layer, and in ``fuse_input_pairs``,
+    ``(norm, layer)`` for a BatchNorm that feeds a Dense through a flatten (the ``bn2`` -> ``fc`` tail of
+    ``IResNet``). BatchNorms that precede a padded convolution, such as ``IBasicBlock.bn1``, are kept
+    because folding them would change the border values.
+
+    The network is modified in place and switched to inference mode, so load the trained checkpoint
+    before calling it.
+
+    Args:
+        net (Cell): The network to fuse.
+
+    Returns:
+        net (Cell), the fused network.
+
+    Examples:
+        >>> network = RetinaFace(phase='predict', backbone=mobilenet025(1000), in_channel=32, out_channel=64)
+        >>> load_param_into_net(network, load_checkpoint('RetinaFace.ckpt'))
+        >>> network = fuse_for_inference(network)
+    """
+    net.set_train(False)
+    for _, cell in list(net.cells_and_names()):
+        if isinstance(cell, nn.SequentialCell):
+            _fuse_sequential(cell)
+        else:
+            _fuse_named(cell)
+    return net
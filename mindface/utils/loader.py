@@ -0,0 +1,187 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Data loader tuning and benchmarking."""
+import os
+import math
+import time
+
+import mindspore.dataset as de
+
+__all__ = ['cpu_count', 'time_batches', 'autotune_loader', 'time_stage', 'benchmark_loader']
+
+
+def cpu_count():
+    """The cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _iterate(dataset):
+    """An iterator of a loader past its first batch, which waits for the workers to start."""
+    iterator = dataset.create_tuple_iterator(num_epochs=1, output_numpy=True)
+    if next(iterator, None) is None:
+        raise ValueError("The loader has no batch, it needs more samples than its batch size.")
+    return iterator
+
+def _time_iterator(iterator, num_batches):
+    """The seconds every one of up to num_batches batches took."""
+    times = []
+    start = time.time()
+    for _ in range(num_batches):
+        try:
+            next(iterator)
+        except StopIteration:
+            break
+        end = time.time()
+        times.append(end - start)
+        start = end
+    if not times:
+        raise ValueError("The loader has a single batch, timing it needs at least two batches of samples.")
+    return times
+
+def time_batches(dataset, num_batches):
+    """
+    Time num_batches batches of a dataset after its first batch, which waits for the workers to start.
+
+    Returns:
+        times (List), the seconds every batch took.
+    """
+    return _time_iterator(_iterate(dataset), num_batches)
+
+def autotune_loader(make_dataset, max_workers=None, step_time=None, num_batches=8, min_gain=1.1,
+                    stage_speed=None, batch_size=None):
+    """
+    Choose the workers and prefetch depth of a data loader from a short warm-up.
+
+    The stages of stage_speed are timed first and their throughput is printed, with the workers the slowest
+    one needs to produce a batch every step_time. The loader is then built with 1, 2, 4, ... workers up to
+    max_workers and times num_batches batches each. The workers grow while they speed the loader up by
+    min_gain, and stop once a batch takes at most step_time, as the consumer can not go faster. The prefetch
+    depth holds the batches the consumer takes while the slowest warm-up batch is produced, and is set with
+    ``mindspore.dataset.config.set_prefetch_size``. The choice is printed so it can be pinned in the config.
+
+    Args:
+        make_dataset (Function): Builds the loader from a number of workers.
+        max_workers (Int): The most workers to try. Default: None, the cores of this process.
+        step_time (Float): The seconds the consumer takes for a batch. Default: None, as fast as possible.
+        num_batches (Int): The timed batches of every number of workers. Default: 8.
+        min_gain (Float): The least speedup that is worth more workers. Default: 1.1.
+        stage_speed (Function): Returns the samples per second of one worker in every stage of the loader, see
+            ``stage_speed`` of dataset_speed.py. Default: None, the stages are not timed.
+        batch_size (Int): The samples of a batch, for the workers of the slowest stage. Default: None.
+
+    Returns:
+        num_workers (Int), the workers of the loader.
+        prefetch_size (Int), the prefetch depth set.
+
+    Examples:
+        >>> num_workers, _ = autotune_loader(lambda n: create_dataset(data_dir, num_worker=n), step_time=0.2)
+        >>> ds_train = create_dataset(data_dir, num_worker=num_workers)
+    """
+    max_workers = max_workers or cpu_count()
+    if stage_speed is not None:
+        stages = stage_speed()
+        for stage, samples_per_second in stages.items():
+            print(f"Data loader stage {stage}: {samples_per_second:.1f} samples per second per worker.")
+        bottleneck = min(stages, key=stages.get)
+        if step_time and batch_size:
+            print(f"The slowest stage is {bottleneck}, it needs "
+                  f"{math.ceil(batch_size / step_time / stages[bottleneck])} workers to keep up.")
+        else:
+            print(f"The slowest stage is {bottleneck}.")
+    best = None
+    num_workers = 1
+    while True:
+        times = time_batches(make_dataset(num_workers), num_batches)
+        batch_time = sum(times) / len(times)
+        print(f"Data loader with {num_workers} workers: {batch_time * 1000:.1f} ms per batch.")
+        if best is not None and batch_time * min_gain > best[1]:
+            break
+        best = (num_workers, batch_time, max(times))
+        if (step_time and batch_time <= step_time) or num_workers >= max_workers:
+            break
+        num_workers = min(num_workers * 2, max_workers)
+
+    num_workers, batch_time, slowest = best
+    prefetch_size = max(de.config.get_prefetch_size(), math.ceil(slowest / (step_time or batch_time)) + 1)
+    de.config.set_prefetch_size(prefetch_size)
+    print(f"Autotuned the data loader to {num_workers} workers and a prefetch size of {prefetch_size}, "
+          f"pin them with num_workers and prefetch_size in the config.")
+    return num_workers, prefetch_size
+
+def time_stage(stage, inputs):
+    """
+    Run a stage of the loader on every input in this process.
+
+    Returns:
+        samples_per_second (Float), the throughput of the stage in one worker.
+        outputs (List), the outputs of the stage.
+    """
+    start = time.time()
+    outputs = [stage(*args) for args in inputs]
+    return len(inputs) / (time.time() - start), outputs
+
+def _child_cpu_times():
+    """The user and system CPU seconds of every child process, from /proc where it exists."""
+    ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+    times = {}
+    if not os.path.isdir('/proc'):
+        return times
+    parent = str(os.getpid())
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat', encoding='utf-8') as file:
+                fields = file.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        # the fields after the command start at the state, the parent pid is the 2nd and utime, stime the 12th, 13th
+        if fields[1] == parent:
+            times[int(pid)] = (int(fields[11]) + int(fields[12])) / ticks
+    return times
+
+def benchmark_loader(dataset, batch_size, num_batches=50):
+    """
+    Iterate a loader without a model and report its throughput, the CPU share of its worker processes and
+    how often a batch was already waiting when it was asked for.
+
+    Args:
+        dataset (Dataset): The loader.
+        batch_size (Int): The samples of a batch.
+        num_batches (Int): The timed batches, after the first one. Default: 50.
+
+    Returns:
+        Dict, samples_per_second, batch_ms, ready_ratio, the share of batches that took less than a
+        millisecond, worker_cpu_share, the CPU share of every worker process over the timed batches, and
+        main_cpu_share, that of this process with the C++ threads of the loader.
+
+    Examples:
+        >>> report = benchmark_loader(create_dataset(data_dir, batch_size=32), batch_size=32)
+    """
+    iterator = _iterate(dataset)
+    cpu_start = _child_cpu_times()
+    process_start = time.process_time()
+    times = _time_iterator(iterator, num_batches)
+    elapsed = sum(times)
+    process_cpu = time.process_time() - process_start
+    cpu_end = _child_cpu_times()
+    worker_cpu_share = {pid: round((cpu - cpu_start.get(pid, 0.0)) / elapsed, 3) for pid, cpu in cpu_end.items()}
+    return {
+        'samples_per_second': len(times) * batch_size / elapsed,
+        'batch_ms': elapsed / len(times) * 1000,
+        'ready_ratio': sum(t < 1e-3 for t in times) / len(times),
+        'worker_cpu_share': worker_cpu_share,
+        'main_cpu_share': round(process_cpu / elapsed, 3),
+    }
@@ -0,0 +1,53 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Input normalization inside the graph."""
+import numpy as np
+
+import mindspore.common.dtype as mstype
+from mindspore import nn
+from mindspore import Tensor
+from mindspore.ops import operations as P
+
+__all__ = ['InputNormalize']
+
+
+class InputNormalize(nn.Cell):
+    """
+    Normalize uint8 HWC images and transpose them to CHW inside the graph, so the input pipeline can ship
+    images of a quarter of the float32 size and leave the float work to the device.
+
+    Args:
+        mean (List): The mean of every channel.
+        std (List): The standard deviation of every channel. Default: (1.0, 1.0, 1.0).
+
+    Inputs:
+        x (Tensor): uint8 images, [batch_size, height, width, channels].
+
+    Returns:
+        Tensor, float32 images (x - mean) / std, [batch_size, channels, height, width].
+
+    Examples:
+        >>> normalize = InputNormalize((104, 117, 123))
+        >>> out = normalize(Tensor(np.zeros((1, 640, 640, 3), np.uint8)))
+    """
+    def __init__(self, mean, std=(1.0, 1.0, 1.0)):
+        super().__init__()
+        self.mean = Tensor(np.array(mean, dtype=np.float32).reshape(1, 1, 1, -1))
+        self.scale = Tensor(1.0 / np.array(std, dtype=np.float32).reshape(1, 1, 1, -1))
+        self.cast = P.Cast()
+        self.transpose = P.Transpose()
+
+    def construct(self, x):
+        x = (self.cast(x, mstype.float32) - self.mean) * self.scale
+        return self.transpose(x, (0, 3, 1, 2))
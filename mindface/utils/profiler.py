@@ -0,0 +1,120 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Training step profiling."""
+import os
+import time
+import numpy as np
+
+from mindspore.train.callback import Callback
+
+from .speed import _sync
+
+__all__ = ['StepProfiler', 'host_rss_mb']
+
+
+def host_rss_mb():
+    """The resident memory of this process in MB, its peak where /proc does not exist."""
+    try:
+        with open('/proc/self/statm', encoding='utf-8') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+class StepProfiler(Callback):
+    """
+    Split every training step into the time it waited for the dataset iterator and the time of the training
+    network, and print a summary every interval steps.
+
+    The wait is the time from the end of a step to the begin of the next one, the compute the time from the
+    begin of a step to its outputs. A summary holds the p50 and p95 step latency, the mean wait and compute,
+    the images per second, the host RSS and the data-starved share, the part of the time spent waiting for
+    data. A high share asks for more loader workers, a low one for more devices. Add it after the other
+    callbacks, and train without dataset sink, as a sunk step never waits on the host.
+
+    Args:
+        interval (Int): The steps of a summary. Default: 100.
+        batch_size (Int): The images of a step. Default: None, the first dimension of the first input.
+
+    Examples:
+        >>> model.train(epoch, ds_train, callbacks=[LossMonitor(), StepProfiler(100)], dataset_sink_mode=False)
+    """
+    def __init__(self, interval=100, batch_size=None):
+        super().__init__()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_end = None
+        self.step_begin_time = None
+        self.waits = []
+        self.computes = []
+        self.images = 0
+        self.summaries = []
+
+    def on_train_epoch_begin(self, run_context):
+        """The first step of an epoch waits from here, not from the end of the last epoch."""
+        self.last_end = time.time()
+
+    def on_train_step_begin(self, run_context):
+        """Record the data wait of the step."""
+        self.step_begin_time = time.time()
+        self.waits.append(self.step_begin_time - (self.last_end or self.step_begin_time))
+
+    def on_train_step_end(self, run_context):
+        """Record the compute of the step and print a summary every interval steps."""
+        cb_params = run_context.original_args()
+        _sync(cb_params.net_outputs)
+        self.last_end = time.time()
+        self.computes.append(self.last_end - self.step_begin_time)
+        if self.batch_size:
+            self.images += self.batch_size
+        else:
+            self.images += cb_params.train_dataset_element[0].shape[0]
+        if len(self.computes) >= self.interval:
+            self.summary(cb_params.cur_epoch_num, cb_params.cur_step_num)
+
+    def summary(self, epoch=None, step=None):
+        """
+        Print and return the summary of the steps since the last one.
+
+        Returns:
+            Dict, step_p50_ms, step_p95_ms, wait_ms, compute_ms, images_per_second, rss_mb and starved,
+            the share of the time spent waiting for data.
+        """
+        if not self.computes:
+            return None
+        waits = np.array(self.waits[:len(self.computes)])
+        computes = np.array(self.computes)
+        steps = waits + computes
+        report = {
+            'step_p50_ms': float(np.percentile(steps, 50) * 1000),
+            'step_p95_ms': float(np.percentile(steps, 95) * 1000),
+            'wait_ms': float(waits.mean() * 1000),
+            'compute_ms': float(computes.mean() * 1000),
+            'images_per_second': self.images / steps.sum(),
+            'rss_mb': host_rss_mb(),
+            'starved': float(waits.sum() / steps.sum()),
+        }
+        print(f"epoch: {epoch} step: {step}, step p50 {report['step_p50_ms']:.1f} ms, "
+              f"p95 {report['step_p95_ms']:.1f} ms, data wait {report['wait_ms']:.1f} ms, "
+              f"compute {report['compute_ms']:.1f} ms, {report['images_per_second']:.1f} images/s, "
+              f"host RSS {report['rss_mb']:.0f} MB, data-starved {report['starved']:.1%}", flush=True)
+        self.summaries.append(report)
+        self.waits, self.computes, self.images = [], [], 0
+        return report
+
+    def on_train_end(self, run_context):
+        """Summarize the steps after the last summary."""
+        cb_params = run_context.original_args()
+        self.summary(cb_params.cur_epoch_num, cb_params.cur_step_num)
@@ -0,0 +1,200 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Structured channel pruning."""
+import numpy as np
+
+from mindspore import nn
+from mindspore import Tensor
+
+from .fuse import _set_child
+
+__all__ = ['prune_channels', 'slim_channels', 'count_params']
+
+
+def _get_cell(net, path):
+    """Return the sub cell of ``net`` at the dotted ``path``."""
+    cell = net
+    for key in path.split('.'):
+        cell = cell.name_cells()[key]
+    return cell
+
+
+def _replace_cell(net, path, new_cell):
+    """Replace the sub cell of ``net`` at the dotted ``path``."""
+    parent_path, _, key = path.rpartition('.')
+    parent = _get_cell(net, parent_path) if parent_path else net
+    _set_child(parent, key, new_cell)
+
+
+def _keep_names(new_cell, cell):
+    """Give the parameters of ``new_cell`` the names of those of ``cell``."""
+    for new_param, param in zip(new_cell.get_parameters(), cell.get_parameters()):
+        new_param.name = param.name
+    return new_cell
+
+
+def _build_conv(conv, weight, bias, group):
+    """Build a Conv2d like ``conv`` holding the given weight and bias."""
+    new_conv = nn.Conv2d(weight.shape[1] * group, weight.shape[0], conv.kernel_size, stride=conv.stride,
+                         pad_mode=conv.pad_mode, padding=conv.padding, dilation=conv.dilation, group=group,
+                         has_bias=conv.has_bias, weight_init=Tensor(weight),
+                         bias_init=Tensor(bias) if conv.has_bias else None)
+    return _keep_names(new_conv, conv)
+
+
+def _slice_output(cell, index):
+    """Keep the output channels ``index`` of a Conv2d, BatchNorm or PReLU.
+
+    Depthwise convolutions keep the same channels on their input as well.
+    """
+    if isinstance(cell, nn.Conv2d):
+        weight = cell.weight.asnumpy()[index]
+        bias = cell.bias.asnumpy()[index] if cell.has_bias else None
+        if cell.group == 1:
+            return _build_conv(cell, weight, bias, 1)
+        if cell.group == cell.in_channels == cell.out_channels:
+            return _build_conv(cell, weight, bias, len(index))
+        raise ValueError(f"Can not prune a grouped convolution with {cell.group} groups.")
+    if isinstance(cell, (nn.BatchNorm2d, nn.BatchNorm1d)):
+        new_cell = type(cell)(len(index), eps=cell.eps, momentum=1.0 - cell.momentum,
+                              gamma_init=Tensor(cell.gamma.asnumpy()[index]),
+                              beta_init=Tensor(cell.beta.asnumpy()[index]),
+                              moving_mean_init=Tensor(cell.moving_mean.asnumpy()[index]),
+                              moving_var_init=Tensor(cell.moving_variance.asnumpy()[index]))
+        return _keep_names(new_cell, cell)
+    if isinstance(cell, nn.PReLU):
+        weight = cell.w.asnumpy()
+        if weight.size > 1:
+            weight = weight[index]
+        return _keep_names(nn.PReLU(channel=weight.size, w=Tensor(weight)), cell)
+    raise TypeError(f"Can not prune the output channels of {type(cell).__name__}.")
+
+
+def _slice_input(cell, index, channels):
+    """Keep the input channels ``index`` (out of ``channels``) of a Conv2d or of a Dense after a flatten."""
+    if isinstance(cell, nn.Conv2d):
+        if cell.group != 1:
+            raise ValueError(f"Can not prune the input of a grouped convolution with {cell.group} groups.")
+        weight = cell.weight.asnumpy()[:, index]
+        bias = cell.bias.asnumpy() if cell.has_bias else None
+        return _build_conv(cell, weight, bias, 1)
+    if isinstance(cell, nn.Dense):
+        repeat = cell.in_channels // channels
+        columns = (np.asarray(index)[:, np.newaxis] * repeat + np.arange(repeat)).ravel()
+        weight = cell.weight.asnumpy()[:, columns]
+        new_cell = nn.Dense(weight.shape[1], cell.out_channels, weight_init=Tensor(weight),
+                            bias_init=Tensor(cell.bias.asnumpy()) if cell.has_bias else None,
+                            has_bias=cell.has_bias, activation=cell.activation)
+        return _keep_names(new_cell, cell)
+    raise TypeError(f"Can not prune the input channels of {type(cell).__name__}.")
+
+
+def _group_channels(net, group):
+    """Return the current number of channels of a group."""
+    return _get_cell(net, group[0][0]).weight.shape[0]
+
+
+def _group_scores(net, group, criterion):
+    """Score the channels of a group by the BatchNorm gammas or by the L1 norm of the producing filters."""
+    scores = 0.
+    for path in group[0]:
+        cell = _get_cell(net, path)
+        if criterion == 'bn' and isinstance(cell, (nn.BatchNorm2d, nn.BatchNorm1d)):
+            scores = scores + np.abs(cell.gamma.asnumpy())
+        elif criterion == 'l1' and isinstance(cell, nn.Conv2d) and cell.group == 1:
+            weight = cell.weight.asnumpy()
+            scores = scores + np.abs(weight.reshape(weight.shape[0], -1)).sum(axis=1)
+    if np.isscalar(scores):
+        raise ValueError(f"No layer of the group starting at '{group[0][0]}' supports criterion '{criterion}'.")
+    return scores
+
+
+def _apply(net, group, index):
+    """Physically remove every channel of a group that is not in ``index``."""
+    channels = _group_channels(net, group)
+    outputs, inputs = group
+    for path in outputs:
+        _replace_cell(net, path, _slice_output(_get_cell(net, path), index))
+    for path in inputs:
+        _replace_cell(net, path, _slice_input(_get_cell(net, path), index, channels))
+
+
+def prune_channels(net, ratio, criterion='bn'):
+    """
+    Remove the least important channels of every prunable layer of a trained network.
+
+    The network describes its prunable channels with a ``prune_groups`` method. Each group is a pair of
+    lists of dotted cell names: the Conv2d, BatchNorm and PReLU layers whose outputs share the channels
+    (depthwise convolutions pass them through), and the Conv2d or Dense layers that read them. Channels
+    tied by a residual addition are never part of a group.
+
+    Args:
+        net (Cell): The trained network.
+        ratio (Float): The fraction of channels removed from every group.
+        criterion (String): Rank the channels by the BatchNorm gamma ('bn') or by the L1 norm of the
+            producing filters ('l1'). Default: 'bn'.
+
+    Returns:
+        net (Cell), the pruned network.
+        widths (List), the number of channels kept in every group, see ``slim_channels``.
+
+    Examples:
+        >>> network, widths = prune_channels(network, 0.3)
+    """
+    if criterion not in ('bn', 'l1'):
+        raise ValueError(f"criterion must be 'bn' or 'l1', but got {criterion}.")
+    groups = net.prune_groups()
+    scores = [_group_scores(net, group, criterion) for group in groups]
+    widths = []
+    for group, score in zip(groups, scores):
+        keep = max(int(round(score.size * (1 - ratio))), 1)
+        index = np.sort(np.argsort(-score, kind='stable')[:keep])
+        _apply(net, group, index)
+        widths.append(keep)
+    return net, widths
+
+
+def slim_channels(net, widths):
+    """
+    Shrink a freshly built network to the channel widths returned by ``prune_channels``.
+
+    Load the pruned checkpoint after calling it.
+
+    Args:
+        net (Cell): The network with its default widths.
+        widths (List): The number of channels of every group of ``net.prune_groups()``.
+
+    Returns:
+        net (Cell), the slim network.
+
+    Examples:
+        >>> network = slim_channels(network, cfg['prune_widths'])
+        >>> load_param_into_net(network, load_checkpoint('RetinaFace_pruned.ckpt'))
+    """
+    groups = net.prune_groups()
+    if len(groups) != len(widths):
+        raise ValueError(f"The network has {len(groups)} prunable groups, but got {len(widths)} widths.")
+    for group, width in zip(groups, widths):
+        _apply(net, group, np.arange(width))
+    return net
+
+
+def count_params(net):
+    """
+    Count the trainable parameters of a network.
+
+    Examples:
+        >>> num_params = count_params(network)
+    """
+    return int(sum(param.size for param in net.trainable_params()))
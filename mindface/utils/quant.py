@@ -0,0 +1,229 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Post-training int8 quantization."""
+import numpy as np
+
+import mindspore.common.dtype as mstype
+from mindspore import nn
+from mindspore import Tensor, Parameter
+from mindspore.ops import operations as P
+
+from .fuse import _set_child
+
+__all__ = ['QuantConv2d', 'QuantDense', 'calibrate', 'quantize']
+
+
+def _quant_layers(net):
+    """Return (parent, key, layer) for every Conv2d and Dense of the network."""
+    layers = []
+    for _, parent in net.cells_and_names():
+        for key, cell in parent.name_cells().items():
+            if isinstance(cell, (nn.Conv2d, nn.Dense)):
+                layers.append((parent, key, cell))
+    return layers
+
+
+class _RangeObserver(nn.Cell):
+    """Record the input range of a layer. Only works in PYNATIVE_MODE."""
+    def __init__(self, layer, ranges):
+        super().__init__()
+        self.key = layer.weight.name
+        self.ranges = ranges
+        self.layer = layer
+
+    def construct(self, x):
+        data = x.asnumpy()
+        low, high = float(data.min()), float(data.max())
+        if self.key in self.ranges:
+            low = min(low, self.ranges[self.key][0])
+            high = max(high, self.ranges[self.key][1])
+        self.ranges[self.key] = (low, high)
+        return self.layer(x)
+
+
+def _run_observed(net, observer, batches):
+    """Run the network with every Conv2d and Dense wrapped by ``observer(layer)``, then unwrap them."""
+    net.set_train(False)
+    names = [(param, param.name) for param in net.get_parameters()]
+    layers = _quant_layers(net)
+    for parent, key, layer in layers:
+        _set_child(parent, key, observer(layer))
+    for inputs in batches:
+        net(inputs)
+    for parent, key, layer in layers:
+        _set_child(parent, key, layer)
+    for param, name in names:
+        param.name = name
+
+
+def calibrate(net, batches):
+    """
+    Collect the input range of every Conv2d and Dense layer on calibration data.
+
+    The network must run in PYNATIVE_MODE while calibrating. It is restored afterwards.
+
+    Args:
+        net (Cell): The fp32 network with trained weights.
+        batches (Iterable): Calibration inputs, each a Tensor accepted by ``net``.
+
+    Returns:
+        ranges (Dict), maps the weight name of each layer to the (min, max) of its input.
+
+    Examples:
+        >>> ranges = calibrate(network, [Tensor(img) for img in calib_images])
+    """
+    ranges = {}
+    _run_observed(net, lambda layer: _RangeObserver(layer, ranges), batches)
+    return ranges
+
+
+def _quant_weight(layer, num_bits):
+    """Quantize a weight per output channel with a symmetric scale."""
+    weight = layer.weight.asnumpy().astype(np.float32)
+    q_max = 2 ** (num_bits - 1) - 1
+    abs_max = np.abs(weight.reshape(weight.shape[0], -1)).max(axis=1)
+    scale = np.maximum(abs_max, 1e-8) / q_max
+    scale = scale.reshape((-1,) + (1,) * (weight.ndim - 1)).astype(np.float32)
+    q_weight = np.clip(np.round(weight / scale), -q_max, q_max).astype(np.int8)
+    return q_weight, scale
+
+
+def _quant_act(act_range, num_bits):
+    """Return the asymmetric (scale, zero_point) of an activation range."""
+    q_max = 2 ** num_bits - 1
+    low, high = min(act_range[0], 0.), max(act_range[1], 0.)
+    scale = max(high - low, 1e-8) / q_max
+    zero_point = float(np.round(-low / scale))
+    return scale, zero_point
+
+
+class _QuantLayer(nn.Cell):
+    """Shared parameters and activation quantization of QuantConv2d and QuantDense."""
+    def __init__(self, layer, act_range, num_bits):
+        super().__init__()
+        prefix = layer.weight.name[:-len('weight')]
+        q_weight, weight_scale = _quant_weight(layer, num_bits)
+        act_scale, act_zero_point = _quant_act(act_range, num_bits)
+
+        self.weight = Parameter(Tensor(q_weight, mstype.int8), name=prefix + 'weight', requires_grad=False)
+        self.weight_scale = Parameter(Tensor(weight_scale), name=prefix + 'weight_scale', requires_grad=False)
+        self.act_scale = Parameter(Tensor(act_scale, mstype.float32), name=prefix + 'act_scale',
+                                   requires_grad=False)
+        self.act_zero_point = Parameter(Tensor(act_zero_point, mstype.float32), name=prefix + 'act_zero_point',
+                                        requires_grad=False)
+        self.has_bias = layer.has_bias
+        if self.has_bias:
+            self.bias = Parameter(Tensor(layer.bias.asnumpy()), name=prefix + 'bias', requires_grad=False)
+        self.act_max = float(2 ** num_bits - 1)
+
+        self.cast = P.Cast()
+        self.round = P.Round()
+        self.maximum = P.Maximum()
+        self.minimum = P.Minimum()
+        self.bias_add = P.BiasAdd()
+
+    def quant_input(self, x):
+        """Round the input onto the uint8 grid of the calibrated range."""
+        x = self.round(x / self.act_scale) + self.act_zero_point
+        x = self.minimum(self.maximum(x, 0.), self.act_max)
+        return (x - self.act_zero_point) * self.act_scale
+
+    def dequant_weight(self):
+        """Expand the int8 weight with its per-channel scale."""
+        return self.cast(self.weight, mstype.float32) * self.weight_scale
+
+
+class QuantConv2d(_QuantLayer):
+    """
+    Conv2d with per-channel int8 weights and uint8 input activations.
+
+    Args:
+        layer (Conv2d): The trained fp32 convolution.
+        act_range (Tuple): The calibrated (min, max) of the layer input.
+        num_bits (Int): The quantization bit width. Default: 8.
+
+    Examples:
+        >>> q_conv = QuantConv2d(conv, ranges[conv.weight.name])
+    """
+    def __init__(self, layer, act_range, num_bits=8):
+        super().__init__(layer, act_range, num_bits)
+        self.conv2d = P.Conv2D(out_channel=layer.out_channels, kernel_size=layer.kernel_size, mode=1,
+                               pad_mode=layer.pad_mode, pad=layer.padding, stride=layer.stride,
+                               dilation=layer.dilation, group=layer.group)
+
+    def construct(self, x):
+        """construct"""
+        output = self.conv2d(self.quant_input(x), self.dequant_weight())
+        if self.has_bias:
+            output = self.bias_add(output, self.bias)
+        return output
+
+
+class QuantDense(_QuantLayer):
+    """
+    Dense with per-channel int8 weights and uint8 input activations.
+
+    Args:
+        layer (Dense): The trained fp32 dense layer.
+        act_range (Tuple): The calibrated (min, max) of the layer input.
+        num_bits (Int): The quantization bit width. Default: 8.
+
+    Examples:
+        >>> q_fc = QuantDense(fc, ranges[fc.weight.name])
+    """
+    def __init__(self, layer, act_range, num_bits=8):
+        super().__init__(layer, act_range, num_bits)
+        self.matmul = P.MatMul(transpose_b=True)
+        self.activation = layer.activation
+        self.activation_flag = self.activation is not None
+
+    def construct(self, x):
+        """construct"""
+        output = self.matmul(self.quant_input(x), self.dequant_weight())
+        if self.has_bias:
+            output = self.bias_add(output, self.bias)
+        if self.activation_flag:
+            output = self.activation(output)
+        return output
+
+
+def quantize(net, ranges, num_bits=8):
+    """
+    Replace every calibrated Conv2d and Dense of the network with its int8 counterpart.
+
+    Layers that never ran during calibration (for example the unused classifier of a detection backbone)
+    are kept in fp32.
+
+    Args:
+        net (Cell): The fp32 network with trained weights.
+        ranges (Dict): The activation ranges returned by ``calibrate``.
+        num_bits (Int): The quantization bit width. Default: 8.
+
+    Returns:
+        net (Cell), the quantized network.
+
+    Examples:
+        >>> ranges = calibrate(network, calib_batches)
+        >>> network = quantize(network, ranges)
+    """
+    net.set_train(False)
+    for parent, key, layer in _quant_layers(net):
+        act_range = ranges.get(layer.weight.name)
+        if act_range is None:
+            continue
+        if isinstance(layer, nn.Conv2d):
+            _set_child(parent, key, QuantConv2d(layer, act_range, num_bits))
+        else:
+            _set_child(parent, key, QuantDense(layer, act_range, num_bits))
+    return net
@@ -0,0 +1,102 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Partition of the CPU cores between the data loader and MindSpore."""
+import os
+import cv2
+
+from mindspore import context
+
+from .loader import cpu_count
+
+__all__ = ['CorePlan']
+
+
+class CorePlan():
+    """
+    Split a budget of CPU cores between the data loader workers, the cv2 threads of every worker and the
+    intra- and inter-op threads of MindSpore, so they do not oversubscribe the cores.
+
+    The local_ranks training processes of a host split its cores, and every rank plans the slice of its
+    local_rank. The framework takes framework_cores of the budget and the loader the rest. Without num_workers, the
+    loader runs one worker per cv2_threads of its cores. ``apply`` sets the threads of the main process and
+    ``init_worker`` those of a loader worker, once per process. With pin, the main process is pinned to the
+    framework cores and the workers to the loader cores.
+
+    Args:
+        num_cores (Int): The core budget. Default: None, the cores of this process.
+        num_workers (Int): The loader workers. Default: None, from the loader cores.
+        cv2_threads (Int): The cv2 threads of every worker. Default: 1.
+        framework_cores (Int): The cores of MindSpore. Default: None, a quarter of the budget.
+        pin (Bool): Pin the processes to their cores. Default: False.
+        local_ranks (Int): The training processes sharing the cores of this host. Default: 1.
+        local_rank (Int): The slice of the cores of this process. Default: 0.
+
+    Examples:
+        >>> plan = CorePlan.from_config(cfg)
+        >>> plan.apply()
+        >>> ds_train = create_dataset(data_dir, num_worker=plan.num_workers, core_plan=plan)
+    """
+    def __init__(self, num_cores=None, num_workers=None, cv2_threads=1, framework_cores=None, pin=False,
+                 local_ranks=1, local_rank=0):
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(cpu_count()))
+        share = max(1, len(cores) // local_ranks)
+        start = local_rank * share % len(cores)
+        cores = cores[start:start + share]
+        num_cores = min(num_cores or len(cores), len(cores))
+        if num_cores < 2:
+            framework_cores = 1
+        else:
+            framework_cores = min(framework_cores or max(1, num_cores // 4), num_cores - 1)
+        self.framework_cores = cores[:framework_cores]
+        self.loader_cores = cores[framework_cores:num_cores] or self.framework_cores
+        self.cv2_threads = cv2_threads
+        self.num_workers = num_workers or max(1, len(self.loader_cores) // cv2_threads)
+        self.intra_op_threads = framework_cores
+        self.inter_op_threads = max(1, framework_cores // 4)
+        self.pin = pin and hasattr(os, 'sched_setaffinity')
+        self.worker_pid = None
+
+    @classmethod
+    def from_config(cls, cfg, local_ranks=1, local_rank=0):
+        """The plan of the num_cores, num_workers, cv2_threads, framework_cores and pin_cores keys of a config."""
+        return cls(cfg.get('num_cores'), cfg.get('num_workers'), cfg.get('cv2_threads') or 1,
+                   cfg.get('framework_cores'), cfg.get('pin_cores', False), local_ranks, local_rank)
+
+    def __str__(self):
+        return (f"{len(set(self.framework_cores + self.loader_cores))} cores: {self.num_workers} loader workers "
+                f"with {self.cv2_threads} cv2 threads on {len(self.loader_cores)} cores, "
+                f"{self.intra_op_threads} intra-op and {self.inter_op_threads} inter-op threads of MindSpore"
+                + (", pinned" if self.pin else ""))
+
+    def apply(self):
+        """Set the threads of MindSpore and cv2 in the main process."""
+        context.set_context(runtime_num_threads=self.intra_op_threads)
+        try:
+            context.set_context(inter_op_parallel_num=self.inter_op_threads)
+        except ValueError:
+            # older MindSpore runs the inter-op parallelism in its runtime threads
+            pass
+        cv2.setNumThreads(self.intra_op_threads)
+        if self.pin:
+            os.sched_setaffinity(0, self.framework_cores)
+        print(f"Core plan of {self}.")
+
+    def init_worker(self):
+        """Set the threads of a loader worker, the first time it is called in a process."""
+        if self.worker_pid == os.getpid():
+            return
+        self.worker_pid = os.getpid()
+        cv2.setNumThreads(self.cv2_threads)
+        if self.pin:
+            os.sched_setaffinity(0, self.loader_cores)
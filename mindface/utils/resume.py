@@ -0,0 +1,139 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Resuming an interrupted training where it stopped."""
+import math
+import numpy as np
+
+import mindspore.dataset as de
+from mindspore.train.serialization import load_param_into_net
+
+from .checkpoint import load_delta_checkpoint
+
+__all__ = ['ResumableSampler', 'TrainState', 'resume_phases']
+
+
+class ResumableSampler(de.Sampler):
+    """
+    Shuffle the samples with an order that is a function of the seed and the epoch only, so a resumed training
+    draws the samples of its epochs in the order the interrupted one did, and skip the samples an interrupted
+    epoch already trained on.
+
+    Every shard takes every num_shards-th sample of the order, padded to the same length by its first samples
+    like the sharding of MindSpore. A dataset yields as many samples every epoch, so skip_samples skips the
+    first samples of every epoch, see ``resume_phases`` for a dataset of the interrupted epoch only.
+
+    Args:
+        dataset_size (Int): The samples of the dataset.
+        shuffle (Bool): Shuffle the samples of every epoch. Default: True.
+        seed (Int): The seed of the orders. Default: 0.
+        num_shards (Int): The shards of distributed training. Default: 1.
+        shard_id (Int): The shard of this device. Default: 0.
+        start_epoch (Int): The epoch of the first order drawn. Default: 0.
+        skip_samples (Int): The samples of this shard to skip in every epoch. Default: 0.
+
+    Examples:
+        >>> sampler = ResumableSampler(len(source), seed=2022, start_epoch=3, skip_samples=3200)
+        >>> dataset = de.GeneratorDataset(source, ["image", "annotation"], sampler=sampler)
+    """
+    def __init__(self, dataset_size, shuffle=True, seed=0, num_shards=1, shard_id=0, start_epoch=0, skip_samples=0):
+        self.size = dataset_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_shards = num_shards
+        self.shard_id = shard_id
+        self.epoch = start_epoch
+        self.skip_samples = skip_samples
+        super().__init__()
+
+    def __len__(self):
+        return math.ceil(self.size / self.num_shards) - self.skip_samples
+
+    def order(self, epoch):
+        """The order of all the samples in an epoch, before sharding."""
+        if self.shuffle:
+            return np.random.default_rng([self.seed, epoch]).permutation(self.size)
+        return np.arange(self.size)
+
+    def __iter__(self):
+        shard_size = math.ceil(self.size / self.num_shards)
+        order = np.resize(self.order(self.epoch), shard_size * self.num_shards)[self.shard_id::self.num_shards]
+        self.epoch += 1
+        return iter(order[self.skip_samples:].tolist())
+
+
+class TrainState():
+    """
+    The position of a training in a checkpoint of its training network, which ``ModelCheckpoint`` and
+    ``AsyncCheckpoint`` save with the weights, the optimizer moments and the loss scale. The position is the
+    train_step of a wrapper that counts every step run, as the optimizer does not count the steps a loss
+    scale skips, or else the global step of the optimizer. The learning rate arrays are indexed by the global
+    step, so they continue where they stopped.
+
+    Args:
+        ckpt_path (Str): The checkpoint, a delta one of ``AsyncCheckpoint`` too.
+        steps_per_epoch (Int): The steps of an epoch.
+
+    Examples:
+        >>> state = TrainState(cfg['resume_state'], ds_train.get_dataset_size())
+        >>> state.load(train_net)
+        >>> for start_epoch, end_epoch, skip_steps in resume_phases([(0, max_epoch)], state.epoch, state.step):
+        ...     ds_train = create_dataset(..., start_epoch=start_epoch, skip_steps=skip_steps)
+        ...     Model(train_net).train(end_epoch, ds_train, initial_epoch=start_epoch)
+    """
+    def __init__(self, ckpt_path, steps_per_epoch):
+        self.param_dict = load_delta_checkpoint(ckpt_path)
+        if 'global_step' not in self.param_dict:
+            raise ValueError(f"{ckpt_path} holds no global_step, it is not a checkpoint of a training network.")
+        self.global_step = int(self.param_dict['global_step'].asnumpy().reshape(-1)[0])
+        self.train_step = self.global_step
+        if 'train_step' in self.param_dict:
+            self.train_step = int(self.param_dict['train_step'].asnumpy().reshape(-1)[0])
+        self.epoch, self.step = divmod(self.train_step, steps_per_epoch)
+
+    def load(self, train_net):
+        """Load the weights, optimizer moments, global step, loss scale and step count into the training network."""
+        not_loaded = load_param_into_net(train_net, self.param_dict)
+        print(f"Resume the training at epoch {self.epoch + 1} step {self.step + 1}, global step {self.global_step}, "
+              f"after {self.train_step} steps."
+              + (f" Not in the checkpoint: {not_loaded}." if not_loaded else ""))
+
+
+def resume_phases(phases, epoch=0, step=0):
+    """
+    The phases of a training left after an epoch and step, its interrupted epoch a phase of its own that
+    skips the steps already trained.
+
+    Args:
+        phases (List): The (start_epoch, end_epoch, ...) of the phases, the items after them are kept.
+        epoch (Int): The finished epochs. Default: 0.
+        step (Int): The finished steps of the next epoch. Default: 0.
+
+    Returns:
+        List, the (start_epoch, end_epoch, ..., skip_steps) of the phases left.
+
+    Examples:
+        >>> resume_phases([(0, 10, 640), (10, 20, 840)], epoch=12, step=50)
+        [(12, 13, 840, 50), (13, 20, 840, 0)]
+    """
+    left = []
+    for start, end, *rest in phases:
+        if end <= epoch:
+            continue
+        start = max(start, epoch)
+        if start == epoch and step:
+            left.append((start, start + 1, *rest, step))
+            start += 1
+        if start < end:
+            left.append((start, end, *rest, 0))
+    return left
@@ -0,0 +1,96 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Inference speed measurement."""
+import time
+import numpy as np
+
+from mindspore import nn
+from mindspore import Tensor
+
+from .quant import _run_observed
+
+__all__ = ['measure_throughput', 'count_flops']
+
+
+def _sync(outputs):
+    """Wait for the outputs of an asynchronous forward pass."""
+    if isinstance(outputs, (tuple, list)):
+        for out in outputs:
+            _sync(out)
+    elif isinstance(outputs, Tensor):
+        outputs.asnumpy()
+
+
+def measure_throughput(net, input_shape, num_iters=20, warmup=3):
+    """
+    Measure the forward latency and throughput of a network on random inputs.
+
+    Args:
+        net (Cell): The network in inference mode.
+        input_shape (Tuple): The NCHW input shape.
+        num_iters (Int): The number of timed forward passes. Default: 20.
+        warmup (Int): The number of untimed passes used to compile the graph. Default: 3.
+
+    Returns:
+        latency (Float), milliseconds per forward pass.
+        throughput (Float), images per second.
+
+    Examples:
+        >>> latency, throughput = measure_throughput(network, (1, 3, 640, 640))
+    """
+    inputs = Tensor(np.random.rand(*input_shape).astype(np.float32))
+    for _ in range(warmup):
+        _sync(net(inputs))
+    start = time.time()
+    for _ in range(num_iters):
+        _sync(net(inputs))
+    cost = (time.time() - start) / num_iters
+    return cost * 1000., input_shape[0] / cost
+
+
+class _FlopsObserver(nn.Cell):
+    """Count the multiply-accumulates of a Conv2d or Dense. Only works in PYNATIVE_MODE."""
+    def __init__(self, layer, flops):
+        super().__init__()
+        self.key = layer.weight.name
+        self.flops = flops
+        self.layer = layer
+
+    def construct(self, x):
+        out = self.layer(x)
+        weight_shape = self.layer.weight.shape
+        self.flops[self.key] = out.size * int(np.prod(weight_shape[1:]))
+        return out
+
+
+def count_flops(net, input_shape):
+    """
+    Count the FLOPs of one forward pass, as the multiply-accumulates of every Conv2d and Dense layer.
+
+    The network must run in PYNATIVE_MODE while counting.
+
+    Args:
+        net (Cell): The network.
+        input_shape (Tuple): The NCHW input shape.
+
+    Returns:
+        flops (Int), the multiply-accumulates of the forward pass.
+
+    Examples:
+        >>> flops = count_flops(network, (1, 3, 640, 640))
+    """
+    flops = {}
+    inputs = Tensor(np.random.rand(*input_shape).astype(np.float32))
+    _run_observed(net, lambda layer: _FlopsObserver(layer, flops), [inputs])
+    return sum(flops.values())
@@ -0,0 +1,23 @@
+# import packages
+import cv2
+import numpy as np
+import pytest
+
+LABELS = """# a/1.jpg
+10 20 30 40 12.0 22.0 0.0 15.0 25.0 0.0 18.0 28.0 0.0 20.0 30.0 0.0 22.0 32.0 0.0 0.9
+5 5 0 10 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0
+# a/2.jpg
+5 5 0 10 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0
+# a/3.jpg
+1 2 3 4 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0 -1.0
+"""
+
+@pytest.fixture
+def label_path(tmp_path):
+    """write a small WiderFace folder into tmp_path and return its label file"""
+    (tmp_path / 'images' / 'a').mkdir(parents=True)
+    for name in ('1.jpg', '2.jpg', '3.jpg'):
+        cv2.imwrite(str(tmp_path / 'images' / 'a' / name), np.zeros((50, 60, 3), np.uint8))
+    path = tmp_path / 'label.txt'
+    path.write_text(LABELS, encoding='utf-8')
+    return str(path)
@@ -0,0 +1,84 @@
+# import packages
+import pickle
+import cv2
+import numpy as np
+
+from mindface.detection.datasets import WiderFace, compile_index, load_index
+
+def test_compile_index(tmp_path, label_path):
+    """test the annotation index drops empty faces and images and converts the targets"""
+    index = compile_index(label_path, str(tmp_path / 'label.npz'))
+    mapped = load_index(str(tmp_path / 'label.npz'))
+
+    assert list(index['paths']) == ['a/1.jpg', 'a/3.jpg'], 'image paths not match'
+    assert list(index['offsets']) == [0, 1, 2], 'offsets not match'
+    assert index['targets'].dtype == np.float32, 'targets dtype not match'
+    assert np.array_equal(index['targets'][0, :4], [10, 20, 40, 60]), 'bbox not match'
+    assert index['targets'][0, 14] == 1 and index['targets'][1, 14] == -1, 'landmark flag not match'
+    assert isinstance(mapped['targets'], np.memmap), 'targets not memory-mapped'
+    assert not list(tmp_path.glob('*.tmp')), 'temporary index left'
+    for key in ('targets', 'offsets', 'paths'):
+        assert np.array_equal(index[key], mapped[key]), f'{key} not match'
+
+def test_widerface(tmp_path, label_path):
+    """test WiderFace reads the cached index and survives pickling into workers"""
+    dataset = pickle.loads(pickle.dumps(WiderFace(label_path)))
+    path, target = dataset[1]
+
+    assert len(dataset) == 2, 'dataset length not match'
+    assert path == str(tmp_path / 'images' / 'a' / '3.jpg'), 'image path not match'
+    assert target.shape == (1, 15), 'target shape not match'
+
+from mindface.detection.datasets import WiderFaceShards, ShardSampler, pack_shards
+from mindface.detection.datasets.dataset import read_dataset
+
+def test_pack_shards(tmp_path, label_path):
+    """test the shards hold the encoded images and the targets of the image files in a packed order"""
+    for i, name in enumerate(('1.jpg', '3.jpg')):
+        cv2.imwrite(str(tmp_path / 'images' / 'a' / name), np.full((50, 60, 3), 50 * i, np.uint8))
+    num_shards = pack_shards(label_path, str(tmp_path / 'shards'), shard_size=1)
+    dataset = WiderFace(label_path)
+    shards = pickle.loads(pickle.dumps(WiderFaceShards(str(tmp_path / 'shards'))))
+
+    assert num_shards == 2 and len(shards) == len(dataset), 'number of shards or samples not match'
+    targets = {str(dataset.index['paths'][i]): dataset[i][1] for i in range(len(dataset))}
+    for i in range(len(shards)):
+        data, shard_target = shards[i]
+        assert data.dtype == np.uint8 and data.ndim == 1, 'encoded bytes not match'
+        path = str(shards.index['paths'][i])
+        image, _ = read_dataset(data, shard_target)
+        assert np.array_equal(image, cv2.imread(str(tmp_path / 'images' / path))), 'image not match'
+        assert np.array_equal(targets[path], shard_target), 'target not match'
+
+def test_shard_sampler():
+    """test the shards are drawn in a random order and every shard from start to end"""
+    shards = np.repeat(np.arange(5), 4)
+    sampler = ShardSampler(shards, seed=1)
+    epochs = [list(sampler) for _ in range(3)]
+    assert sorted(epochs[0]) == list(range(20)), 'samples not match'
+    assert len({tuple(epoch) for epoch in epochs}) > 1, 'shard order not shuffled'
+    for epoch in epochs:
+        runs = np.array(epoch).reshape(5, 4)
+        assert (np.diff(runs, axis=1) == 1).all(), 'shard not sequential'
+        assert (shards[runs] == shards[runs[:, :1]]).all(), 'shards interleaved'
+    assert list(ShardSampler(shards, seed=1, start_epoch=2, skip_samples=6)) == epochs[2][6:], 'resume not match'
+
+from mindface.detection.datasets import build_resized_cache
+
+def test_build_resized_cache(tmp_path, label_path):
+    """test the cached images are downscaled and their annotations rescaled to match"""
+    cv2.imwrite(str(tmp_path / 'images' / 'a' / '1.jpg'), np.zeros((100, 120, 3), np.uint8))
+    cache_label_path = build_resized_cache(label_path, str(tmp_path / 'cache'), max_short_side=50, num_workers=2)
+    dataset = WiderFace(label_path)
+    cache = WiderFace(cache_label_path)
+
+    assert len(cache) == len(dataset), 'dataset length not match'
+    assert cv2.imread(cache[0][0]).shape == (50, 60, 3), 'downscaled image shape not match'
+    assert cv2.imread(cache[1][0]).shape == (50, 60, 3), 'small image shape not match'
+    assert np.allclose(cache[0][1][:, :14], dataset[0][1][:, :14] / 2), 'rescaled target not match'
+    assert np.allclose(cache[1][1], dataset[1][1]), 'small image target not match'
+    assert build_resized_cache(label_path, str(tmp_path / 'cache'), max_short_side=50) == cache_label_path
+    assert not list((tmp_path / 'cache').rglob('*.tmp')), 'temporary files left'
+    # another short side is another cache, not the images of the old one
+    cache_label_path = build_resized_cache(label_path, str(tmp_path / 'cache'), max_short_side=25, num_workers=1)
+    assert cv2.imread(WiderFace(cache_label_path)[0][0]).shape == (25, 30, 3), 'stale cache reused'
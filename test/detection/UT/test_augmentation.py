@@ -0,0 +1,135 @@
+# import packages
+import numpy as np
+
+from mindface.detection.datasets.augmentation import _choose_candidate, _correct_bbox_by_candidates
+
+def test_choose_candidate():
+    """test every sampled crop is a square holding a whole box"""
+    np.random.seed(0)
+    boxes = np.array([[100, 100, 160, 170], [400, 300, 420, 330]], dtype=np.float32)
+    for _ in range(50):
+        candidates = _choose_candidate(250, 640, 480, boxes)
+        assert candidates[0] == (0, 0, 640, 480) and len(candidates) == 3, 'candidates not match'
+        for dx, dy, nw, nh in candidates[1:]:
+            inside = (boxes[:, 0] >= dx) & (boxes[:, 1] >= dy) & (boxes[:, 2] <= dx + nw) & (boxes[:, 3] <= dy + nh)
+            assert nw == nh and nw >= int(0.3 * 480) and inside.any(), 'crop not match'
+    assert len(_choose_candidate(250, 640, 480, np.array([[0, 0, 640, 480]], np.float32))) == 1
+
+def test_correct_bbox_by_candidates():
+    """test the crop is scaled, flipped and normalized without touching the inputs"""
+    target = np.array([[10, 20, 30, 60, 12, 22, 28, 22, 20, 40, 14, 50, 26, 50, 1],
+                       [90, 90, 99, 99, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1]], dtype=np.float32)
+    original = target.copy()
+    targets, candidate = _correct_bbox_by_candidates([(0, 0, 100, 100), (0, 10, 80, 80)], 160, 160, True,
+                                                     target[:, :4], target[:, -1], target[:, 4:14], False)
+
+    assert candidate == (0, 10, 80, 80) and targets.dtype == np.float32, 'candidate not match'
+    assert np.allclose(targets, [[0.625, 0.125, 0.875, 0.625, 0.65, 0.15, 0.85, 0.15,
+                                  0.75, 0.375, 0.675, 0.5, 0.825, 0.5, 1]]), 'targets not match'
+    assert np.array_equal(target, original), 'inputs changed'
+
+import random
+import cv2
+from mindface.detection.datasets.augmentation import color_distortion
+
+def test_color_distortion(monkeypatch):
+    """test the lookup tables give the brightness, saturation and hue steps applied one by one"""
+    image = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    expected = np.clip(image.astype(float) + 10.0, 0, 255).astype(np.uint8)
+    expected = cv2.cvtColor(expected, cv2.COLOR_BGR2HSV)
+    expected[:, :, 1] = np.clip(expected[:, :, 1] * 1.2, 0, 255)
+    expected[:, :, 0] = (expected[:, :, 0].astype(int) - 5) % 180
+    expected = cv2.cvtColor(expected, cv2.COLOR_HSV2BGR)
+
+    # the second branch with brightness, saturation and hue but no contrast
+    checks, values = iter([0.1, 0.9, 0.9, 0.9, 0.1]), iter([10.0, 1.2])
+    monkeypatch.setattr(np.random, 'rand', lambda: next(checks))
+    monkeypatch.setattr(random, 'uniform', lambda a, b: next(values))
+    monkeypatch.setattr(random, 'randint', lambda a, b: -5)
+    result = color_distortion(image)
+
+    assert result is image and result.dtype == np.uint8, 'not in place'
+    assert np.array_equal(result, expected), 'distortion not match'
+
+from mindface.detection.datasets.augmentation import Preproc
+
+def test_preproc():
+    """test the face stays under its box after the crop, resize and flip"""
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+    image[100:180, 250:330] = 255
+    target = np.array([[250, 100, 330, 180] + [290, 140] * 5 + [1]], dtype=np.float32)
+    aug = Preproc(160)
+    np.random.seed(0)
+    for _ in range(10):
+        output, targets = aug(image, target)
+        assert output.shape == (3, 160, 160) and output.dtype == np.float32, 'image not match'
+        x1, y1, x2, y2 = np.round(targets[0, :4] * 160).astype(int)
+        face = output[:, y1 + 2:y2 - 2, x1 + 2:x2 - 2] + aug.mean
+        assert face.size > 0 and np.allclose(face, 255), 'box not on the face'
+        assert np.allclose(targets[0, 4:6], (targets[0, 0:2] + targets[0, 2:4]) / 2), 'landmark not match'
+
+from mindspore import Tensor
+from mindface.utils import InputNormalize
+
+def test_uint8_output():
+    """test normalizing the uint8 images inside the network gives the float images of the host"""
+    image = np.random.default_rng(0).integers(0, 256, (120, 90, 3), dtype=np.uint8)
+    target = np.array([[20, 30, 60, 80] + [40, 55] * 5 + [1]], dtype=np.float32)
+    normalize = InputNormalize((104, 117, 123))
+    for seed in range(4):
+        np.random.seed(seed)
+        random.seed(seed)
+        expected, expected_targets = Preproc(64)(image, target)
+        np.random.seed(seed)
+        random.seed(seed)
+        output, targets = Preproc(64, uint8_output=True)(image, target)
+        assert output.dtype == np.uint8 and output.shape == (64, 64, 3), 'uint8 image not match'
+        assert np.array_equal(targets, expected_targets), 'targets not match'
+        assert np.allclose(normalize(Tensor(output[None])).asnumpy()[0], expected), 'normalized image not match'
+
+from mindface.detection.datasets.augmentation import _rand, get_interp_method, cv_image_reshape
+
+def baseline_preproc(image, target, image_dim):
+    """the crop, pad, resize, flip and normalization of the original Preproc, one step after another"""
+    image_h, image_w, _ = image.shape
+    flip = _rand() < .5
+    candidates = _choose_candidate(250, image_w, image_h, target[:, :4])
+    targets, (dx, dy, nw, nh) = _correct_bbox_by_candidates(candidates, image_dim, image_dim, flip, target[:, :4],
+                                                            target[:, -1], target[:, 4:-1], False)
+    image = image[dy:(dy + nh), dx:(dx + nw)]
+    if nw != nh:
+        l = max(nw, nh)
+        t_image = np.empty((l, l, 3), dtype=image.dtype)
+        t_image[:, :] = (104, 117, 123)
+        t_image[:nh, :nw] = image
+        image = t_image
+    interp = get_interp_method(interp=10)
+    image = cv2.resize(image, (image_dim, image_dim), interpolation=cv_image_reshape(interp))
+    if flip:
+        image = image[:, ::-1]
+    image = image.astype(np.float32)
+    image -= (104, 117, 123)
+    return image.transpose(2, 0, 1), targets
+
+def test_preproc_baseline():
+    """test the fused image path gives the pixels of the original one, in a new array every call"""
+    image = np.random.default_rng(0).integers(0, 256, (90, 120, 3), dtype=np.uint8)
+    crop_target = np.array([[20, 30, 60, 80] + [40, 55] * 5 + [1]], dtype=np.float32)
+    # a face over the whole image leaves only the uncropped candidate, which is padded to a square
+    pad_target = np.array([[0, 0, 120, 90] + [60, 45] * 5 + [1]], dtype=np.float32)
+    aug = Preproc(64)
+    for target in (crop_target, pad_target):
+        for seed in range(6):
+            np.random.seed(seed)
+            random.seed(seed)
+            output, targets = aug(image, target)
+            np.random.seed(seed)
+            random.seed(seed)
+            expected, expected_targets = baseline_preproc(image, target, 64)
+            assert np.array_equal(output, expected), 'image not match'
+            assert np.array_equal(targets, expected_targets), 'targets not match'
+
+    first, _ = aug(image, crop_target)
+    kept = first.copy()
+    second, _ = aug(image, crop_target)
+    assert first is not second and np.array_equal(first, kept), 'output reused'
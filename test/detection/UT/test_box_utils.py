@@ -0,0 +1,122 @@
+# import packages
+import numpy as np
+
+from mindface.detection.utils.box_utils import AnchorConfig, match, match_batch
+
+def random_targets(rng, num_faces):
+    """random targets of boxes, landmarks and label"""
+    xy = rng.random((num_faces, 2)) * 0.9
+    wh = rng.random((num_faces, 2)) ** 3 * 0.5 + 0.003
+    boxes = np.concatenate([xy, np.minimum(xy + wh, 1)], axis=1)
+    labels = np.where(rng.random((num_faces, 1)) < 0.3, -1, 1)
+    return np.concatenate([boxes, rng.random((num_faces, 10)), labels], axis=1).astype(np.float32)
+
+def test_match():
+    """test every ground truth is forced onto its best prior"""
+    priors = AnchorConfig().priors((320, 320))
+    targets = random_targets(np.random.default_rng(0), 8)
+    loc, conf, landm = match(0.35, targets[:, :4], priors, [0.1, 0.2], targets[:, -1], targets[:, 4:14])
+
+    assert loc.shape == (4200, 4) and conf.shape == (4200,) and landm.shape == (4200, 10), 'shape not match'
+    assert loc.dtype == np.float32 and conf.dtype == np.int32 and landm.dtype == np.float32, 'dtype not match'
+    assert set(np.unique(conf)) <= {-1, 0, 1} and np.count_nonzero(conf) >= 8, 'forced match not match'
+
+def test_match_batch():
+    """test the batch matcher gives the targets of matching every image alone"""
+    rng = np.random.default_rng(1)
+    priors = AnchorConfig().priors((320, 320))
+    batch = [random_targets(rng, num_faces) for num_faces in (1, 5, 40, 0)]
+    batch[2][7] = batch[2][6]
+    loc_b, conf_b, landm_b = match_batch(0.35, batch, priors, [0.1, 0.2])
+
+    for i, targets in enumerate(batch):
+        loc, conf, landm = match(0.35, targets[:, :4], priors, [0.1, 0.2], targets[:, -1], targets[:, 4:14])
+        pos = conf != 0
+        assert np.array_equal(conf, conf_b[i]), 'conf not match'
+        assert np.array_equal(loc[pos], loc_b[i][pos]), 'loc not match'
+        assert np.array_equal(landm[pos], landm_b[i][pos]), 'landm not match'
+    assert not conf_b[3].any(), 'image without faces not background'
+
+from mindspore import Tensor
+from mindface.detection.loss import PriorMatcher
+
+def test_prior_matcher():
+    """test the on-device matcher gives the targets of the host matcher"""
+    rng = np.random.default_rng(2)
+    priors = AnchorConfig().priors((320, 320))
+    batch = []
+    for num_faces in (1, 6, 3):
+        # boxes close to a prior peak at a single prior, so no tie is broken differently
+        faces = priors[rng.choice(priors.shape[0], num_faces, replace=False)].copy()
+        faces[:, 2:4] *= rng.uniform(0.9, 1.1, (num_faces, 2))
+        boxes = np.concatenate([faces[:, 0:2] - faces[:, 2:4] / 2, faces[:, 0:2] + faces[:, 2:4] / 2], axis=1)
+        targets = random_targets(rng, num_faces)
+        targets[:, :4] = boxes
+        batch.append(targets)
+    gt = np.zeros((3, 8, 15), dtype=np.float32)
+    for i, targets in enumerate(batch):
+        gt[i, :targets.shape[0]] = targets
+    loc, conf, landm = PriorMatcher(priors, [0.1, 0.2], 0.35, max_faces=8)(Tensor(gt))
+    loc_b, conf_b, landm_b = match_batch(0.35, batch, priors, [0.1, 0.2])
+    pos = conf_b != 0
+
+    assert np.array_equal(conf.asnumpy(), conf_b), 'conf not match'
+    assert np.allclose(loc.asnumpy()[pos], loc_b[pos], atol=1e-5), 'loc not match'
+    assert np.allclose(landm.asnumpy()[pos], landm_b[pos], atol=1e-5), 'landm not match'
+
+def test_prior_matcher_ties():
+    """test a face tied between priors changes the forced prior of the on-device matcher and nothing else"""
+    rng = np.random.default_rng(3)
+    priors = AnchorConfig().priors((256, 256))
+    prior_boxes = np.concatenate([priors[:, 0:2] - priors[:, 2:4] / 2, priors[:, 0:2] + priors[:, 2:4] / 2], axis=1)
+    batch, tied = [], []
+    for num_faces in (1, 4, 2):
+        # an 8 x 8 face between the centers of four 16 x 16 priors is inside all of them, an IoU of 0.25 each
+        cells = rng.choice(49, num_faces, replace=False)
+        corners = (4 + 40 * np.stack([cells % 7, cells // 7], axis=1)) / 256
+        targets = random_targets(rng, num_faces)
+        targets[:, :4] = np.concatenate([corners, corners + 8 / 256], axis=1)
+        batch.append(targets)
+        tied.append([])
+        for box in targets[:, :4]:
+            inter = np.prod(np.clip(np.minimum(box[2:], prior_boxes[:, 2:]) - np.maximum(box[:2], prior_boxes[:, :2]),
+                                    0, None), axis=1)
+            overlaps = inter / (64 / 256 ** 2 + np.prod(priors[:, 2:4], axis=1) - inter)
+            tied[-1].append(np.flatnonzero(overlaps == overlaps.max()))
+    gt = np.zeros((3, 8, 15), dtype=np.float32)
+    for i, targets in enumerate(batch):
+        gt[i, :targets.shape[0]] = targets
+    loc, conf, landm = PriorMatcher(priors, [0.1, 0.2], 0.35, max_faces=8)(Tensor(gt))
+    loc, conf, landm = loc.asnumpy(), conf.asnumpy(), landm.asnumpy()
+    loc_b, conf_b, landm_b = match_batch(0.35, batch, priors, [0.1, 0.2])
+
+    for i, faces in enumerate(tied):
+        outside = np.ones(priors.shape[0], dtype=bool)
+        outside[np.concatenate(faces)] = False
+        assert all(len(prior_ids) == 4 for prior_ids in faces), 'face not tied'
+        assert np.array_equal(conf[i][outside], conf_b[i][outside]), 'conf differs outside the tied priors'
+        for prior_ids in faces:
+            assert np.count_nonzero(conf[i][prior_ids]) == np.count_nonzero(conf_b[i][prior_ids]) == 1, \
+                'not a single forced prior'
+        pos = (conf[i] != 0) & (conf_b[i] != 0)
+        assert np.allclose(loc[i][pos], loc_b[i][pos], atol=1e-5), 'loc not match'
+        assert np.allclose(landm[i][pos], landm_b[i][pos], atol=1e-5), 'landm not match'
+
+import pytest
+from mindface.detection.utils import resize_schedule
+
+def test_resize_schedule():
+    """test the progressive resizing phases and the priors of every size"""
+    assert resize_schedule(None, 120, 640) == [(0, 120, 640)], 'phases not match'
+    phases = resize_schedule([[0, 320], [40, 480], [80, 640]], 120, 640)
+    assert phases == [(0, 40, 320), (40, 80, 480), (80, 120, 640)], 'phases not match'
+    with pytest.raises(ValueError):
+        resize_schedule([[10, 320], [80, 640]], 120, 640)
+    with pytest.raises(ValueError):
+        resize_schedule([[0, 300]], 120, 640)
+
+    anchor_cfg = AnchorConfig()
+    for _, _, size in phases:
+        priors = anchor_cfg.priors((size, size))
+        assert priors.shape == (anchor_cfg.num_priors(size), 4) and anchor_cfg.priors((size, size)) is priors
+    assert not priors.flags.writeable, 'cached priors writeable'
@@ -0,0 +1,69 @@
+# import packages
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+import mindspore.dataset as de
+from mindspore import nn
+from mindspore.train import Model
+from mindspore import load_checkpoint
+from mindface.utils import AsyncCheckpoint, load_delta_checkpoint
+
+def test_async_checkpoint(tmp_path):
+    """test the checkpoints are written in the background, rotated and merged from their deltas"""
+    frozen = nn.Dense(4, 4)
+    frozen.weight.requires_grad = False
+    frozen.bias.requires_grad = False
+    head = nn.Dense(4, 1)
+    net = nn.TrainOneStepCell(nn.WithLossCell(nn.SequentialCell([frozen, head]), nn.MSELoss()),
+                              nn.SGD(head.trainable_params()))
+    data = (np.random.rand(16, 4).astype(np.float32), np.ones((16, 1), np.float32))
+    dataset = de.NumpySlicesDataset(data, ['x', 'y'], shuffle=False).batch(2)
+    Model(net).train(2, dataset, callbacks=[AsyncCheckpoint('net', str(tmp_path), 3, 2)], dataset_sink_mode=False)
+    assert sorted(os.listdir(tmp_path)) == ['net-2_7.ckpt', 'net-2_8.ckpt'], 'rotation not match'
+    param_dict = load_delta_checkpoint(str(tmp_path / 'net-2_8.ckpt'))
+    assert np.array_equal(param_dict[head.weight.name].asnumpy(), head.weight.asnumpy()), 'parameters not match'
+
+    delta_path = tmp_path / 'delta'
+    dataset = de.NumpySlicesDataset(data, ['x', 'y'], shuffle=False).batch(2)
+    Model(net).train(1, dataset, callbacks=[AsyncCheckpoint('net', str(delta_path), 4, 5, only_changed=True)],
+                     dataset_sink_mode=False)
+    assert sorted(os.listdir(delta_path)) == ['net-1_8-delta.ckpt', 'net-base.ckpt'], 'deltas not match'
+    delta = load_checkpoint(str(delta_path / 'net-1_8-delta.ckpt'))
+    assert head.weight.name in delta and frozen.weight.name not in delta, 'changed parameters not match'
+    param_dict = load_delta_checkpoint(str(delta_path / 'net-1_8-delta.ckpt'))
+    for param in net.get_parameters():
+        assert np.array_equal(param_dict[param.name].asnumpy(), param.asnumpy()), 'parameters not match'
+
+
+def test_async_checkpoint_shared_directory(tmp_path, monkeypatch):
+    """test the rotation skips the checkpoints another writer of the directory removed meanwhile"""
+    for step in range(3):
+        (tmp_path / f'net-1_{step}.ckpt').write_bytes(b'')
+        os.utime(tmp_path / f'net-1_{step}.ckpt', (step, step))
+    checkpoint = AsyncCheckpoint('net', str(tmp_path), keep_checkpoint_max=1)
+    listing = os.listdir(tmp_path)
+    (tmp_path / 'net-1_0.ckpt').unlink()
+    monkeypatch.setattr(os, 'listdir', lambda path: listing)
+    checkpoint._rotate()  # pylint: disable=protected-access
+    monkeypatch.undo()
+    assert os.listdir(tmp_path) == ['net-1_2.ckpt'], 'rotation not match'
+
+
+def test_async_checkpoint_one_copy(tmp_path, monkeypatch):
+    """test a snapshot copies the parameters only after the previous one is written"""
+    checkpoint = AsyncCheckpoint('net', str(tmp_path))
+    events = []
+
+    def write(name, params):
+        time.sleep(0.2)
+        events.append(('written', name))
+
+    monkeypatch.setattr(checkpoint, '_write', write)
+    for step in (1, 2):
+        checkpoint.epoch_step = step
+        checkpoint.snapshot(SimpleNamespace(batch_num=4, cur_epoch_num=1, train_network=nn.Dense(4, 1)))
+        events.append(('copied', step))
+    checkpoint.flush()
+    assert events == [('copied', 1), ('written', 'net-1_1'), ('copied', 2), ('written', 'net-1_2')], 'copies overlap'
+    assert not checkpoint.thread.is_alive(), 'writer not stopped'
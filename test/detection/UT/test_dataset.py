@@ -7,4 +7,33 @@ def test_dataset(cfg):
     ds_train = create_dataset(data_dir, cfg, batch_size, multiprocessing=True, num_worker=2)
     assert ds_train.get_batch_size() == batch_size
 
+import pickle
+import random
+import cv2
+import numpy as np
 
+from mindface.detection.datasets import WiderFace
+from mindface.detection.datasets.augmentation import Preproc
+from mindface.detection.datasets.dataset import SampleTransform
+from mindface.detection.utils.box_utils import Bboxencode
+
+def test_sample_transform(label_path):
+    """test the fused transform emits the columns of the stages chained one by one"""
+    path, target = WiderFace(label_path)[0]
+    image = cv2.imread(path)
+    encode = Bboxencode([0.1, 0.2], 0.35, 64)
+    transform = pickle.loads(pickle.dumps(SampleTransform(Preproc(64), encode)))
+
+    random.seed(0)
+    np.random.seed(0)
+    fused = transform(path, target)
+    random.seed(0)
+    np.random.seed(0)
+    split = encode(*Preproc(64)(image, target))
+    assert len(fused) == 4, 'columns not match'
+    for fused_column, split_column in zip(fused, split):
+        assert np.array_equal(fused_column, split_column), 'column not match'
+
+    np.random.seed(0)
+    _, gt = SampleTransform(Preproc(64), read=False, max_faces=3)(image, target)
+    assert gt.shape == (3, 15) and not gt[1:].any(), 'padded targets not match'
@@ -0,0 +1,87 @@
+# import packages
+import time
+import mindspore.dataset as de
+
+from mindface.utils import autotune_loader
+
+class FakeLoader():
+    """a loader whose batches take the time of its workers"""
+    def __init__(self, num_workers, built):
+        self.batch_time = 0.08 / min(num_workers, 4)
+        built.append(num_workers)
+
+    def create_tuple_iterator(self, num_epochs, output_numpy):
+        while True:
+            time.sleep(self.batch_time)
+            yield ()
+
+def test_autotune_loader():
+    """test the workers grow until the speedup stops or the loader keeps up with the consumer"""
+    prefetch_size = de.config.get_prefetch_size()
+    try:
+        built = []
+        num_workers, prefetch = autotune_loader(lambda n: FakeLoader(n, built), max_workers=16, num_batches=5)
+        assert num_workers == 4 and built == [1, 2, 4, 8], 'workers not match'
+        assert prefetch == de.config.get_prefetch_size() >= prefetch_size, 'prefetch not set'
+
+        built = []
+        num_workers, _ = autotune_loader(lambda n: FakeLoader(n, built), max_workers=16, step_time=0.05,
+                                         num_batches=3)
+        assert num_workers == 2 and built == [1, 2], 'workers not match'
+    finally:
+        de.config.set_prefetch_size(prefetch_size)
+
+import os
+import cv2
+from mindface.utils import CorePlan, cpu_count
+
+def test_core_plan():
+    """test the cores are split between MindSpore and the loader and the worker threads are set"""
+    plan = CorePlan(cv2_threads=1)
+    cores = plan.framework_cores + plan.loader_cores
+    assert len(plan.framework_cores) >= 1 and len(plan.loader_cores) >= 1, 'partition not match'
+    if cpu_count() > 1:
+        assert len(set(cores)) == cpu_count() and len(plan.framework_cores) == max(1, cpu_count() // 4)
+        assert plan.num_workers == len(plan.loader_cores), 'workers not match'
+    ranks = [CorePlan(local_ranks=2, local_rank=rank) for rank in range(2)]
+    rank_cores = [set(rank.framework_cores + rank.loader_cores) for rank in ranks]
+    assert all(len(cores) == max(1, cpu_count() // 2) for cores in rank_cores), 'share of the ranks not match'
+    if cpu_count() > 1:
+        assert not rank_cores[0] & rank_cores[1], 'ranks share cores'
+
+    num_threads = cv2.getNumThreads()
+    try:
+        plan.init_worker()
+        assert cv2.getNumThreads() == 1 and plan.worker_pid == os.getpid(), 'worker threads not set'
+    finally:
+        cv2.setNumThreads(num_threads)
+
+import pytest
+from mindface.utils import time_stage, benchmark_loader
+
+def test_benchmark_loader():
+    """test the stage throughput and the loader report"""
+    samples_per_second, outputs = time_stage(lambda x: x * 2, [(i,) for i in range(8)])
+    assert samples_per_second > 0 and outputs == [i * 2 for i in range(8)], 'stage not match'
+
+    dataset = de.NumpySlicesDataset({'image': list(range(40))}, shuffle=False).batch(4)
+    report = benchmark_loader(dataset, batch_size=4, num_batches=5)
+    assert set(report) == {'samples_per_second', 'batch_ms', 'ready_ratio', 'worker_cpu_share', 'main_cpu_share'}
+    assert report['samples_per_second'] > 0 and 0 <= report['ready_ratio'] <= 1, 'report not match'
+
+    with pytest.raises(ValueError):
+        benchmark_loader(de.NumpySlicesDataset({'image': list(range(3))}).batch(4, drop_remainder=True), 4)
+
+def test_autotune_stages(capsys):
+    """test the stages are reported before the warm-up and a loader too short to time is refused"""
+    prefetch_size = de.config.get_prefetch_size()
+    try:
+        autotune_loader(lambda n: FakeLoader(n, []), max_workers=1, step_time=0.1, num_batches=1, batch_size=8,
+                        stage_speed=lambda: {'read': 100.0, 'augment': 20.0})
+    finally:
+        de.config.set_prefetch_size(prefetch_size)
+    out = capsys.readouterr().out
+    assert 'stage read: 100.0' in out and 'slowest stage is augment, it needs 4 workers' in out, 'stages not match'
+
+    with pytest.raises(ValueError):
+        autotune_loader(lambda n: de.NumpySlicesDataset({'image': list(range(4))}).batch(4), max_workers=1)
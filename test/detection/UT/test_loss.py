@@ -6,4 +6,65 @@ def test_multiboxloss():
     negative_ratio = 7
     num_classes = 2
     num_anchor = 16800
-    multibox_loss = MultiBoxLoss(num_classes, num_anchor, negative_ratio, batch_size)
\ No newline at end of file
+    multibox_loss = MultiBoxLoss(num_classes, num_anchor, negative_ratio, batch_size)
+import numpy as np
+from mindspore import Tensor
+
+def test_multiboxloss_threshold_mining():
+    """test the threshold mining gives the loss of the two sorts, ties included"""
+    batch_size, num_anchor = 2, 200
+    rng = np.random.default_rng(0)
+    conf_t = np.zeros((batch_size, num_anchor), np.float32)
+    conf_t[0, rng.choice(100, 5, replace=False)] = 1
+    conf_t[1, rng.choice(100, 40, replace=False)] = 1
+    conf_data = rng.normal(size=(batch_size, num_anchor, 2)).astype(np.float32)
+    # 50 negatives of the same, highest loss, of which the 35 hardest of the first image are only a part
+    conf_data[:, 100:150] = (-3.0, 3.0)
+    inputs = [Tensor(rng.normal(size=(batch_size, num_anchor, 4)).astype(np.float32)),
+              Tensor(rng.normal(size=(batch_size, num_anchor, 4)).astype(np.float32)),
+              Tensor(conf_data), Tensor(conf_t),
+              Tensor(rng.normal(size=(batch_size, num_anchor, 10)).astype(np.float32)),
+              Tensor(rng.normal(size=(batch_size, num_anchor, 10)).astype(np.float32))]
+    losses = MultiBoxLoss(2, num_anchor, 7)(*inputs)
+    threshold_losses = MultiBoxLoss(2, num_anchor, 7, mining='threshold')(*inputs)
+    for loss, threshold_loss in zip(losses, threshold_losses):
+        assert np.allclose(loss.asnumpy(), threshold_loss.asnumpy(), rtol=1e-5), 'loss not match'
+
+    logits = conf_data - conf_data.max(-1, keepdims=True)
+    cross_entropy = np.log(np.exp(logits).sum(-1))
+    cross_entropy -= np.take_along_axis(logits, conf_t[..., None].astype(int), -1)[..., 0]
+    expected = sum(cross_entropy[i][conf_t[i] > 0].sum() + np.sort(cross_entropy[i][conf_t[i] == 0])[::-1][:k].sum()
+                   for i, k in enumerate((35, 199)))
+    assert np.isclose(threshold_losses[1].asnumpy(), expected / 45, rtol=1e-5), 'loss not match'
+
+from mindspore import nn, ops
+
+class ConfLoss(nn.Cell):
+    """the classification loss of MultiBoxLoss as a function of the confidences"""
+    def __init__(self, loss, inputs):
+        super().__init__()
+        self.loss = loss
+        self.inputs = inputs
+
+    def construct(self, conf_data):
+        return self.loss(self.inputs[0], self.inputs[1], conf_data, self.inputs[3], self.inputs[4],
+                         self.inputs[5])[1]
+
+def test_threshold_mining_tie_gradient():
+    """test the negatives tied at the k-th loss share the weight of the ties in the gradient"""
+    batch_size, num_anchor = 2, 200
+    rng = np.random.default_rng(0)
+    conf_t = np.zeros((batch_size, num_anchor), np.float32)
+    conf_t[0, :5] = 1
+    conf_t[1, :40] = 1
+    conf_data = rng.normal(size=(batch_size, num_anchor, 2)).astype(np.float32)
+    # 35 of the 50 tied hardest negatives count in the first image, all of them in the second
+    conf_data[:, 100:150] = (-3.0, 3.0)
+    inputs = [Tensor(rng.normal(size=(batch_size, num_anchor, 4)).astype(np.float32)) for _ in range(2)]
+    inputs += [Tensor(conf_data), Tensor(conf_t)]
+    inputs += [Tensor(rng.normal(size=(batch_size, num_anchor, 10)).astype(np.float32)) for _ in range(2)]
+    grad = ops.GradOperation()(ConfLoss(MultiBoxLoss(2, num_anchor, 7, mining='threshold'), inputs))
+    grad = grad(Tensor(conf_data)).asnumpy()
+
+    assert np.allclose(grad[0, 100:150], grad[0, 100]) and np.abs(grad[0, 100]).sum() > 0, 'ties not shared'
+    assert np.allclose(grad[0, 100], grad[1, 100] * 35 / 50, rtol=1e-5), 'weight of the ties not match'
@@ -54,4 +54,98 @@ def test_retinaface_resnet50():
 
     assert y[0].shape==(batchsize, 2058,4), 'BBoxHead output shape not match'
     assert y[1].shape==(batchsize, 2058,2), 'ClassHead output shape not match'
-    assert y[2].shape==(batchsize, 2058,10), 'LanmarkHead output shape not match'
\ No newline at end of file
+    assert y[2].shape==(batchsize, 2058,10), 'LanmarkHead output shape not match'
+
+from mindface.utils import fuse_for_inference
+
+def test_fuse_for_inference_mobilenet025():
+    """test fuse_for_inference keeps the retinaface_mobilenet025 outputs"""
+    batchsize = 2
+    net = RetinaFace(phase='predict', backbone=mobilenet025(1000), in_channel=32, out_channel=64)
+    net.set_train(False)
+    dummy_input = Tensor(np.random.rand(batchsize, 3, 96, 96), dtype=mindspore.float32)
+    y = net(dummy_input)
+    y_fused = fuse_for_inference(net)(dummy_input)
+
+    for out, out_fused in zip(y, y_fused):
+        assert np.allclose(out.asnumpy(), out_fused.asnumpy(), atol=1e-4), 'fused output not match'
+
+from mindface.utils import calibrate, quantize
+
+def test_quantize_mobilenet025():
+    """test quantize keeps the retinaface_mobilenet025 output shapes and int8 weights"""
+    batchsize = 2
+    net = RetinaFace(phase='predict', backbone=mobilenet025(1000), in_channel=32, out_channel=64)
+    net.set_train(False)
+    dummy_input = Tensor(np.random.rand(batchsize, 3, 96, 96), dtype=mindspore.float32)
+    y = net(dummy_input)
+    ranges = calibrate(net, [dummy_input])
+    y_quant = quantize(net, ranges)(dummy_input)
+
+    for out, out_quant in zip(y, y_quant):
+        assert out.shape == out_quant.shape, 'quantized output shape not match'
+    weights = [param for param in net.get_parameters() if param.name.endswith('.weight') and param.dim() == 4]
+    assert all(param.dtype == mindspore.int8 for param in weights), 'conv weights not quantized'
+
+from mindface.utils import prune_channels, slim_channels
+
+def test_prune_channels_mobilenet025():
+    """test prune_channels removes exactly the channels that are switched off"""
+    net = RetinaFace(phase='predict', backbone=mobilenet025(1000), in_channel=32, out_channel=64)
+    net.set_train(False)
+    cells = dict(net.cells_and_names())
+    for outputs, _ in net.prune_groups():
+        for path in outputs:
+            if isinstance(cells[path], mindspore.nn.BatchNorm2d):
+                norm = cells[path]
+                gamma = np.random.uniform(0.5, 1.0, norm.gamma.shape).astype(np.float32)
+                gamma[1::2] = 0
+                mean = norm.moving_mean.asnumpy()
+                mean[1::2] = 0
+                norm.gamma.set_data(Tensor(gamma))
+                norm.beta.set_data(Tensor(np.where(gamma > 0, 0.1, 0).astype(np.float32)))
+                norm.moving_mean.set_data(Tensor(mean))
+    dummy_input = Tensor(np.random.rand(1, 3, 96, 96), dtype=mindspore.float32)
+    y = net(dummy_input)
+    net, widths = prune_channels(net, 0.5)
+    y_pruned = net(dummy_input)
+
+    for out, out_pruned in zip(y, y_pruned):
+        assert np.allclose(out.asnumpy(), out_pruned.asnumpy(), atol=1e-4), 'pruned output not match'
+    slim = slim_channels(RetinaFace(phase='predict', backbone=mobilenet025(1000), in_channel=32, out_channel=64),
+                         widths)
+    shapes = [param.shape for param in net.get_parameters()]
+    assert [param.shape for param in slim.get_parameters()] == shapes, 'slim network shapes not match'
+
+from mindface.detection.models import build_backbone
+
+def test_retinaface_mobilenetv2_025():
+    """test retinaface with a registered backbone and the FPN channels it sets"""
+    batchsize = 2
+    backbone = build_backbone('MobileNetV2_025')
+    net = RetinaFace(phase='train', backbone=backbone, out_channel=64)
+    dummy_input = Tensor(np.random.rand(batchsize, 3, 224, 224), dtype=mindspore.float32)
+    y = net(dummy_input)
+
+    assert backbone.out_channels == (8, 24, 80), 'backbone out_channels not match'
+    assert y[0].shape==(batchsize, 2058,4), 'BBoxHead output shape not match'
+    assert y[1].shape==(batchsize, 2058,2), 'ClassHead output shape not match'
+    assert y[2].shape==(batchsize, 2058,10), 'LanmarkHead output shape not match'
+
+from mindface.detection.utils import AnchorConfig
+
+def test_retinaface_anchor_config():
+    """test retinaface with one anchor per location and without the stride 8 level"""
+    batchsize = 2
+    anchor_cfg = AnchorConfig(min_sizes=[[64], [256]], steps=[16, 32])
+    net = RetinaFace(phase='train', backbone=mobilenet025(1000), out_channel=64, anchor_cfg=anchor_cfg)
+    dummy_input = Tensor(np.random.rand(batchsize, 3, 224, 224), dtype=mindspore.float32)
+    y = net(dummy_input)
+    num_priors = anchor_cfg.num_priors(224)
+
+    assert num_priors == 14 * 14 + 7 * 7, 'num_priors not match'
+    assert anchor_cfg.priors((224, 224)).shape == (num_priors, 4), 'priors shape not match'
+    assert y[0].shape==(batchsize, num_priors,4), 'BBoxHead output shape not match'
+    assert y[1].shape==(batchsize, num_priors,2), 'ClassHead output shape not match'
+    assert y[2].shape==(batchsize, num_priors,10), 'LanmarkHead output shape not match'
+    assert not hasattr(net, 'ssh1') and not hasattr(net.fpn, 'merge1'), 'stride 8 level not removed'
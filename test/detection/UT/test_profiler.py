@@ -0,0 +1,28 @@
+# import packages
+import time
+import numpy as np
+import mindspore.dataset as de
+from mindspore import nn
+from mindspore.train import Model
+from mindface.utils import StepProfiler
+
+class SlowSource():
+    """a source whose samples take a while to load"""
+    def __getitem__(self, index):
+        time.sleep(0.01)
+        return np.ones(4, np.float32), np.ones(1, np.float32)
+
+    def __len__(self):
+        return 16
+
+def test_step_profiler():
+    """test the steps are split into data wait and compute and summarized"""
+    dataset = de.GeneratorDataset(SlowSource(), ['x', 'y'], shuffle=False).batch(2)
+    net = nn.TrainOneStepCell(nn.WithLossCell(nn.Dense(4, 1), nn.MSELoss()), nn.SGD(nn.Dense(4, 1).trainable_params()))
+    profiler = StepProfiler(interval=4)
+    Model(net).train(1, dataset, callbacks=[profiler], dataset_sink_mode=False)
+    assert len(profiler.summaries) == 2, 'summaries not match'
+    report = profiler.summaries[0]
+    assert report['step_p95_ms'] >= report['step_p50_ms'] > 0 and report['rss_mb'] > 0
+    assert 0 < report['starved'] < 1 and report['compute_ms'] > 0, 'data wait not match'
+    assert report['images_per_second'] <= 2 / ((report['wait_ms'] + report['compute_ms']) / 1000) * 1.01
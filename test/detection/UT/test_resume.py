@@ -0,0 +1,76 @@
+# import packages
+import os
+import numpy as np
+import mindspore.dataset as de
+from mindspore import nn
+from mindspore.train import Model
+from mindspore.train.serialization import load_param_into_net
+from mindface.utils import ResumableSampler, TrainState, resume_phases, AsyncCheckpoint
+
+def test_resumable_sampler():
+    """test the order is a function of the seed and the epoch, sharded and skipped"""
+    sampler = ResumableSampler(10, seed=1)
+    epochs = [list(sampler) for _ in range(2)]
+    assert sorted(epochs[0]) == list(range(10)) and epochs[0] != epochs[1], 'shuffle not match'
+    assert list(ResumableSampler(10, seed=1, start_epoch=1)) == epochs[1], 'order not match'
+    assert list(ResumableSampler(10, seed=1, start_epoch=1, skip_samples=4)) == epochs[1][4:], 'skip not match'
+    shards = [list(ResumableSampler(10, seed=1, num_shards=3, shard_id=i)) for i in range(3)]
+    assert [len(shard) for shard in shards] == [4, 4, 4], 'shard size not match'
+    assert set(sum(shards, [])) == set(range(10)), 'shards not match'
+    assert resume_phases([(0, 10, 640), (10, 20, 840)], 9, 3) == [(9, 10, 640, 3), (10, 20, 840, 0)]
+
+class IndexSource():
+    """a source of 8 samples for a sampler"""
+    def __init__(self):
+        self.x = np.random.rand(8, 4).astype(np.float32)
+        self.y = np.random.rand(8, 1).astype(np.float32)
+
+    def __getitem__(self, item):
+        return self.x[item], self.y[item]
+
+    def __len__(self):
+        return 8
+
+def test_resume_train_state(tmp_path):
+    """test a training resumed mid-epoch ends with the weights of the uninterrupted training"""
+    source = IndexSource()
+
+    def build():
+        dense = nn.Dense(4, 1)
+        lr = [0.1, 0.09, 0.08, 0.07, 0.06, 0.05, 0.04, 0.03]
+        return nn.TrainOneStepCell(nn.WithLossCell(dense, nn.MSELoss()), nn.Momentum(dense.trainable_params(), lr, 0.9))
+
+    def make_dataset(start_epoch=0, skip_steps=0):
+        sampler = ResumableSampler(8, seed=1, start_epoch=start_epoch, skip_samples=skip_steps * 2)
+        return de.GeneratorDataset(source, ['x', 'y'], sampler=sampler).batch(2)
+
+    net = build()
+    initial = {param.name: param.clone() for param in net.get_parameters()}
+    Model(net).train(2, make_dataset(), callbacks=[AsyncCheckpoint('net', str(tmp_path), 3, 5)],
+                     dataset_sink_mode=False)
+
+    resumed = build()
+    load_param_into_net(resumed, initial)
+    state = TrainState(str(tmp_path / 'net-1_3.ckpt'), 4)
+    assert (state.epoch, state.step) == (0, 3), 'position not match'
+    state.load(resumed)
+    model = Model(resumed)
+    # the replayed rest of the epoch is saved and named by the steps of a whole epoch
+    checkpoint = AsyncCheckpoint('net', str(tmp_path / 'resumed'), 2, 5, steps_per_epoch=4)
+    for start_epoch, end_epoch, skip_steps in resume_phases([(0, 2)], state.epoch, state.step):
+        model.train(end_epoch, make_dataset(start_epoch, skip_steps), callbacks=[checkpoint],
+                    dataset_sink_mode=False, initial_epoch=start_epoch)
+    assert sorted(os.listdir(tmp_path / 'resumed')) == ['net-1_4.ckpt', 'net-2_2.ckpt', 'net-2_4.ckpt'], \
+        'checkpoints not match'
+    for param, resumed_param in zip(net.get_parameters(), resumed.get_parameters()):
+        assert np.allclose(param.asnumpy(), resumed_param.asnumpy(), atol=1e-6), f'{param.name} not match'
+
+from mindspore import Tensor, save_checkpoint
+
+def test_train_state_step_count(tmp_path):
+    """test the position is that of the step count of the wrapper, which counts the steps a loss scale skips"""
+    path = str(tmp_path / 'net-2_1.ckpt')
+    save_checkpoint([{'name': 'global_step', 'data': Tensor(np.array([3], np.int32))},
+                     {'name': 'train_step', 'data': Tensor(np.array([5], np.int32))}], path)
+    state = TrainState(path, 4)
+    assert (state.epoch, state.step, state.global_step) == (1, 1, 3), 'position not match'
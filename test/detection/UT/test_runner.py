@@ -0,0 +1,35 @@
+# import packages
+import numpy as np
+from mindspore import nn, Tensor
+from mindface.utils import to_half
+from mindface.detection.runner import TrainingWrapper
+
+def test_training_wrapper_loss_scale():
+    """test a float16 network trains with a dynamic loss scale and skips the steps that overflow"""
+    net = to_half(nn.SequentialCell([nn.Dense(4, 4), nn.BatchNorm1d(4), nn.Dense(4, 1)]))
+    assert net[1].get_flags()['fp32'] and net[0].get_flags()['fp16'], 'precision not match'
+    loss_net = nn.WithLossCell(net, nn.MSELoss())
+    opt = nn.SGD(net.trainable_params(), learning_rate=0.01)
+    train_net = TrainingWrapper(loss_net, opt, grad_clip=False,
+                                scale_update_cell=nn.DynamicLossScaleUpdateCell(2.0 ** 10, 2, 2))
+    train_net.set_train(True)
+    x, y = Tensor(np.random.rand(8, 4).astype(np.float32)), Tensor(np.zeros((8, 1), np.float32))
+    weight = net[0].weight.asnumpy().copy()
+
+    _, overflow, scale = train_net(x, y)
+    _, overflow, scale = train_net(x, y)
+    assert not overflow.asnumpy() and scale.asnumpy() == 2.0 ** 11, 'scale not raised'
+    assert not np.allclose(net[0].weight.asnumpy(), weight), 'weights not updated'
+
+    weight = net[0].weight.asnumpy().copy()
+    train_net.scale_sense.set_data(Tensor(np.float32(2.0 ** 127)))
+    _, overflow, scale = train_net(x, y * 1e30)
+    assert overflow.asnumpy() and scale.asnumpy() == 2.0 ** 126, 'overflow not handled'
+    assert np.allclose(net[0].weight.asnumpy(), weight), 'overflow step not skipped'
+    assert train_net.train_step.asnumpy()[0] == 3 and opt.global_step.asnumpy()[0] == 2, 'steps not counted'
+
+    train_net = TrainingWrapper(loss_net, opt, sens=0.0, grad_clip=False,
+                                scale_update_cell=nn.DynamicLossScaleUpdateCell(2.0 ** 10, 2, 2))
+    train_net.set_train(True)
+    _, overflow, _ = train_net(x, y)
+    assert not overflow.asnumpy() and np.allclose(net[0].weight.asnumpy(), weight), 'sens not applied'
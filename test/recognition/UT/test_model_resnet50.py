@@ -2,13 +2,15 @@ import os
 import sys
 sys.path.append(os.getcwd())
 sys.path.append(os.path.join(os.getcwd(),'mindface/recognition'))
+import numpy
 import mindspore.numpy as np
 import mindspore as ms
 
 from mindspore.parallel import _cost_model_context as cost_model_context
-from mindspore import context, Tensor
+from mindspore import context, nn, Tensor
 
 from mindface.recognition.models.iresnet import iresnet50, iresnet100
+from mindface.utils import fuse_for_inference
 
 # iresnet
 __all__ = ['iresnet50', 'iresnet100']
@@ -22,4 +24,40 @@ def test_model():
     output = net(x)
     print(output.shape)
     
-test_model()
\ No newline at end of file
+test_model()
+
+def randomize_norms(net):
+    """random BatchNorm statistics, so folding them is not an identity"""
+    for _, cell in net.cells_and_names():
+        if isinstance(cell, (nn.BatchNorm1d, nn.BatchNorm2d)):
+            shape = cell.gamma.shape
+            cell.gamma.set_data(Tensor(numpy.random.uniform(0.5, 1.5, shape), ms.float32))
+            cell.beta.set_data(Tensor(numpy.random.normal(0, 0.1, shape), ms.float32))
+            cell.moving_mean.set_data(Tensor(numpy.random.normal(0, 0.1, shape), ms.float32))
+            cell.moving_variance.set_data(Tensor(numpy.random.uniform(0.5, 1.5, shape), ms.float32))
+    return net
+
+def test_reparameterize():
+    net = randomize_norms(iresnet50(reparam=True))
+    net.set_train(False)
+    # a RepIBasicBlock has no residual connection to downsample
+    assert not any('downsample' in param.name for param in net.get_parameters())
+    x = Tensor(numpy.random.rand(2, 3, 112, 112), ms.float32)
+    output = net(x).asnumpy()
+    output_reparam = net.reparameterize()(x).asnumpy()
+    assert numpy.abs(output - output_reparam).max() <= 1e-4 * numpy.abs(output).max()
+
+test_reparameterize()
+
+def test_fuse_for_inference():
+    net = randomize_norms(iresnet50())
+    net.set_train(False)
+    x = Tensor(numpy.random.rand(2, 3, 112, 112), ms.float32)
+    output = net(x).asnumpy()
+    output_fused = fuse_for_inference(net)(x).asnumpy()
+    # the fuse_pairs of IBasicBlock and IResNet and the bn2 -> fc input pair through the flatten
+    assert not isinstance(net.layer1[0].bn2, nn.BatchNorm2d) and not isinstance(net.bn2, nn.BatchNorm2d)
+    assert not isinstance(net.features, nn.BatchNorm1d)
+    assert numpy.abs(output - output_fused).max() <= 1e-4 * numpy.abs(output).max()
+
+test_fuse_for_inference()
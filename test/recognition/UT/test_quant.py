@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(),'mindface/recognition'))
+import tempfile
+import numpy as np
+import pytest
+import mindspore as ms
+from mindspore import context, save_checkpoint, load_checkpoint
+
+from mindface.recognition.models.mobilefacenet import get_mbf
+from mindface.recognition.quant import build_model, calib_batches
+from mindface.utils import quantize, calibrate, QuantConv2d, prune_channels
+
+context.set_context(mode=context.PYNATIVE_MODE,
+                    device_target='GPU', save_graphs=False)
+def test_quant():
+    with tempfile.TemporaryDirectory() as ckpt_dir:
+        ckpt_url = os.path.join(ckpt_dir, 'mobilefacenet.ckpt')
+        save_checkpoint(get_mbf(num_features=128), ckpt_url)
+        model = build_model('mobilefacenet', ckpt_url, num_features=128, fuse=True)
+        q_model = build_model('mobilefacenet', ckpt_url, num_features=128, fuse=True)
+    data = np.random.randint(0, 256, (8, 3, 112, 112)).astype(np.float32)
+    batches = list(calib_batches(data, 6, 4))
+    assert [batch.shape[0] for batch in batches] == [4, 2]
+    q_model = quantize(q_model, calibrate(q_model, batches))
+    assert any(isinstance(cell, QuantConv2d) for _, cell in q_model.cells_and_names())
+
+    x = next(calib_batches(data, 8, 8))
+    output = model(x).asnumpy()
+    output_int8 = q_model(x).asnumpy()
+    cosine = (output * output_int8).sum(1) / np.linalg.norm(output, axis=1) / np.linalg.norm(output_int8, axis=1)
+    assert cosine.min() > 0.95
+
+def test_quant_pruned():
+    with tempfile.TemporaryDirectory() as ckpt_dir:
+        ckpt_url = os.path.join(ckpt_dir, 'mobilefacenet_pruned.ckpt')
+        pruned, widths = prune_channels(get_mbf(num_features=128), 0.3)
+        save_checkpoint(pruned, ckpt_url)
+        model = build_model('mobilefacenet', ckpt_url, num_features=128, prune_widths=widths)
+    x = next(calib_batches(np.random.randint(0, 256, (2, 3, 112, 112)).astype(np.float32), 2, 2))
+    pruned.set_train(False)
+    assert np.allclose(model(x).asnumpy(), pruned(x).asnumpy(), atol=1e-5)
+
+def test_quant_missing_params():
+    with tempfile.TemporaryDirectory() as ckpt_dir:
+        ckpt_url = os.path.join(ckpt_dir, 'mobilefacenet.ckpt')
+        save_checkpoint(get_mbf(num_features=128), ckpt_url)
+        params = load_checkpoint(ckpt_url)
+        params.popitem()
+        save_checkpoint([{'name': name, 'data': param} for name, param in params.items()], ckpt_url)
+        with pytest.raises(ValueError):
+            build_model('mobilefacenet', ckpt_url, num_features=128)
+
+test_quant()
+test_quant_pruned()
+test_quant_missing_params()